@@ -0,0 +1,284 @@
+"""
+Dobles en memoria de Google Drive (files/changes/batch) y de pyrogram.Client
+para medir rendimiento sin cuentas reales.
+
+- FakeDrive: latencia configurable por llamada, ancho de banda de descarga e
+  inyección de fallos (HttpError 503, reintentable).
+- FakeTelegramClient: registra cada envío y simula el ancho de banda de subida.
+"""
+import os
+import re
+import time
+import random
+import asyncio
+import collections
+import hashlib
+import itertools
+import threading
+import types
+import httplib2
+from googleapiclient.errors import HttpError
+
+FOLDER = 'application/vnd.google-apps.folder'
+DOC = 'application/vnd.google-apps.document'
+
+# --- Google Drive ---
+
+class _Resp(dict):
+    def __init__(self, status, **headers):
+        super().__init__(**headers)
+        self.status = status
+
+class _FakeHttp:
+    """Lo mínimo que usa MediaIoBaseDownload: pedidos con Range."""
+    def __init__(self, drive, data):
+        self.drive = drive
+        self.data = data
+
+    def request(self, uri, method='GET', headers=None, **kwargs):
+        rng = (headers or {}).get('range') or (headers or {}).get('Range')
+        start, end = (int(x) for x in rng.split('=')[1].split('-'))
+        chunk = self.data[start:end + 1]
+        self.drive.io_wait(len(chunk))
+        return _Resp(206, **{'content-range': f'bytes {start}-{start + len(chunk) - 1}/{len(self.data)}'}), chunk
+
+class _Request:
+    def __init__(self, drive, fn, media=None):
+        self.drive = drive
+        self.fn = fn
+        self.http = _FakeHttp(drive, media if media is not None else b'')
+        self.uri = 'fake://drive'
+        self.headers = {}
+        self.method = 'GET'
+
+    def execute(self, *args, **kwargs):
+        self.drive.round_trip()
+        return self.fn()
+
+class _Files:
+    def __init__(self, drive):
+        self.d = drive
+
+    def list(self, q='', fields=None, orderBy=None, pageSize=100, pageToken=None, **kwargs):
+        def run():
+            items = self.d.query(q)
+            if orderBy: items.sort(key=lambda f: f['name'])
+            start = int(pageToken or 0)
+            res = {'files': [dict(f) for f in items[start:start + pageSize]]}
+            if start + pageSize < len(items): res['nextPageToken'] = str(start + pageSize)
+            return res
+        return _Request(self.d, run)
+
+    def get(self, fileId, fields=None, **kwargs):
+        def run():
+            f = self.d.store.get(fileId)
+            if f is None:
+                raise HttpError(httplib2.Response({'status': 404}), b'{"error": {"code": 404}}')
+            return dict(f)
+        return _Request(self.d, run)
+
+    def get_media(self, fileId, **kwargs):
+        data = self.d.content.get(fileId, b'')
+        return _Request(self.d, lambda: data, media=data)
+
+    def export_media(self, fileId, mimeType=None, **kwargs):
+        return self.get_media(fileId)
+
+    def create(self, body, fields=None, media_body=None, **kwargs):
+        def run():
+            content = media_body._fd.getvalue() if media_body is not None else None
+            return {'id': self.d.add(body['name'], body['parents'][0], body.get('mimeType', 'text/plain'), content=content)}
+        return _Request(self.d, run)
+
+    def update(self, fileId, body=None, addParents=None, removeParents=None, fields=None, **kwargs):
+        def run():
+            with self.d.lock:
+                f = self.d.store[fileId]
+                f.update(body or {})
+                if addParents:
+                    self.d.children[f['parents'][0]].discard(fileId)
+                    self.d.children[addParents].add(fileId)
+                    f['parents'] = [addParents]
+                self.d.changes_log.append(fileId)
+            return {'id': fileId}
+        return _Request(self.d, run)
+
+    def delete(self, fileId, **kwargs):
+        def run():
+            with self.d.lock:
+                f = self.d.store.pop(fileId, None)
+                if f: self.d.children[f['parents'][0]].discard(fileId)
+                self.d.changes_log.append(fileId)
+            return {}
+        return _Request(self.d, run)
+
+class _Changes:
+    def __init__(self, drive):
+        self.d = drive
+
+    def getStartPageToken(self):
+        return _Request(self.d, lambda: {'startPageToken': str(len(self.d.changes_log))})
+
+    def list(self, pageToken, pageSize=100, **kwargs):
+        def run():
+            i = int(pageToken)
+            chunk = self.d.changes_log[i:i + pageSize]
+            res = {'changes': [
+                {'fileId': fid, 'removed': fid not in self.d.store, 'file': dict(self.d.store[fid]) if fid in self.d.store else None}
+                for fid in chunk
+            ]}
+            if i + pageSize < len(self.d.changes_log): res['nextPageToken'] = str(i + pageSize)
+            else: res['newStartPageToken'] = str(len(self.d.changes_log))
+            return res
+        return _Request(self.d, run)
+
+class _Batch:
+    def __init__(self, drive, callback):
+        self.d = drive
+        self.callback = callback
+        self.requests = []
+
+    def add(self, request, request_id=None):
+        self.requests.append((request_id, request))
+
+    def execute(self):
+        self.d.round_trip()  # Un solo viaje HTTP para todo el lote
+        self.d.batches += 1
+        for request_id, request in self.requests:
+            try:
+                response, error = request.fn(), None
+            except Exception as e:
+                response, error = None, e
+            self.callback(request_id, response, error)
+
+class FakeDrive:
+    """
+    Sustituto del recurso que devuelve googleapiclient.discovery.build('drive', 'v3').
+    `latency` (s) por viaje, `download_bandwidth` (bytes/s) y `failure_rate` (0..1).
+    """
+    def __init__(self, latency=0.0, download_bandwidth=None, failure_rate=0.0, seed=0):
+        self.latency = latency
+        self.download_bandwidth = download_bandwidth
+        self.failure_rate = failure_rate
+        self.random = random.Random(seed)
+        self.store = {}
+        self.children = collections.defaultdict(set)  # padre -> ids (el list() no recorre todo el árbol)
+        self.content = {}
+        self.changes_log = []
+        self.calls = 0
+        self.batches = 0
+        self.failures = 0
+        self.lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    def files(self): return _Files(self)
+    def changes(self): return _Changes(self)
+    def new_batch_http_request(self, callback=None): return _Batch(self, callback)
+
+    def round_trip(self):
+        with self.lock:
+            self.calls += 1
+            fail = self.failure_rate and self.random.random() < self.failure_rate
+            if fail: self.failures += 1
+        if self.latency: time.sleep(self.latency)
+        if fail:
+            raise HttpError(httplib2.Response({'status': 503}), b'{"error": {"code": 503, "message": "injected"}}')
+
+    def io_wait(self, n_bytes):
+        if self.download_bandwidth: time.sleep(n_bytes / self.download_bandwidth)
+
+    def add(self, name, parent, mime=FOLDER, content=None):
+        with self.lock:
+            fid = f"id{next(self._ids)}"
+            self.changes_log.append(fid)
+            self.children[parent].add(fid)
+            self.store[fid] = {
+                'id': fid, 'name': name, 'mimeType': mime, 'parents': [parent], 'trashed': False,
+                'modifiedTime': '2026-01-01T00:00:00Z'
+            }
+            if content is not None:
+                self.content[fid] = content
+                self.store[fid]['md5Checksum'] = hashlib.md5(fid.encode()).hexdigest()
+                self.store[fid]['size'] = str(len(content))
+        return fid
+
+    def query(self, q):
+        """Subconjunto del lenguaje de consultas de Drive que usa el bot."""
+        parents = re.findall(r"'([^']+)' in parents", q)
+        name = re.search(r"name (=|contains) '([^']*)'", q)
+        mime = re.search(r"mimeType (=|!=) '([^']*)'", q)
+        skip_trashed = re.search(r"trashed\s*=\s*false", q)
+        with self.lock:
+            if parents: candidates = [self.store[i] for p in parents for i in self.children.get(p, ()) if i in self.store]
+            else: candidates = list(self.store.values())
+        items = []
+        for f in sorted(candidates, key=lambda f: int(f['id'][2:])):
+            if name and name.group(1) == '=' and f['name'] != name.group(2): continue
+            if name and name.group(1) == 'contains' and name.group(2) not in f['name']: continue
+            if mime and (f['mimeType'] == mime.group(2)) != (mime.group(1) == '='): continue
+            if skip_trashed and f.get('trashed'): continue
+            items.append(f)
+        return items
+
+# --- Telegram ---
+
+class FakeMessage:
+    _ids = itertools.count(1)
+
+    def __init__(self, client, chat_id, kind=None, text=None):
+        self.client = client
+        self.id = next(self._ids)
+        self.chat = types.SimpleNamespace(id=chat_id)
+        self.text = text
+        self.photo = types.SimpleNamespace(file_id=f"PHOTO{self.id}") if kind == 'photo' else None
+        self.video = types.SimpleNamespace(file_id=f"VIDEO{self.id}") if kind == 'video' else None
+
+    async def reply_text(self, text, **kwargs):
+        return await self.client.send_message(self.chat.id, text)
+
+    async def edit_text(self, text, **kwargs):
+        self.client.sent.append(('edit', self.chat.id, 0))
+        return self
+
+class FakeTelegramClient:
+    """Registra los envíos; subir un archivo local tarda tamaño / `upload_bandwidth`."""
+    def __init__(self, upload_bandwidth=None, latency=0.0):
+        self.upload_bandwidth = upload_bandwidth
+        self.latency = latency
+        self.sent = []  # (método, chat, bytes subidos)
+
+    async def _upload(self, media):
+        size = os.path.getsize(media) if isinstance(media, str) and os.path.exists(media) else 0
+        wait = self.latency + (size / self.upload_bandwidth if self.upload_bandwidth else 0)
+        if wait: await asyncio.sleep(wait)
+        return size
+
+    async def send_message(self, chat_id, text, **kwargs):
+        await self._upload(None)
+        self.sent.append(('send_message', chat_id, 0))
+        return FakeMessage(self, chat_id, text=text)
+
+    async def edit_message_text(self, chat_id, message_id, text, **kwargs):
+        self.sent.append(('edit_message_text', chat_id, 0))
+        return FakeMessage(self, chat_id, text=text)
+
+    async def send_photo(self, chat_id, photo, **kwargs):
+        self.sent.append(('send_photo', chat_id, await self._upload(photo)))
+        return FakeMessage(self, chat_id, 'photo')
+
+    async def send_video(self, chat_id, video, **kwargs):
+        self.sent.append(('send_video', chat_id, await self._upload(video)))
+        return FakeMessage(self, chat_id, 'video')
+
+    async def send_media_group(self, chat_id, media, **kwargs):
+        # Un álbum se sube archivo por archivo por la misma conexión
+        total = 0
+        for m in media: total += await self._upload(m.media)
+        self.sent.append(('send_media_group', chat_id, total))
+        return [FakeMessage(self, chat_id, 'photo' if type(m).__name__ == 'InputMediaPhoto' else 'video') for m in media]
+
+    async def stop(self):
+        pass
+
+    def uploaded_bytes(self):
+        return sum(n for _, _, n in self.sent)
@@ -0,0 +1,262 @@
+"""
+Benchmarks offline: Drive y Telegram falsos (benchmarks/fakes.py), sin credenciales.
+
+Mide execute_agency_post, run_visual_audit, create_agency_structure,
+load_daily_config y un día completo de check_and_run para varios tamaños de
+árbol (cantidad de agencias). Cada tamaño corre en un proceso aparte para que
+los singletons y cachés arranquen en frío.
+
+Uso (desde la raíz del repo):
+    python -m benchmarks.run                      # compara contra benchmarks/baselines.json
+    python -m benchmarks.run --save               # guarda los resultados como nueva línea base
+    python -m benchmarks.run --sizes 5 50 --latency 0.05 --failure-rate 0.02
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+import argparse
+import tempfile
+import subprocess
+from datetime import datetime, timedelta
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_FILE = os.path.join(ROOT_DIR, "benchmarks", "baselines.json")
+CONFIG_KEYS = ("latency", "drive_bandwidth", "upload_bandwidth", "failure_rate", "files_per_day", "media_kb", "telegram_limits")
+
+# --- Proceso hijo: un tamaño de árbol ---
+
+def _setup_environment(args):
+    """Parchea credenciales y build() ANTES de importar src (DriveService conecta al importarse)."""
+    sys.path.insert(0, ROOT_DIR)
+    from benchmarks.fakes import FakeDrive, FakeTelegramClient
+    from google.oauth2 import service_account
+    import googleapiclient.discovery
+
+    drive = FakeDrive(
+        latency=args.latency,
+        download_bandwidth=args.drive_bandwidth * 1024 * 1024 if args.drive_bandwidth else None,
+        failure_rate=args.failure_rate
+    )
+    service_account.Credentials.from_service_account_file = staticmethod(lambda *a, **k: object())
+    googleapiclient.discovery.build = lambda *a, **k: drive
+
+    from src.config.settings import config
+    tmp = tempfile.mkdtemp(prefix="bench_")
+    config.DATA_DIR = tmp
+    config.DOWNLOADS_DIR = os.path.join(tmp, "downloads")
+    os.makedirs(config.DOWNLOADS_DIR, exist_ok=True)
+    config.METRICS_PORT = 0
+    config.DRIVE_ROOT_ID = drive.add("ROOT", "none")
+    if not args.telegram_limits:
+        # Sin los límites de Telegram la medición refleja Drive y la subida, no la espera del token bucket
+        config.TELEGRAM_GLOBAL_RATE = config.TELEGRAM_CHAT_RATE = config.TELEGRAM_CHAT_BURST = 10_000
+
+    from src.utils.logger import log
+    log.setLevel(logging.WARNING)
+    client = FakeTelegramClient(upload_bandwidth=args.upload_bandwidth * 1024 * 1024 if args.upload_bandwidth else None)
+    return drive, client
+
+def _populate(drive, n_agencies, files_per_day, media_kb):
+    """Árbol tipo producción: Settings + Agencia/Mes/DD con N archivos por día."""
+    from benchmarks.fakes import DOC
+    from src.config.settings import config
+    from src.services.storage_backend import MESES
+
+    now = datetime.now() - timedelta(hours=3)
+    root = config.DRIVE_ROOT_ID
+    settings_id = drive.add("末Settings", root)
+    schedule = "\n".join(f"A{i} = {9 + (i * 11) // max(n_agencies, 1):02d}:{(i * 7) % 60:02d}" for i in range(n_agencies))
+    drive.add(config.FILE_SCHEDULE, settings_id, "text/plain", content=schedule.encode())
+    drive.add(config.FILE_CHAT_IDS, settings_id, "text/plain", content=b"Admins = [1]\nPublicar = [-100]\nAviso = [-200]\nPub_Test = [-300]")
+    drive.add(config.FILE_EMOJIS, settings_id, "text/plain", content="\n".join(f"e{i} : {1000 + i}" for i in range(200)).encode())
+
+    media = os.urandom(media_kb * 1024)  # El mismo contenido para todos (sin inflar la memoria)
+    next_month = MESES[(now.replace(day=1) + timedelta(days=32)).month]
+    for i in range(n_agencies):
+        agency = drive.add(f"A{i}", root)
+        drive.add("caption", agency, DOC, content="Hola :e1: :e7: **promo** :e150:".encode())
+        for month_name in (MESES[now.month], next_month):
+            month = drive.add(month_name, agency)
+            for day in range(1, 32):
+                day_id = drive.add(f"{day:02d}", month)
+                for k in range(files_per_day):
+                    drive.add(f"{k + 1}.jpg", day_id, "image/jpeg", content=media)
+
+async def _measure(drive, client, coro_factory):
+    calls, batches, uploaded = drive.calls, drive.batches, client.uploaded_bytes()
+    started = time.perf_counter()
+    result = await coro_factory()
+    return {
+        "seconds": round(time.perf_counter() - started, 4),
+        "drive_calls": drive.calls - calls,
+        "drive_batches": drive.batches - batches,
+        "uploaded_bytes": client.uploaded_bytes() - uploaded,
+    }, result
+
+async def _simulate_day(scheduler):
+    """Un día entero de ticks por minuto con el reloj simulado (sin APScheduler: modo polling)."""
+    import src.core.scheduler as scheduler_module
+    import src.core.procesador as procesador_module
+    from src.core.job_runner import job_runner
+
+    class SimulatedDatetime(datetime):
+        current = None
+
+        @classmethod
+        def now(cls, tz=None):
+            return cls.current
+
+    real_datetime = scheduler_module.datetime
+    scheduler_module.datetime = procesador_module.datetime = SimulatedDatetime
+    local_midnight = (datetime.now() - timedelta(hours=3)).replace(hour=0, minute=0, second=0, microsecond=0)
+    try:
+        for minute in range(24 * 60):
+            # Hora del sistema = hora local + 3 (la convención del bot)
+            SimulatedDatetime.current = local_midnight + timedelta(minutes=minute, hours=3)
+            await scheduler.check_and_run()
+            pending = list(scheduler._publish_tasks.values()) + list(scheduler._prefetch_tasks.values())
+            pending += [t for t in job_runner.tasks.values() if not t.done()]
+            if pending: await asyncio.gather(*pending, return_exceptions=True)
+    finally:
+        scheduler_module.datetime = procesador_module.datetime = real_datetime
+    return len(scheduler.published_log)
+
+async def _run_suite(drive, client):
+    from src.config.settings import config
+    from src.services.async_drive_service import async_drive_service
+    from src.services.telegram_service import telegram_service
+    from src.core.scheduler import scheduler
+    from src.core.procesador import processor
+    from src.services.visual_audit import visual_audit
+
+    telegram_service.client = client
+    telegram_service.is_connected = True
+    results = {}
+
+    results["load_daily_config_cold"], _ = await _measure(drive, client, scheduler.load_daily_config)
+    results["load_daily_config_warm"], _ = await _measure(drive, client, scheduler.load_daily_config)
+    await async_drive_service.start_change_sync()
+    results["refresh_tree_index"], _ = await _measure(drive, client, async_drive_service.refresh_tree_index)
+    results["execute_agency_post_cold"], _ = await _measure(
+        drive, client, lambda: processor.execute_agency_post("A0", target_chat_id=scheduler.alert_channel_id))
+    results["execute_agency_post_warm"], _ = await _measure(
+        drive, client, lambda: processor.execute_agency_post("A0", target_chat_id=scheduler.target_channel_id))
+    results["run_visual_audit"], _ = await _measure(drive, client, async_drive_service.run_visual_audit)
+    visual_audit.entries = {}
+    results["visual_audit_incremental_cold"], _ = await _measure(drive, client, visual_audit.run)
+    results["visual_audit_incremental_warm"], _ = await _measure(drive, client, visual_audit.run)
+    results["create_agency_structure"], _ = await _measure(
+        drive, client, lambda: async_drive_service.create_agency_structure("BenchNueva"))
+    results["check_and_run_day"], published = await _measure(drive, client, lambda: _simulate_day(scheduler))
+    results["check_and_run_day"]["published"] = published
+    results["check_and_run_day"]["scheduled"] = len(scheduler.schedule_map)
+    results["drive_failures_injected"] = drive.failures
+
+    await telegram_service.stop()
+    async_drive_service.shutdown()
+    return results
+
+def run_child(args):
+    drive, client = _setup_environment(args)
+    _populate(drive, args.child, args.files_per_day, args.media_kb)
+    results = asyncio.run(_run_suite(drive, client))
+    with open(args.out, "w") as f:
+        json.dump(results, f)
+
+# --- Proceso padre: orquesta tamaños y compara ---
+
+def _child_command(args, size, out_path):
+    cmd = [sys.executable, "-m", "benchmarks.run", "--child", str(size), "--out", out_path]
+    for key in CONFIG_KEYS:
+        value = getattr(args, key)
+        if isinstance(value, bool):
+            if value: cmd.append(f"--{key.replace('_', '-')}")
+        else:
+            cmd += [f"--{key.replace('_', '-')}", str(value)]
+    return cmd
+
+def _compare(results, baseline, threshold):
+    regressions = []
+    print(f"\n{'operación':<32}{'tamaño':>7}{'seg':>10}{'base':>10}{'Δ%':>8}{'drive':>7}")
+    for size, ops in results.items():
+        for op, data in ops.items():
+            if not isinstance(data, dict): continue
+            base = baseline.get(size, {}).get(op, {}).get("seconds")
+            delta = ""
+            if base:
+                change = (data["seconds"] - base) / base * 100
+                delta = f"{change:+.0f}"
+                # Se ignoran diferencias de pocos milisegundos (ruido)
+                if change > threshold and data["seconds"] - base > 0.005:
+                    regressions.append((size, op, base, data["seconds"]))
+                    delta += " ⚠️"
+            print(f"{op:<32}{size:>7}{data['seconds']:>10.3f}{(base or 0):>10.3f}{delta:>8}{data['drive_calls']:>7}")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks offline del bot (Drive y Telegram falsos).")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[5, 20, 50], help="Cantidad de agencias por corrida")
+    parser.add_argument("--latency", type=float, default=0.01, help="Segundos por viaje a Drive")
+    parser.add_argument("--drive-bandwidth", type=float, default=50, help="MB/s de descarga desde Drive (0 = sin límite)")
+    parser.add_argument("--upload-bandwidth", type=float, default=10, help="MB/s de subida a Telegram (0 = sin límite)")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Probabilidad de HttpError 503 por llamada")
+    parser.add_argument("--files-per-day", type=int, default=5)
+    parser.add_argument("--media-kb", type=int, default=256)
+    parser.add_argument("--telegram-limits", action="store_true", help="Respetar los límites de envío reales (más lento)")
+    parser.add_argument("--save", action="store_true", help="Guardar los resultados como nueva línea base")
+    parser.add_argument("--threshold", type=float, default=20.0, help="%% de empeoramiento que cuenta como regresión")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--out", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child is not None:
+        return run_child(args)
+
+    results = {}
+    for size in args.sizes:
+        print(f"⏱️ Midiendo árbol con {size} agencias...")
+        with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as tmp:
+            out_path = tmp.name
+        try:
+            proc = subprocess.run(_child_command(args, size, out_path), cwd=ROOT_DIR)
+            if proc.returncode != 0:
+                print(f"❌ Falló la corrida de {size} agencias (código {proc.returncode}).")
+                continue
+            with open(out_path) as f:
+                results[str(size)] = json.load(f)
+        finally:
+            os.remove(out_path)
+
+    run_config = {key: getattr(args, key) for key in CONFIG_KEYS}
+    baseline = {}
+    if os.path.exists(BASELINE_FILE):
+        with open(BASELINE_FILE) as f:
+            saved = json.load(f)
+        if saved.get("config") == run_config:
+            baseline = saved.get("results", {})
+        else:
+            print("ℹ️ La línea base se tomó con otra configuración: no se compara.")
+
+    regressions = _compare(results, baseline, args.threshold)
+
+    if args.save:
+        with open(BASELINE_FILE, "w") as f:
+            json.dump({
+                "created": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                "python": sys.version.split()[0],
+                "config": run_config,
+                "results": results
+            }, f, indent=2)
+        print(f"💾 Línea base guardada en {os.path.relpath(BASELINE_FILE, ROOT_DIR)}")
+
+    if regressions:
+        print(f"\n⚠️ {len(regressions)} operaciones más lentas que la línea base (>{args.threshold:.0f}%).")
+        if args.fail_on_regression: return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main() or 0)
@@ -14,7 +14,11 @@ from src.config.settings import config
 from src.services.telegram_service import telegram_service
 from src.core.chat_manager import chat_manager
 from src.core.scheduler import scheduler
+from src.core.job_runner import job_runner
+from src.services.async_drive_service import async_drive_service
+from src.services.video_metadata import video_metadata
 from src.utils.logger import log
+from src.utils.metrics import metrics
 from pyrogram import idle
 from datetime import datetime, timedelta
 
@@ -29,12 +33,34 @@ async def main():
     
     # 3. Carga inicial de configuración (Importante hacerlo una vez al inicio)
     log.info("📅 Cargando configuración diaria inicial...")
-    await scheduler.load_daily_config()
+    try:
+        await scheduler.load_daily_config()
+    except Exception as e:
+        # Drive caído al arrancar: se sigue con la configuración de config_cache.json
+        log.error(f"No se pudo cargar la configuración desde Drive (se usa la caché local): {e}")
+    try:
+        # Primero el token de cambios, luego la foto: así no se pierde nada entre ambos
+        await async_drive_service.start_change_sync()
+        await async_drive_service.refresh_tree_index()
+    except Exception as e:
+        log.error(f"No se pudo cargar el índice de Drive: {e}")
+    
+    # Trabajos que un reinicio dejó a medias (mantenimiento, create) siguen desde su checkpoint
+    job_runner.resume()
+    
+    # Endpoint de métricas (solo localhost)
+    metrics_server = None
+    if config.METRICS_PORT:
+        try:
+            metrics_server = await metrics.start_server(config.METRICS_PORT)
+        except OSError as e:
+            log.error(f"No se pudo abrir el puerto de métricas {config.METRICS_PORT}: {e}")
     
     # 4. CONFIGURAR APSCHEDULER (El reemplazo del bucle while)
     aps_scheduler = AsyncIOScheduler()
     intervalo_min = str(config.CHECK_INTERVAL) # Aseguramos que sea string para el cron
     
+    # Tick de mantenimiento (reinicio diario, mantenimiento mensual)
     aps_scheduler.add_job(
         scheduler.check_and_run, 
         trigger='cron', 
@@ -42,8 +68,19 @@ async def main():
         second='0'
     )
     
+    # Sincronización incremental del índice (Changes API)
+    aps_scheduler.add_job(
+        async_drive_service.sync_changes,
+        trigger='interval',
+        seconds=config.DRIVE_SYNC_INTERVAL,
+        max_instances=1
+    )
+    
+    # Cada publicación del schedule tiene su propio job a la hora exacta
+    scheduler.attach(aps_scheduler)
+    
     aps_scheduler.start()
-    log.info(f"⏰ Scheduler activado: Ejecutando cada {intervalo_min} minutos en punto (:00).")
+    log.info(f"⏰ Scheduler activado: publicaciones a hora exacta, mantenimiento cada {intervalo_min} minutos (:00).")
     # 5. Notificación de Inicio a Telegram
     
     try:
@@ -65,7 +102,10 @@ async def main():
     # --- Cierre Limpio (Al detener el bot con Ctrl+C) ---
     log.info("Apagando sistemas...")
     aps_scheduler.shutdown()
+    if metrics_server: metrics_server.close()
     await telegram_service.stop()
+    async_drive_service.shutdown()
+    video_metadata.shutdown()
 
 if __name__ == "__main__":
     try:
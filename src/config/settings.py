@@ -17,6 +17,14 @@ class Settings:
     # Drive
     DRIVE_ROOT_ID = os.getenv("DRIVE_ROOT_FOLDER_ID")
     CREDENTIALS_FILE = os.getenv("GOOGLE_CREDENTIALS_FILE")
+
+    # Almacenamiento del contenido: "drive" (Google Drive) o "local" (árbol de carpetas en disco/NAS)
+    STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "drive").lower()
+    LOCAL_STORAGE_ROOT = os.getenv("LOCAL_STORAGE_ROOT", "")
+    if STORAGE_BACKEND == "local":
+        # En disco el id de cada carpeta es su ruta: la raíz pasa a ser la carpeta base.
+        # Vacío se deja vacío (abspath lo volvería el directorio actual): LocalStorageBackend lo rechaza
+        DRIVE_ROOT_ID = os.path.abspath(LOCAL_STORAGE_ROOT) if LOCAL_STORAGE_ROOT.strip() else ""
     
     # Paths
     BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -25,6 +33,36 @@ class Settings:
     
     # Config
     CHECK_INTERVAL = int(os.getenv("CHECK_INTERVAL_MINUTES", 1))
+    PREFETCH_LEAD_MINUTES = int(os.getenv("PREFETCH_LEAD_MINUTES", 10))  # Antelación con la que se prepara cada publicación
+    DRIVE_MAX_WORKERS = int(os.getenv("DRIVE_MAX_WORKERS", 4))  # Hilos para llamadas a Drive
+    ID_CACHE_TTL = int(os.getenv("ID_CACHE_TTL_SECONDS", 3600))  # Vida de los IDs de carpetas cacheados
+    ID_CACHE_SIZE = int(os.getenv("ID_CACHE_SIZE", 2048))
+    TREE_INDEX_TTL = int(os.getenv("TREE_INDEX_TTL_SECONDS", 900))  # Validez del índice del árbol de Drive
+    TREE_INDEX_REBUILD = int(os.getenv("TREE_INDEX_REBUILD_SECONDS", 6 * 3600))  # Recorrido completo aunque lleguen los cambios
+    DOWNLOAD_CONCURRENCY = int(os.getenv("DOWNLOAD_CONCURRENCY", 3))  # Descargas simultáneas por álbum
+    DOWNLOAD_MAX_BYTES_IN_FLIGHT = int(os.getenv("DOWNLOAD_MAX_MB_IN_FLIGHT", 300)) * 1024 * 1024
+    DOWNLOAD_CHUNK_SIZE = int(os.getenv("DOWNLOAD_CHUNK_MB", 8)) * 1024 * 1024  # Tamaño de cada trozo descargado
+    MEDIA_CACHE_MAX_BYTES = int(os.getenv("MEDIA_CACHE_MAX_MB", 2048)) * 1024 * 1024  # 0 = sin caché
+    TELEGRAM_FILE_IDS_MAX = int(os.getenv("TELEGRAM_FILE_IDS_MAX", 5000))  # file_id recordados (LRU)
+    DRIVE_SYNC_INTERVAL = int(os.getenv("DRIVE_SYNC_INTERVAL_SECONDS", 30))  # Cada cuánto se leen los cambios de Drive
+    MAX_CONCURRENT_PUBLICATIONS = int(os.getenv("MAX_CONCURRENT_PUBLICATIONS", 4))  # Publicaciones simultáneas
+    PUBLICATION_TIMEOUT = int(os.getenv("PUBLICATION_TIMEOUT_SECONDS", 600))  # Tiempo máximo por carpeta
+    PUBLISH_LAG_TARGET = int(os.getenv("PUBLISH_LAG_TARGET_SECONDS", 60))  # Retraso aceptable sobre la hora programada
+    TELEGRAM_GLOBAL_RATE = float(os.getenv("TELEGRAM_GLOBAL_RATE", 25))  # Mensajes por segundo en total
+    TELEGRAM_CHAT_RATE = float(os.getenv("TELEGRAM_CHAT_RATE_PER_MIN", 20)) / 60  # Mensajes por segundo por chat
+    TELEGRAM_CHAT_BURST = int(os.getenv("TELEGRAM_CHAT_BURST", 10))  # Ráfaga por chat (caption + álbum)
+    TELEGRAM_SEND_RETRIES = int(os.getenv("TELEGRAM_SEND_RETRIES", 3))  # Intentos por envío ante errores de red
+    TELEGRAM_SEND_WORKERS = int(os.getenv("TELEGRAM_SEND_WORKERS", 4))  # Envíos simultáneos
+    VIDEO_META_WORKERS = int(os.getenv("VIDEO_META_WORKERS", 2))  # Procesos para leer metadatos de video
+    VIDEO_META_TIMEOUT = int(os.getenv("VIDEO_META_TIMEOUT_SECONDS", 30))
+    CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", 5))  # Errores de red seguidos para cortar
+    CIRCUIT_RESET_SECONDS = int(os.getenv("CIRCUIT_RESET_SECONDS", 60))  # Tiempo con el circuito abierto
+    METRICS_PORT = int(os.getenv("METRICS_PORT", 9464))  # Endpoint Prometheus en 127.0.0.1 (0 = desactivado)
+    DRIVE_PAGE_SIZE = int(os.getenv("DRIVE_PAGE_SIZE", 1000))  # Resultados por página en los listados (máx. 1000)
+    AUDIT_SLICE_SECONDS = float(os.getenv("AUDIT_SLICE_SECONDS", 2))  # Trabajo continuo máximo de la auditoría
+    AUDIT_SLICE_PAUSE = float(os.getenv("AUDIT_SLICE_PAUSE_SECONDS", 1))  # Pausa entre tramos (cede Drive a las publicaciones)
+    JOB_CONCURRENCY = int(os.getenv("JOB_CONCURRENCY", 2))  # Agencias en paralelo por trabajo de fondo (menos que DRIVE_MAX_WORKERS)
+    JOB_PROGRESS_SECONDS = int(os.getenv("JOB_PROGRESS_SECONDS", 15))  # Cada cuánto se edita el mensaje de progreso
     
     # Email (opcional)
     EMAIL_SENDER = os.getenv("EMAIL_SENDER")
@@ -1,8 +1,11 @@
-from src.services.drive_service import drive_service
+from src.services.async_drive_service import async_drive_service
 from src.core.procesador import processor
+from src.services.telegram_service import telegram_service
 from src.utils.logger import log
+from src.utils.metrics import metrics
 from pyrogram import enums
 from src.core.scheduler import scheduler # Importamos el scheduler
+from src.core.job_runner import job_runner
 from src.config.settings import config
 from datetime import datetime, timedelta
 
@@ -33,7 +36,7 @@ class ChatManager:
             
             if premium_emojis_found:
                 response = "**💎 Emojis Premium Detectados:**\n" + f"Se han detectado: {(len(premium_emojis_found))} emojis premium en tu mensaje.\n\n"
-                await message.reply_text(response)
+                await telegram_service.reply(message, response)
         # ----------------------------------
         lines = text.split('\n', 1)
         first_line = lines[0].strip()
@@ -50,7 +53,7 @@ class ChatManager:
                 # CASO A: ID ME
                 if query.lower() == "me":
                     me = await client.get_me()
-                    await message.reply_text(f"🆔 **Tu ID (Host):** `{me.id}`")
+                    await telegram_service.reply(message, f"🆔 **Tu ID (Host):** `{me.id}`")
                     return
 
                 # CASO B: RESOLUCIÓN EXACTA (Username o Link)
@@ -65,7 +68,7 @@ class ChatManager:
                         # Llamada directa a la API (Infalible)
                         chat = await client.get_chat(clean_query)
                         
-                        await message.reply_text(
+                        await telegram_service.reply(message,
                             f"🎯 **Objetivo Exacto Encontrado**\n"
                             f"📌 Título: `{chat.title}`\n"
                             f"🆔 ID: `{chat.id}`\n"
@@ -78,7 +81,7 @@ class ChatManager:
                         pass
 
                 # CASO C: BÚSQUEDA POR NOMBRE (Fuzzy en chats abiertos)
-                await message.reply_text(f"🔎 Buscando en tus chats activos: *'{query}'*...")
+                await telegram_service.reply(message, f"🔎 Buscando en tus chats activos: *'{query}'*...")
                 found_chats = []
                 
                 async for dialog in client.get_dialogs():
@@ -90,14 +93,14 @@ class ChatManager:
                         if len(found_chats) >= 5: break
                 
                 if found_chats:
-                    await message.reply_text("\n\n".join(found_chats))
+                    await telegram_service.reply(message, "\n\n".join(found_chats))
                 else:
-                    await message.reply_text("❌ No encontrado en tus chats recientes ni por username.")
+                    await telegram_service.reply(message, "❌ No encontrado en tus chats recientes ni por username.")
                 return
 
         # 1. Status
             if cmd == "status" or cmd == "ayuda":
-                await message.reply_text(
+                await telegram_service.reply(message,
                     "🤖 **SISTEMA ONLINE**\n"
                     "━━━━━━━━━━━━━━━\n"
                     "Comandos Disponibles\n"
@@ -105,6 +108,8 @@ class ChatManager:
                     "📅 `horarios` » Ver Programación\n"
                     "📨 `mensaje [Carpeta]` » Test envío\n"
                     "🔄 `reload` » Recargar Config\n"
+                    "📊 `stats` » Latencias y volumen\n"
+                    "⏳ `trabajos` » Tareas en segundo plano\n"
                     "🧽 `clear` » Limpia la pantalla de mensajes\n"
                     "📂 `create [Nombre Agencia]` » Crear estructura Agencia/Mes/Día"
                     "━━━━━━━━━━━━━━━\n"
@@ -117,14 +122,19 @@ class ChatManager:
 
         # 2. HORARIOS (El reporte completo)
             elif cmd in ["horarios", "horario", "programacion"]:
-                status_msg = await message.reply_text("🔎 Analizando programación vs Drive...")
+                status_msg = await telegram_service.reply(message, "🔎 Analizando programación vs Drive...")
                 
                 # Asegurar datos frescos
-                if not scheduler.schedule_map: await scheduler.load_daily_config()
+                if not scheduler.schedule_map:
+                    try:
+                        await scheduler.load_daily_config()
+                    except Exception as e:
+                        await telegram_service.edit(status_msg, f"❌ No se pudo leer la configuración de Drive: {e}")
+                        return
                 
                 # Obtener datos
                 scheduled = scheduler.schedule_map # Diccionario {Carpeta: Hora}
-                drive_folders = drive_service.get_available_folders() # Lista ['CarpetaA', 'CarpetaB']
+                drive_folders = await async_drive_service.get_available_folders() # Lista ['CarpetaA', 'CarpetaB']
                 
                 report = ["**📅 REPORTE DE PROGRAMACIÓN**\n"]
                 processed_folders = [] # Para rastrear cuáles ya revisamos
@@ -153,26 +163,54 @@ class ChatManager:
                 if not found_unscheduled:
                     report.append("_Ninguna (Todo está cubierto)_")
 
-                await status_msg.edit_text("\n".join(report))
+                # C. Historial reciente (publication_store)
+                report.append("\n**🕘 Últimas Publicaciones:**")
+                recent = scheduler.store.recent(8)
+                if not recent: report.append("_Sin historial todavía_")
+                for row in recent:
+                    icon = {"ok": "✅", "partial": "⚠️"}.get(row["status"], "❌")
+                    tag = {"test": " (TESTING)", "force": " (forzada)"}.get(row["kind"], "")
+                    line = f"{icon} `{row['folder']}`{tag} {row['published_at'][5:16]}"
+                    if row["status"] == "ok":
+                        line += f" · {row['duration_seconds'] or 0:.0f}s · {(row['bytes'] or 0) / (1024 * 1024):.1f} MB"
+                        if row["lag_seconds"] is not None: line += f" · retraso {row['lag_seconds']:.0f}s"
+                    report.append(line)
+
+                await telegram_service.edit(status_msg, "\n".join(report))
                 return
 
         # 3. Carpetas (Carpetas disponibles)    
             elif cmd in ["carpetas", "carpeta"]:
-                await message.reply_text("🔎 Buscando carpetas...")
-                folders = drive_service.get_available_folders()
+                await telegram_service.reply(message, "🔎 Buscando carpetas...")
+                folders = await async_drive_service.get_available_folders()
                 folders.remove("末Settings") if "末Settings" in folders else None
                 if folders:
                     list_text = "\n".join([f"📂 `{f}`" for f in folders])
-                    await message.reply_text(f"**Carpetas Disponibles:**\n\n{list_text}")
+                    await telegram_service.reply(message, f"**Carpetas Disponibles:**\n\n{list_text}")
                 else:
-                    await message.reply_text("⚠️ No encontré carpetas.")
+                    await telegram_service.reply(message, "⚠️ No encontré carpetas.")
+                return
+
+        # 3b. Métricas (dónde se va el tiempo de cada publicación)
+            elif cmd in ["stats", "metricas"]:
+                summary = metrics.summary()
+                await telegram_service.reply(message, f"**📊 Métricas desde el inicio:**\n\n{summary or '_Sin datos todavía_'}"[:4000])
+                return
+
+        # 3c. Trabajos en segundo plano (mantenimiento, create, auditoría)
+            elif cmd in ["trabajos", "jobs"]:
+                await telegram_service.reply(message, job_runner.status_text())
                 return
 
         # 4. RECARGA MANUAL (Optimización)    
             if cmd == "/reload" or cmd == "reload":
-                msg = await message.reply_text("🔄 Recargando configuraciones desde Drive...")
-                await scheduler.force_reload()
-                await msg.edit_text("✅ **Sistema Actualizado**\nNuevos horarios y Chat IDs cargados.")
+                msg = await telegram_service.reply(message, "🔄 Recargando configuraciones desde Drive...")
+                try:
+                    await scheduler.force_reload()
+                except Exception as e:
+                    await telegram_service.edit(msg, f"❌ No se pudo recargar desde Drive (sigue la configuración anterior): {e}")
+                    return
+                await telegram_service.edit(msg, "✅ **Sistema Actualizado**\nNuevos horarios y Chat IDs cargados.")
                 return
             
         # 5. "Mensaje [Carpeta] [DD/MM] (Fecha opcional, default hoy)"
@@ -202,7 +240,7 @@ class ChatManager:
                 final_date = target_date if target_date else datetime.now() - timedelta(hours=3)
                 date_str = final_date.strftime("%d/%m")
                 
-                await message.reply_text(f"🚀 Ejecutando: `{folder_name}`\n📅 Fecha objetivo: `{date_str}`")
+                await telegram_service.reply(message, f"🚀 Ejecutando: `{folder_name}`\n📅 Fecha objetivo: `{date_str}`")
                 
                 try:
                     await processor.execute_agency_post(
@@ -210,16 +248,16 @@ class ChatManager:
                         target_chat_id=message.chat.id, 
                         force_date=final_date
                     )
-                    await message.reply_text("✅ Ejecución finalizada.")
+                    await telegram_service.reply(message, "✅ Ejecución finalizada.")
                     return
                 except Exception as e:
-                    await message.reply_text(f"❌ Error: {e}")
+                    await telegram_service.reply(message, f"❌ Error: {e}")
                     return
             
         # 6. Clear (Limpieza)   
             if cmd == "clear":
                 spacer = ".\n" + ("\n" * 50) + "." 
-                msg = await message.reply_text(spacer)
+                msg = await telegram_service.reply(message, spacer)
                 return
 
         # 7. CREATE
@@ -227,18 +265,12 @@ class ChatManager:
                 if cmd.startswith("create "): agency_name = text[7:].strip() # Quitar "create "
                 else: agency_name = text[6:].strip() # Quitar "crear "
                 if not agency_name:
-                    await message.reply_text("⚠️ Indica el nombre de la carpeta.\nEj: `create Poker`")
+                    await telegram_service.reply(message, "⚠️ Indica el nombre de la carpeta.\nEj: `create Poker`")
                     return
                 
-                await message.reply_text(f"🏗️ Creando estructura para `{agency_name}`...\n(Esto puede tardar unos segundos)")
-                
-                # Ejecutar creación masiva
-                ok = drive_service.create_agency_structure(agency_name)
-                
-                if ok:
-                    await message.reply_text(f"✅ Carpeta `{agency_name}` creada con éxito.\nYa tiene subcarpetas para éste y el próximo mes.")
-                else:
-                    await message.reply_text("❌ Hubo un error creando las carpetas.")
+                # En segundo plano: el resultado llega a este chat al terminar
+                job_runner.start("create", agency_name, {"agency": agency_name}, chat_id=message.chat.id)
+                await telegram_service.reply(message, f"🏗️ Creando estructura para `{agency_name}` en segundo plano...\nTe aviso en este chat cuando termine.")
                 return
     
         # 8. Forzar Publicación (Admin)
@@ -247,29 +279,29 @@ class ChatManager:
                 else: folder_to_publish = text[17:].strip() # Quitar "forzar_publicar "
                 
                 if not folder_to_publish:
-                    await message.reply_text("⚠️ Indica el nombre de la carpeta a publicar.\nEj: `force_publish Poker`")
+                    await telegram_service.reply(message, "⚠️ Indica el nombre de la carpeta a publicar.\nEj: `force_publish Poker`")
                     return
                 
-                await message.reply_text(f"🚀 Forzando publicación de `{folder_to_publish}`...")
+                await telegram_service.reply(message, f"🚀 Forzando publicación de `{folder_to_publish}`...")
                 
                 try:
                     await scheduler.force_publish(folder_to_publish)
-                    await message.reply_text("✅ Publicación forzada finalizada.")
+                    await telegram_service.reply(message, "✅ Publicación forzada finalizada.")
                     return
                 except Exception as e:
-                    await message.reply_text(f"❌ Error: {e}")
+                    await telegram_service.reply(message, f"❌ Error: {e}")
                     return
     
     # --- BLOQUE DE GUARDADO (CAPTION O BUZÓN) ---
         
         # 1. Intentamos buscar la carpeta exacta en Drive
-        exists = drive_service.find_item_id_by_name(config.DRIVE_ROOT_ID, first_line, is_folder=True, exact_match=True)
+        exists = await async_drive_service.find_item_id_by_name(config.DRIVE_ROOT_ID, first_line, is_folder=True, exact_match=True)
 
         # CASO: CARPETA EXISTE -> GUARDAR CAPTION
         if exists:
             # Validamos que no sea Settings ni Buzon
             if first_line in ["末Settings"]:
-                await message.reply_text("⚠️ No se puede escribir en carpetas de sistema.")
+                await telegram_service.reply(message, "⚠️ No se puede escribir en carpetas de sistema.")
                 return
 
             if len(lines) > 1:
@@ -279,13 +311,14 @@ class ChatManager:
                 
                 if len(html_lines) >= 2:
                     caption_html = html_lines[1].strip()
-                    m = await message.reply_text(f"⏳ Guardando en `{first_line}`...")
-                    ok, msg = drive_service.update_text_file(first_line, caption_html)
-                    await m.edit_text("✅ Guardado" if ok else f"❌ Error: {msg}")
+                    m = await telegram_service.reply(message, f"⏳ Guardando en `{first_line}`...")
+                    ok, msg = await async_drive_service.update_text_file(first_line, caption_html)
+                    if ok: scheduler.discard_prepared(first_line)
+                    await telegram_service.edit(m, "✅ Guardado" if ok else f"❌ Error: {msg}")
                 else:
-                    await message.reply_text("⚠️ El mensaje está vacío.")
+                    await telegram_service.reply(message, "⚠️ El mensaje está vacío.")
             else:
-                await message.reply_text(f"📂 Carpeta `{first_line}` detectada, pero falta el mensaje abajo.")
+                await telegram_service.reply(message, f"📂 Carpeta `{first_line}` detectada, pero falta el mensaje abajo.")
             return
 
         # CASO: CARPETA NO EXISTE (FALLBACK) -> BUZÓN
@@ -294,16 +327,16 @@ class ChatManager:
             # Guardamos TODO el mensaje (incluyendo la primera linea) en Buzón
             full_content = message.text.html
             identifier = message.from_user.first_name if message.from_user else "Desconocido"
-            ok = drive_service.save_to_inbox(full_content, identifier=identifier)
+            ok = await async_drive_service.save_to_inbox(full_content, identifier=identifier)
             
             if ok:
-                await message.reply_text(
+                await telegram_service.reply(message,
                     "⚠️ **Carpeta no Localizada**\n\n"
                     "Se guardó el mensaje en `Temp.gdoc` dentro de **Buzón**.\n"
                     "Si el mensaje persiste, notificar a un administrador."
                 )
             else:
-                await message.reply_text("❌ Error crítico: No se pudo guardar ni en la carpeta ni en el Buzón.")
+                await telegram_service.reply(message, "❌ Error crítico: No se pudo guardar ni en la carpeta ni en el Buzón.")
 
 
 chat_manager = ChatManager()
\ No newline at end of file
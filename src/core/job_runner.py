@@ -0,0 +1,291 @@
+import os
+import json
+import time
+import asyncio
+from datetime import datetime, timedelta
+from src.config.settings import config
+from src.utils.logger import log
+from src.utils.metrics import metrics
+from src.services.async_drive_service import async_drive_service
+from src.services.telegram_service import telegram_service
+from src.services.visual_audit import visual_audit
+
+
+class JobHandler:
+    """
+    Un tipo de trabajo largo: prepare() una vez, luego unidades independientes
+    (agencias) que pueden correr en paralelo y reanudarse, y finish() al final.
+    """
+    title = "Trabajo"
+    run_once = False  # True: un trabajo terminado con la misma clave no se repite
+    quiet = False     # True: sin mensajes salvo que tarde o haya novedades
+
+    async def prepare(self, params):
+        return {}
+
+    async def units(self, params, context):
+        return []
+
+    async def run_unit(self, params, context, unit):
+        """Devuelve el texto que se suma al informe."""
+        return ""
+
+    async def finish(self, params, context, report):
+        return report
+
+
+class Job:
+    """Estado de un trabajo; es lo que se guarda como checkpoint en DATA_DIR/jobs."""
+    def __init__(self, job_id, kind, title, params=None, chat_id=None):
+        self.id = job_id
+        self.kind = kind
+        self.title = title
+        self.params = params or {}
+        self.chat_id = chat_id
+        self.context = {}
+        self.prepared = False
+        self.units = []
+        self.done = []
+        self.errors = {}     # unidad -> error
+        self.report = ""
+        self.status = "running"  # running | done | failed
+        self.message_id = None   # Mensaje de progreso (se edita)
+        self.started_at = time.time()
+        self.last_text = None
+
+    def to_dict(self):
+        return {k: v for k, v in self.__dict__.items() if k != "last_text"}
+
+    @classmethod
+    def from_dict(cls, data):
+        job = cls(data["id"], data["kind"], data["title"], data.get("params"), data.get("chat_id"))
+        job.__dict__.update(data)
+        job.last_text = None
+        return job
+
+    def pending(self):
+        return [u for u in self.units if u not in self.done]
+
+    def progress_text(self):
+        text = f"⏳ {self.title}: {len(self.done)}/{len(self.units)} completadas"
+        if self.errors: text += f" | ❌ {len(self.errors)} con error"
+        return text + f" ({int(time.time() - self.started_at)}s)"
+
+
+class JobRunner:
+    """
+    Trabajos largos de Drive (mantenimiento, create, auditorías) como tareas de fondo:
+    unidades en paralelo (JOB_CONCURRENCY), checkpoint tras cada unidad y mensaje de
+    progreso editado cada JOB_PROGRESS_SECONDS. El scheduler sigue publicando mientras tanto.
+    """
+    def __init__(self, directory=None):
+        self.dir = directory or os.path.join(config.DATA_DIR, "jobs")
+        os.makedirs(self.dir, exist_ok=True)
+        self.handlers = {}  # tipo -> JobHandler
+        self.jobs = {}      # id -> Job en curso
+        self.tasks = {}     # id -> Task
+
+    def register(self, kind, handler):
+        self.handlers[kind] = handler
+
+    # --- Checkpoints ---
+    def _path(self, job_id):
+        safe = "".join(c if c.isalnum() or c in "-_" else "_" for c in job_id)
+        return os.path.join(self.dir, f"{safe}.json")
+
+    def _save(self, job):
+        path = self._path(job.id)
+        with open(path + ".tmp", 'w') as f:
+            json.dump(job.to_dict(), f)
+        os.replace(path + ".tmp", path)
+
+    def _load(self, job_id):
+        path = self._path(job_id)
+        if not os.path.exists(path): return None
+        try:
+            with open(path, 'r') as f:
+                return Job.from_dict(json.load(f))
+        except Exception as e:
+            log.warning(f"⚠️ Checkpoint ilegible {path}: {e}")
+            return None
+
+    # --- API ---
+    def is_running(self, kind=None):
+        return any(not t.done() and (kind is None or self.jobs[job_id].kind == kind) for job_id, t in self.tasks.items())
+
+    def start(self, kind, key, params=None, chat_id=None, on_done=None):
+        """Lanza (o continúa desde su checkpoint) el trabajo `kind` para `key`. Devuelve el Job."""
+        handler = self.handlers[kind]
+        job_id = f"{kind}-{key}"
+        task = self.tasks.get(job_id)
+        if task and not task.done(): return self.jobs[job_id]
+
+        job = self._load(job_id)
+        if job and job.status == "done" and handler.run_once:
+            log.info(f"⏭️ {job.title} ya se completó.")
+            return job
+        if not job or job.status == "done":
+            job = Job(job_id, kind, f"{handler.title} {key}".strip(), params, chat_id)
+        elif chat_id:
+            job.chat_id = chat_id
+        return self._launch(job, on_done)
+
+    def resume(self):
+        """Al arrancar: retoma los trabajos que un reinicio dejó a medias."""
+        for name in sorted(os.listdir(self.dir)):
+            if not name.endswith(".json"): continue
+            try:
+                with open(os.path.join(self.dir, name), 'r') as f:
+                    job = Job.from_dict(json.load(f))
+            except Exception as e:
+                log.warning(f"⚠️ Checkpoint ilegible {name}: {e}")
+                continue
+            if job.status != "running" or job.kind not in self.handlers: continue
+            log.info(f"🔁 Reanudando {job.title} ({len(job.done)}/{len(job.units)} hechas)...")
+            self._launch(job)
+
+    def status_text(self):
+        running = [self.jobs[job_id] for job_id, t in self.tasks.items() if not t.done()]
+        if not running: return "💤 No hay trabajos en segundo plano."
+        return "\n".join(job.progress_text() for job in running)
+
+    # --- Ejecución ---
+    def _launch(self, job, on_done=None):
+        self.jobs[job.id] = job
+        self.tasks[job.id] = asyncio.create_task(self._run(job, on_done))
+        return job
+
+    async def _run(self, job, on_done):
+        handler = self.handlers[job.kind]
+        if not handler.quiet: await self._publish(job, job.progress_text())
+        ticker = asyncio.create_task(self._progress_loop(job))
+        try:
+            with metrics.timer("job_seconds", kind=job.kind):
+                if not job.prepared:
+                    job.context = await handler.prepare(job.params) or {}
+                    job.units = await handler.units(job.params, job.context)
+                    job.prepared = True
+                    self._save(job)
+
+                semaphore = asyncio.Semaphore(config.JOB_CONCURRENCY)
+
+                async def run_unit(unit):
+                    async with semaphore:
+                        try:
+                            # Primero el await y después la suma: con `+= await` cada unidad
+                            # concurrente pisaría el informe leído antes de esperar
+                            text = await handler.run_unit(job.params, job.context, unit)
+                            job.report += text or ""
+                            job.done.append(unit)
+                            job.errors.pop(unit, None)
+                        except Exception as e:
+                            log.error(f"❌ {job.title} / {unit}: {e}")
+                            job.errors[unit] = str(e)
+                        self._save(job)  # Checkpoint: un reinicio sigue desde aquí
+
+                await asyncio.gather(*(run_unit(unit) for unit in job.pending()))
+                job.report = await handler.finish(job.params, job.context, job.report) or ""
+            job.status = "failed" if job.errors else "done"
+        except Exception as e:
+            log.error(f"❌ Falló {job.title}: {e}")
+            job.errors["*"] = str(e)
+            job.status = "failed"
+        finally:
+            ticker.cancel()
+            self._save(job)
+
+        await self._report(job, handler)
+        if not handler.run_once:
+            # Solo los de una vez por clave conservan el checkpoint (para no repetirse)
+            try: os.remove(self._path(job.id))
+            except OSError: pass
+        if on_done:
+            try: await on_done()
+            except Exception as e: log.error(f"Error tras {job.title}: {e}")
+
+    async def _progress_loop(self, job):
+        while True:
+            await asyncio.sleep(config.JOB_PROGRESS_SECONDS)
+            await self._publish(job, job.progress_text())
+
+    async def _publish(self, job, text):
+        """Envía el mensaje de progreso la primera vez y después lo edita."""
+        if not job.chat_id or text == job.last_text: return
+        if not telegram_service.client or not telegram_service.is_connected: return
+        try:
+            if job.message_id:
+                await telegram_service.edit_message(job.chat_id, job.message_id, text)
+            else:
+                sent = await telegram_service.send_message(job.chat_id, text)
+                job.message_id = getattr(sent, 'id', None)
+                self._save(job)
+            job.last_text = text
+        except Exception as e:
+            log.warning(f"⚠️ No se pudo informar el progreso de {job.title}: {e}")
+
+    async def _report(self, job, handler):
+        if job.status == "done" and handler.quiet and not job.report and not job.message_id: return
+        icon = "✅" if job.status == "done" else "❌"
+        text = f"{icon} {job.title}: {len(job.done)}/{len(job.units)} completadas en {int(time.time() - job.started_at)}s\n"
+        for unit, error in job.errors.items(): text += f"❌ {unit}: {error}\n"
+        text += job.report
+        # Cortar mensaje si es muy largo para Telegram (max 4096)
+        if len(text) > 4000: text = text[:4000] + "..."
+        await self._publish(job, text)
+
+
+# --- Trabajos del bot ---
+
+class MonthlyMaintenanceJob(JobHandler):
+    title = "🧹 Mantenimiento mensual"
+    run_once = True
+
+    async def prepare(self, params):
+        backlog_id, informe = await async_drive_service.prepare_monthly_maintenance()
+        return {"backlog_id": backlog_id, "informe": informe}
+
+    async def units(self, params, context):
+        return [a for a in await async_drive_service.get_available_folders() if a != "末Settings"]
+
+    async def run_unit(self, params, context, unit):
+        return await async_drive_service.maintain_agency(unit, context["backlog_id"])
+
+    async def finish(self, params, context, report):
+        # Se movieron y borraron carpetas: las resoluciones previas ya no son fiables
+        async_drive_service.invalidate_id_cache()
+        stamp = (datetime.now() - timedelta(hours=3)).strftime('%Y-%m-%d %H:%M:%S')
+        return context.get("informe", "") + report + f"🤖 {stamp}: 🧹 Mantenimiento mensual finalizado.\n"
+
+
+class CreateAgencyJob(JobHandler):
+    title = "🏗️ Crear"
+
+    async def units(self, params, context):
+        return [params["agency"]]
+
+    async def run_unit(self, params, context, unit):
+        ok = await async_drive_service.create_agency_structure(unit)
+        if ok is None: return f"ℹ️ La carpeta `{unit}` ya existía.\n"
+        if not ok: raise Exception("Hubo un error creando las carpetas.")
+        return f"Carpeta `{unit}` creada con éxito.\nYa tiene subcarpetas para éste y el próximo mes.\n"
+
+
+class VisualAuditJob(JobHandler):
+    title = "🎨 Auditoría visual"
+    quiet = True
+
+    async def units(self, params, context):
+        return ["auditoría"]
+
+    async def run_unit(self, params, context, unit):
+        from src.core.scheduler import scheduler
+        # Mientras haya publicaciones o prefetch en curso la auditoría espera
+        informes = await visual_audit.run(busy=lambda: bool(scheduler._publish_tasks or scheduler._prefetch_tasks))
+        # Reporte solo si hubo cambios o errores
+        return informes if "Actualizado" in informes or "❌" in informes else ""
+
+
+job_runner = JobRunner()
+job_runner.register("maintenance", MonthlyMaintenanceJob())
+job_runner.register("create", CreateAgencyJob())
+job_runner.register("audit", VisualAuditJob())
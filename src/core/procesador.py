@@ -1,20 +1,35 @@
-import os, time
-from src.services.drive_service import drive_service, MESES, COLOR_VERDE, COLOR_ROJO
-from src.services.telegram_service import telegram_service
+import os, re, asyncio
+from cachetools import LRUCache
+from src.services.storage_backend import MESES, COLOR_VERDE, COLOR_ROJO
+from src.services.async_drive_service import async_drive_service
+from src.services.telegram_service import telegram_service, PRIORITY_POST
 from src.config.settings import config
 from src.utils.logger import log
+from src.utils.concurrency import ByteBudget
+from src.utils.metrics import metrics
+from src.services.telegram_file_ids import TelegramFileIdStore
+from src.services.media_cache import pinned_media
+from src.services.video_metadata import video_metadata
 from pyrogram.types import InputMediaPhoto, InputMediaVideo
+from pyrogram.errors import BadRequest
 from src.core.scheduler import scheduler
-from hachoir.metadata import extractMetadata
-from hachoir.parser import createParser
 from datetime import datetime, timedelta
 class Processor:
     def __init__(self):
-        self.emojis_map = {}
+        self.emojis_map = {}        # ":alias:" -> tag HTML del emoji premium
+        self.emojis_pattern = None  # Regex compilada con todos los alias
+        self.caption_cache = LRUCache(maxsize=256)  # Caption original -> caption con emojis
+        self.file_ids = TelegramFileIdStore()
+        self._send_locks = {}  # chat -> asyncio.Lock (caption y multimedia de una publicación van juntos)
+
+    def _send_lock(self, chat_id):
+        return self._send_locks.setdefault(chat_id, asyncio.Lock())
 
     def load_emojis_map(self, emojis_content):
         """Convierte el texto de mis_emojis.txt en un diccionario usable"""
         self.emojis_map = {}
+        self.emojis_pattern = None
+        self.caption_cache.clear()
         if not emojis_content:
             return
 
@@ -30,60 +45,79 @@ class Processor:
                 
                 # Asegurar que el alias tenga formato :alias:
                 clean_alias = f":{alias.replace(':', '')}:"
-                self.emojis_map[clean_alias] = emoji_id
+                self.emojis_map[clean_alias] = f'<emoji id="{emoji_id}">⚡</emoji>'
+
+        if self.emojis_map:
+            # Una sola alternancia (los alias más largos primero): el caption se recorre una vez
+            aliases = sorted(self.emojis_map, key=len, reverse=True)
+            self.emojis_pattern = re.compile("|".join(map(re.escape, aliases)))
+        log.info(f"😀 {len(self.emojis_map)} emojis premium cargados.")
 
     def process_text_emojis(self, text):
         """
         Reemplaza los alias :fuego: por Entidades Premium de Telegram.
         """
-        processed_text = text
-        if not self.emojis_map: return processed_text 
-        for alias, emoji_id in self.emojis_map.items():
+        if not self.emojis_pattern or not text: return text
+        processed_text = self.caption_cache.get(text)
+        if processed_text is None:
             # Reemplazar :fuego: por el tag HTML de Telegram
-            html_tag = f'<emoji id="{emoji_id}">⚡</emoji>' 
-            processed_text = processed_text.replace(alias, html_tag)
-            
+            processed_text = self.emojis_pattern.sub(lambda m: self.emojis_map[m.group(0)], text)
+            self.caption_cache[text] = processed_text
         return processed_text
 
-    def get_video_attributes(self, file_path):
+    async def get_video_attributes(self, media, file_path):
         """
         Extrae ancho, alto y duración para que iPhone no aplaste el video.
+        Usa lo que ya informa Drive; hachoir solo si Drive no lo tiene (video aún procesándose).
         """
-        width = 0
-        height = 0
-        duration = 0
-        try:
-            parser = createParser(file_path)
-            if not parser:
-                return 0, 0, 0
-            
-            metadata = extractMetadata(parser)
-            if not metadata:
-                return 0, 0, 0
+        meta = media.get('videoMediaMetadata') or {}
+        if meta.get('width') and meta.get('height'):
+            return int(meta['width']), int(meta['height']), int(meta.get('durationMillis') or 0) // 1000
+        return await video_metadata.get_attributes(media, file_path)
 
-            # Extraer datos
-            if metadata.has("width"): width = metadata.get("width")
-            if metadata.has("height"): height = metadata.get("height")
-            if metadata.has("duration"): duration = metadata.get("duration").seconds
+    async def download_media_files(self, media_files):
+        """
+        Descarga los archivos en paralelo (con tope de descargas y de bytes en vuelo).
+        Devuelve las rutas en el mismo orden que `media_files`; None si alguno falló.
+        """
+        semaphore = asyncio.Semaphore(config.DOWNLOAD_CONCURRENCY)
+        budget = ByteBudget(config.DOWNLOAD_MAX_BYTES_IN_FLIGHT)
 
-            log.info(f"📏 Metadatos video: {width}x{height} | {duration}s")
-            return width, height, duration
-        except Exception as e:
-            log.warning(f"⚠️ No se pudieron leer metadatos de video: {e}")
-            return 0, 0, 0
+        async def fetch(media):
+            size = int(media.get('size') or 0)
+            async with semaphore, budget.reserve(size):
+                return await async_drive_service.download_cached(media)
 
-    async def execute_agency_post(self, agency_folder_name, target_chat_id="me", force_date=None, security_check=True):
+        # return_exceptions: un archivo que falla no cancela las descargas en curso
+        results = await asyncio.gather(*(fetch(m) for m in media_files), return_exceptions=True)
+        paths = []
+        for media, result in zip(media_files, results):
+            if isinstance(result, Exception) or not result:
+                log.error(f"No se pudo descargar '{media['name']}': {result}")
+                paths.append(None)
+            else:
+                paths.append(result)
+        return paths
+
+    async def prepare_agency_post(self, agency_folder_name, force_date=None, security_check=True):
+            """
+            Todo lo previo al envío: resolver carpetas, chequeos de seguridad, caption
+            y descarga de multimedia. Devuelve un PreparedPost listo para `send_prepared_post`.
+            """
             log.info(f"🚀 Procesando agencia: {agency_folder_name}")
 
-            # 1. Buscar carpeta
-            agency_id = drive_service.find_item_id_by_name(config.DRIVE_ROOT_ID, agency_folder_name, is_folder=True, exact_match=True)
+            # 1. Resolver Agencia/Mes/Día (índice en memoria o búsqueda por nombre)
+            target = force_date if force_date else (datetime.now() - timedelta(hours=3))
+            month_name = MESES[target.month]
+            day_str = f"{target.day:02d}" # Ej: 06
+            agency_id, month_id, day_id = await async_drive_service.resolve_day_folder(agency_folder_name, month_name, day_str)
             if not agency_id: 
                 msg = f"Carpeta '{agency_folder_name}' no encontrada."
                 # await telegram_service.send_message_to_me(msg, destiny_chat_id=scheduler.alert_channel_id)
                 raise Exception(msg)
 
             # 2. Listar contenido
-            files = drive_service.list_files_in_folder(agency_id)
+            files = await async_drive_service.list_files_in_folder(agency_id)
             if not files: 
                 msg = f"La carpeta '{agency_folder_name}' está vacía."
                 # await telegram_service.send_message_to_me(msg, destiny_chat_id=scheduler.alert_channel_id)
@@ -95,40 +129,33 @@ class Processor:
 
             # 3. Clasificar
             for f in files:
-                name = f['name'].lower()
-                mime = f['mimeType']
-                if name.startswith('caption') and (name.endswith('.txt') or mime == 'application/vnd.google-apps.document'):
-                    caption_text = drive_service.get_text_content(f['id'])
+                if self._is_caption(f):
+                    caption_text = await async_drive_service.get_text_content(f['id'])
                     break # Solo necesitamos un caption
             
             # --- BUSCAR MULTIMEDIA (En la fecha de hoy) ---
-            target = force_date if force_date else (datetime.now() - timedelta(hours=3))
-            month_name = MESES[target.month]
-            day_str = f"{target.day:02d}" # Ej: 06
-            
             log.info(f"📅 Buscando en: {agency_folder_name}/{month_name}/{day_str}")
             
-            # Buscar carpeta del Mes
-            month_id = drive_service.find_item_id_by_name(agency_id, month_name, is_folder=True, exact_match=True)
+            # Carpeta del Mes
             if not month_id: 
                 msg = f"No existe la carpeta del mes `{month_name}`."
                 # await telegram_service.send_message_to_me(msg, destiny_chat_id=scheduler.alert_channel_id)
                 raise Exception(msg)
             
-            # Buscar carpeta del Día
-            day_id = drive_service.find_item_id_by_name(month_id, day_str, is_folder=True, exact_match=True)
+            # Carpeta del Día
             if not day_id: 
                 msg = f"No existe la carpeta del día `{day_str}`."
                 # await telegram_service.send_message_to_me(msg, destiny_chat_id=scheduler.alert_channel_id)
                 raise Exception(msg)
             
             # Seguridad: Verificar color de la carpeta
+            current_color = None
             if security_check:
                 # Solo publicar si el color es VERDE
-                current_color = drive_service.get_folder_color_hex(day_id)
-                time.sleep(0.1)  # Pequeña espera para evitar rate limits
-                count_files = drive_service.count_media_files_in_folder(day_id)
-                time.sleep(0.1)  # Pequeña espera para evitar rate limits
+                current_color = await async_drive_service.get_folder_color_hex(day_id)
+                await asyncio.sleep(0.1)  # Pequeña espera para evitar rate limits
+                count_files = await async_drive_service.count_media_files_in_folder(day_id)
+                await asyncio.sleep(0.1)  # Pequeña espera para evitar rate limits
                 
                 # Si no es verde o no tiene la cantidad correcta de archivos, no publicar
                 if current_color != COLOR_VERDE and int(count_files) != int(config.MULTIMEDIA_COUNT):
@@ -137,104 +164,235 @@ class Processor:
                     raise Exception(msg)
                 
             # Listar contenido del DÍA
-            day_files = drive_service.list_files_in_folder(day_id)
+            day_files = await async_drive_service.list_files_in_folder(day_id)
             day_files.sort(key=lambda x: x['name']) # Ordenar 1, 2, 3
             
-            media_files = [f for f in day_files if 'image' in f['mimeType'] or 'video' in f['mimeType']]
+            media_files = self._media_of(day_files)
             
             if not media_files and not caption_text: 
                 msg = f"{agency_folder_name}: \nNo hay contenido multimedia ni caption para enviar."
-                await telegram_service.send_message_to_me(msg, destiny_chat_id=scheduler.alert_channel_id)
                 raise Exception(msg)
             
             # 4. Procesar
             final_caption = self.process_text_emojis(caption_text)
-            local_paths = [] # Para borrar después
-            
-            # 5. Enviar
+
+            # No foto o No texto, no enviar nada
+            if not media_files or not final_caption:
+                msg = f"{agency_folder_name}: \nNo hay contenido multimedia para enviar."
+                raise Exception(msg)
+
+            # 5. Multimedia: lo ya subido a Telegram se reenvía por file_id, el resto se descarga
+            file_ids = [self.file_ids.get(m) for m in media_files]
+            pending = [m for m, fid in zip(media_files, file_ids) if not fid]
+            if len(media_files) == 1 and pending:
+                media = media_files[0]
+                local_path = await async_drive_service.download_cached(media)
+                if not local_path: 
+                    msg = f"No se pudo descargar el archivo '{media['name']}'."
+                    raise Exception(msg)
+                local_paths = [local_path]
+            else:
+                log.info(f"📚 Preparando álbum de {len(media_files)} archivos ({len(media_files) - len(pending)} ya en Telegram)...")
+                downloaded = iter(await self.download_media_files(pending))
+                local_paths = [None if fid else next(downloaded) for fid in file_ids]
+
+            prepared = PreparedPost(agency_folder_name, target, final_caption, media_files, local_paths, file_ids)
+            if security_check:
+                # Para reconocer después si cambió algo (ver is_current)
+                prepared.source = (agency_id, day_id)
+                prepared.signature = self._signature(files, media_files, current_color)
+            return prepared
+
+    @staticmethod
+    def _is_caption(f):
+        name = f['name'].lower()
+        return name.startswith('caption') and (name.endswith('.txt') or f['mimeType'] == 'application/vnd.google-apps.document')
+
+    @staticmethod
+    def _media_of(day_files):
+        return [f for f in day_files if 'image' in f['mimeType'] or 'video' in f['mimeType']]
+
+    def _signature(self, files, media_files, color):
+        """Versión de lo que se publica: captions, multimedia del día y color de la carpeta."""
+        captions = sorted((f['id'], f.get('modifiedTime')) for f in files if self._is_caption(f))
+        media = [(f['id'], f.get('md5Checksum') or f.get('modifiedTime')) for f in media_files]
+        return (captions, media, color)
+
+    async def is_current(self, prepared):
+        """
+        Antes de enviar algo preparado de antemano: ¿siguen igual el caption, la multimedia
+        y el color del día? Solo lista las dos carpetas (no descarga nada).
+        """
+        if not prepared.signature: return False
+        target = prepared.target_date
+        try:
+            ids = await async_drive_service.resolve_day_folder(prepared.folder, MESES[target.month], f"{target.day:02d}")
+            agency_id, day_id = prepared.source
+            if (ids[0], ids[2]) != (agency_id, day_id): return False
+            files, day_files, color = await asyncio.gather(
+                async_drive_service.list_files_in_folder(agency_id),
+                async_drive_service.list_files_in_folder(day_id),
+                async_drive_service.get_folder_color_hex(day_id),
+            )
+        except Exception as e:
+            log.warning(f"⚠️ No se pudo verificar {prepared.folder} antes de publicar: {e}")
+            return False
+        day_files.sort(key=lambda x: x['name'])
+        return self._signature(files, self._media_of(day_files), color) == prepared.signature
+
+    async def send_prepared_post(self, prepared, target_chat_id="me", on_send=None):
+            """
+            Solo la parte de Telegram: caption + foto/video/álbum ya descargados. Devuelve los bytes subidos.
+            `on_send` se llama justo antes del primer envío (desde ahí la publicación ya es visible).
+            """
+            agency_folder_name = prepared.folder
+            final_caption = prepared.caption
+
+            # 6. Enviar
             try:
-                log.info(f"Enviando a {target_chat_id}...")
+                # Dos publicaciones al mismo chat no se intercalan (caption de una con el álbum de otra)
+                async with self._send_lock(target_chat_id):
+                    log.info(f"Enviando a {target_chat_id}...")
+                    if on_send: on_send()
+
+                    # Caso A: Solo Texto
+                    if final_caption:
+                        await telegram_service.send_message(target_chat_id, final_caption, priority=PRIORITY_POST)
+                        log.info("✅ Mensaje de texto enviado.")
+
+                    try:
+                        await self._send_media(prepared, target_chat_id)
+                    except BadRequest as e:
+                        # Un file_id caducado o inválido: se olvidan, se descarga y se sube de nuevo
+                        if not any(prepared.file_ids): raise
+                        log.warning(f"⚠️ file_id rechazado por Telegram ({e}), subiendo de nuevo...")
+                        for media in prepared.media_files: self.file_ids.forget(media)
+                        missing = [m for m, p in zip(prepared.media_files, prepared.local_paths) if not p]
+                        downloaded = list(await self.download_media_files(missing))
+                        pinned_media.pin(downloaded)
+                        downloaded = iter(downloaded)
+                        prepared.local_paths = [p if p else next(downloaded) for p in prepared.local_paths]
+                        prepared.file_ids = [None] * len(prepared.media_files)
+                        await self._send_media(prepared, target_chat_id)
+                sent_bytes = prepared.upload_bytes()
+                metrics.inc("telegram_upload_bytes_total", sent_bytes)
+                return sent_bytes
                 
-                # No foto o No texto, no enviar nada
-                if not media_files or not final_caption:
-                    msg = f"{agency_folder_name}: \nNo hay contenido multimedia para enviar."
-                    await telegram_service.send_message_to_me(msg, destiny_chat_id=scheduler.alert_channel_id)
-                    raise Exception(msg)
+            except Exception as e:
+                log.error(f"Error Telegram: {e}")
+                raise e
+            finally:
+                prepared.cleanup()
+
+    async def _send_media(self, prepared, target_chat_id):
+            agency_folder_name = prepared.folder
+            media_files = prepared.media_files
+
+            # Caso B: Un solo archivo (Foto o Video)
+            if len(media_files) == 1:
+                media = media_files[0]
+                file_id = prepared.file_ids[0]
+                local_path = prepared.local_paths[0]
                 
-                # Caso A: Solo Texto
-                if final_caption:
-                    await telegram_service.client.send_message(target_chat_id, final_caption)
-                    log.info("✅ Mensaje de texto enviado.")
-
-                # Caso B: Un solo archivo (Foto o Video)
-                if len(media_files) == 1:
-                    media = media_files[0]
-                    local_path = drive_service.download_file(media['id'], media['name'])
-                    if not local_path: 
-                        msg = f"No se pudo descargar el archivo '{media['name']}'."
-                        await telegram_service.send_message_to_me(msg, destiny_chat_id=scheduler.alert_channel_id)
-                        raise Exception(msg)
-                    local_paths.append(local_path)
-                    
-                    if 'image' in media['mimeType']:
-                        await telegram_service.client.send_photo(target_chat_id, photo=local_path)
-                    elif 'video' in media['mimeType']:
+                if 'image' in media['mimeType']:
+                    sent = await telegram_service.send_photo(target_chat_id, photo=file_id or local_path)
+                elif 'video' in media['mimeType']:
+                    if file_id:
+                        # Telegram ya conoce las dimensiones del video subido
+                        sent = await telegram_service.send_video(target_chat_id, video=file_id, supports_streaming=True)
+                    else:
                         # FIX IPHONE: Inyectar metadatos
-                        w, h, dur = self.get_video_attributes(path)
-                        await telegram_service.client.send_video(
+                        w, h, dur = await self.get_video_attributes(media, local_path)
+                        sent = await telegram_service.send_video(
                             target_chat_id, 
-                            video=path,
+                            video=local_path,
                             width=w, 
                             height=h, 
                             duration=dur,
                             supports_streaming=True
                         )
-                        log.info("✅ Multimedia única enviada.")
-                    
-                    log.info("✅ Archivo único enviado.")
+                    log.info("✅ Multimedia única enviada.")
+                if not file_id: self.file_ids.remember(media, sent)
                 
-                # CASO C: Álbum (Múltiples archivos) - NUEVO
-                else:
-                    input_media_group = []
-                    log.info(f"📚 Preparando álbum de {len(media_files)} archivos...")
-
-                    for media in media_files:
-                        path = drive_service.download_file(media['id'], media['name'])
-                        if not path: continue
-                        local_paths.append(path)
-
-                        if 'image' in media['mimeType']:
-                            input_media_group.append(InputMediaPhoto(path))
-                        elif 'video' in media['mimeType']:
-                                # FIX IPHONE: Inyectar metadatos en el álbum
-                                w, h, dur = self.get_video_attributes(path)
-                                input_media_group.append(InputMediaVideo(
-                                    path, 
-                                    width=w, 
-                                    height=h, 
-                                    duration=dur,
-                                    supports_streaming=True
-                                ))
-                    if input_media_group:
-                        await telegram_service.client.send_media_group(target_chat_id, media=input_media_group)
-                        await telegram_service.client.send_message(
-                            scheduler.alert_channel_id,
-                            f"📅{(datetime.now() - timedelta(hours=3)).strftime('%Y-%m-%d %H:%M:%S')}: 🤖 **Bot** \n{agency_folder_name}: Álbum de {len(input_media_group)} archivos enviado."
-                            )
-                        log.info("✅ Álbum enviado.")
+                log.info("✅ Archivo único enviado.")
+            
+            # CASO C: Álbum (Múltiples archivos) - NUEVO
+            else:
+                input_media_group = []
+                sent_media = []
+
+                for media, path, file_id in zip(media_files, prepared.local_paths, prepared.file_ids):
+                    if not path and not file_id: continue
+
+                    if 'image' in media['mimeType']:
+                        input_media_group.append(InputMediaPhoto(file_id or path))
+                    elif 'video' in media['mimeType']:
+                        if file_id:
+                            input_media_group.append(InputMediaVideo(file_id, supports_streaming=True))
+                        else:
+                            # FIX IPHONE: Inyectar metadatos en el álbum
+                            w, h, dur = await self.get_video_attributes(media, path)
+                            input_media_group.append(InputMediaVideo(
+                                path, 
+                                width=w, 
+                                height=h, 
+                                duration=dur,
+                                supports_streaming=True
+                            ))
                     else:
-                        pass 
-                    # Exception("No se pudieron procesar los archivos del álbum.")
-                
-            except Exception as e:
-                log.error(f"Error Telegram: {e}")
-                raise e
-            finally:
-            # Limpieza: Borrar todos los archivos descargados
-                for p in local_paths:
-                    if os.path.exists(p):
-                        try: os.remove(p)
-                        except: pass
+                        continue
+                    sent_media.append((media, file_id))
+                if input_media_group:
+                    messages = await telegram_service.send_media_group(target_chat_id, media=input_media_group)
+                    # Guardar los file_id nuevos para no volver a subir estos bytes
+                    self.file_ids.remember_all([(media, message) for (media, file_id), message in zip(sent_media, messages or []) if not file_id])
+                    await telegram_service.send_message(
+                        scheduler.alert_channel_id,
+                        f"📅{(datetime.now() - timedelta(hours=3)).strftime('%Y-%m-%d %H:%M:%S')}: 🤖 **Bot** \n{agency_folder_name}: Álbum de {len(input_media_group)} archivos enviado."
+                        )
+                    log.info("✅ Álbum enviado.")
+                else:
+                    pass 
+                # Exception("No se pudieron procesar los archivos del álbum.")
+
+    async def execute_agency_post(self, agency_folder_name, target_chat_id="me", force_date=None, security_check=True, on_send=None):
+            prepared = await self.prepare_agency_post(agency_folder_name, force_date=force_date, security_check=security_check)
+            return await self.send_prepared_post(prepared, target_chat_id=target_chat_id, on_send=on_send)
+
+
+class PreparedPost:
+    """Publicación lista para enviar: caption procesado y multimedia ya en disco."""
+    def __init__(self, folder, target_date, caption, media_files, local_paths, file_ids=None):
+        self.folder = folder
+        self.target_date = target_date
+        self.caption = caption
+        self.media_files = media_files
+        self.local_paths = local_paths
+        # file_id de Telegram ya conocido por archivo (None = hay que subirlo)
+        self.file_ids = file_ids or [None] * len(media_files)
+        self.prepared_at = datetime.now()
+        self.source = None      # (agency_id, day_id) de donde salió
+        self.signature = None   # Ver Processor.is_current
+        # Mientras viva, la caché multimedia no desaloja sus archivos
+        pinned_media.pin(local_paths)
+
+    def is_for(self, date):
+        return self.target_date.date() == date.date()
+
+    def upload_bytes(self):
+        """Bytes que se subieron de verdad (lo enviado por file_id no cuenta)."""
+        return sum(
+            os.path.getsize(path) for path, file_id in zip(self.local_paths, self.file_ids)
+            if path and not file_id and os.path.exists(path)
+        )
+
+    def cleanup(self):
+        pinned_media.unpin(self.local_paths)
+        # Limpieza: Borrar las descargas temporales (lo cacheado en DATA_DIR se conserva)
+        for p in self.local_paths:
+            if p and p.startswith(config.DOWNLOADS_DIR) and os.path.exists(p):
+                try: os.remove(p)
+                except: pass
 
 # Instancia Global
 processor = Processor()
\ No newline at end of file
@@ -1,12 +1,16 @@
-import time
+import asyncio
 import json
+import time
 import re
 import os
-from src.services.drive_service import drive_service
+from src.services.async_drive_service import async_drive_service
 from src.services.telegram_service import telegram_service
+from src.services.publication_store import publication_store
+from src.core.job_runner import job_runner
 from datetime import datetime, timedelta
 from src.config.settings import config
 from src.utils.logger import log
+from src.utils.metrics import metrics
 
 AUDIT_HOURS = [
     "12:15", # "12:45",
@@ -17,6 +21,7 @@ AUDIT_HOURS = [
     "17:15", # "17:45",
     "18:15" # "18:45"
 ]  # Horas para auditoría visual
+JOB_KINDS = ("test", "prefetch", "real")  # Prefijos de los ids de jobs de publicación
 
 class Scheduler:
     def __init__(self):
@@ -25,11 +30,21 @@ class Scheduler:
         self.chat_ids = {}         # Caché de IDs {nombre: id}
         self.admin_ids = []        # Lista de IDs permitidos
         self.target_channel_id = None # ID del canal emisor principal
-        self.published_log = []
+        self.published_log = set()  # Carpetas ya publicadas hoy (espejo de publication_store)
+        self.sending = set()        # Publicaciones cuyo envío ya empezó (el caption puede estar en el canal)
         self.alert_channel_id = None # Canal para alertas
         self.publish_test = None    # Canal para publicaciones de testeo
+        self.prepared_posts = {}    # Publicaciones ya preparadas (prefetch) {carpeta: PreparedPost}
+        self.prefetch_alerted = set()
+        self._prefetch_tasks = {}
+        self._publish_tasks = {}    # Publicaciones en curso {(tipo, carpeta): Task}
+        self._publish_semaphore = asyncio.Semaphore(config.MAX_CONCURRENT_PUBLICATIONS)
+        self._state_lock = asyncio.Lock()
+        self.aps = None             # APScheduler: un job por publicación (ver attach)
+        self.audits_done = set()    # AUDIT_HOURS ya cubiertas hoy
         
-        self.state_file = os.path.join(config.DATA_DIR, "published_state.json")
+        self.store = publication_store
+        self.state_file = os.path.join(config.DATA_DIR, "published_state.json")  # Formato anterior (se migra)
         self.config_cache_file = os.path.join(config.DATA_DIR, "config_cache.json")
 
         self._load_state()
@@ -38,13 +53,8 @@ class Scheduler:
         """Carga estado previo."""
         today = (datetime.now() - timedelta(hours=3)).strftime("%Y-%m-%d")
         
-        if os.path.exists(self.state_file):
-            try:
-                with open(self.state_file, 'r') as f:
-                    data = json.load(f)
-                    if data.get("date") == today:
-                        self.published_log = data.get("published", [])
-            except: pass
+        self.store.import_legacy_state(self.state_file)
+        self.published_log = self.store.published_on(today)
             
         if os.path.exists(self.config_cache_file):
             try:
@@ -59,22 +69,18 @@ class Scheduler:
                         log.info("🔄 Configuración cargada desde caché local.")
             except: pass
 
-    def _save_state(self, update_config=False):
+    def _save_config_cache(self):
         today = (datetime.now() - timedelta(hours=3)).strftime("%Y-%m-%d")
         
-        with open(self.state_file, 'w') as f:
-            json.dump({"date": today, "published": self.published_log}, f, indent=4)
-        
-        if update_config:
-            with open(self.config_cache_file, 'w') as f:
-                json.dump({
-                    "date": today, 
-                    "schedule": self.schedule_map,
-                    "admins": self.admin_ids,
-                    "emisor": self.target_channel_id,
-                    "alert": self.alert_channel_id,
-                    "publish_test": self.publish_test
-                }, f, indent=4)
+        with open(self.config_cache_file, 'w') as f:
+            json.dump({
+                "date": today, 
+                "schedule": self.schedule_map,
+                "admins": self.admin_ids,
+                "emisor": self.target_channel_id,
+                "alert": self.alert_channel_id,
+                "publish_test": self.publish_test
+            }, f, indent=4)
 
     def _parse_custom_config(self, text):
         """
@@ -137,17 +143,27 @@ class Scheduler:
         log.info("📥 Descargando config de Drive...")
         
         # Buscar carpeta Settings
-        settings_folder_id = drive_service.find_item_id_by_name(config.DRIVE_ROOT_ID, "末Settings", is_folder=True)
+        settings_folder_id = await async_drive_service.find_item_id_by_name(config.DRIVE_ROOT_ID, "末Settings", is_folder=True)
         if not settings_folder_id:
             log.error("❌ No se encontró carpeta Settings.")
             return
 
         # Descargar archivos
-        sch_id = drive_service.find_item_id_by_name(settings_folder_id, config.FILE_SCHEDULE)
-        chat_ids_id = drive_service.find_item_id_by_name(settings_folder_id, config.FILE_CHAT_IDS)
+        sch_id, chat_ids_id, emojis_id = await asyncio.gather(
+            async_drive_service.find_item_id_by_name(settings_folder_id, config.FILE_SCHEDULE),
+            async_drive_service.find_item_id_by_name(settings_folder_id, config.FILE_CHAT_IDS),
+            async_drive_service.find_item_id_by_name(settings_folder_id, config.FILE_EMOJIS),
+        )
         
-        raw_schedule = drive_service.get_text_content(sch_id) if sch_id else ""
-        raw_chat_ids = drive_service.get_text_content(chat_ids_id) if chat_ids_id else ""
+        raw_schedule, raw_chat_ids, raw_emojis = await asyncio.gather(
+            async_drive_service.get_text_content(sch_id) if sch_id else asyncio.sleep(0, ""),
+            async_drive_service.get_text_content(chat_ids_id) if chat_ids_id else asyncio.sleep(0, ""),
+            async_drive_service.get_text_content(emojis_id) if emojis_id else asyncio.sleep(0, ""),
+        )
+
+        # Emojis premium: se compilan una vez por recarga
+        from src.core.procesador import processor
+        processor.load_emojis_map(raw_emojis)
 
         # 1. Parsear Schedule
         self.schedule_map = {}
@@ -159,9 +175,14 @@ class Scheduler:
         # 2. Parsear Chat IDs (Admins y Emisor)
         self.admin_ids, self.target_channel_id, self.alert_channel_id, self.publish_test = self._parse_custom_config(raw_chat_ids)
         log.info(f"✅ Config cargada: {len(self.schedule_map)} tareas \n{len(self.admin_ids)} admins \nPublicar: {self.target_channel_id} \nAlertas: {self.alert_channel_id} \nPublicacion de Testeo: {self.publish_test}")
-        self._save_state(update_config=True)
+        self._save_config_cache()
+        self._rebuild_jobs()
 
     async def check_and_run(self):
+        with metrics.timer("scheduler_tick_seconds"):
+            await self._tick()
+
+    async def _tick(self):
         now = datetime.now() - timedelta(hours=3)
         today = now.strftime("%Y-%m-%d")
         curr_time = now.strftime("%H:%M")
@@ -169,74 +190,216 @@ class Scheduler:
         
         log.info(f"⏰ Scheduler revisando tareas. Ahora: {now}... (Testing: {test_time})")
 
-    # 1. Auditoría Visual (si aplica)
-        # if curr_time in AUDIT_HOURS:
-        #     # Ejecutamos en segundo plano la auditoría visual
-        #     try:
-        #         smg = f"🤖 {now.strftime('%Y-%m-%d %H:%M:%S')}: 🔍 Iniciando auditoría visual de carpetas...\n El bot estara ocupado aproximadamente 10 minutos"
-        #         log.info("🔍 Iniciando auditoría visual de carpetas...")
-        #         await telegram_service.send_message_to_me(smg, destiny_chat_id=self.alert_channel_id)
-                
-        #         informes = drive_service.run_visual_audit()
-        #         if informes:
-        #             # Enviar reporte solo si hubo cambios/errores relevantes (opcional: o siempre)
-        #             # Cortar mensaje si es muy largo para Telegram (max 4096)
-        #             if len(informes) > 4000: informes = informes[:4000] + "..."
-        #             await telegram_service.send_message_to_me(f"✅ Auditoría visual completada. Informes generados:\n{informes}", destiny_chat_id=self.alert_channel_id)
-        #     except Exception as e:
-        #         log.error(f"Error auditoría visual: {e}")
-        #         await telegram_service.send_message_to_me(f"❌ Error en auditoría visual: {e}", destiny_chat_id=self.alert_channel_id)
-        
-        # 2. Reinicio diario de publish_log
+        # 1. Reinicio diario de publish_log
         if self.current_date != today:
+            # En el primer tick tras arrancar no hay nada de otro día que limpiar
+            # (y lo publicado por la recuperación de attach no debe olvidarse)
+            if self.current_date is not None:
+                self.published_log = self.store.published_on(today)
+                self.sending = set()
+                for prepared in self.prepared_posts.values(): prepared.cleanup()
+                self.prepared_posts = {}
+                self.prefetch_alerted = set()
             self.current_date = today
-            self.published_log = []
-            # --- MANTENIMIENTO MENSUAL ---
+            self.audits_done = set()
+            # --- MANTENIMIENTO MENSUAL (en segundo plano, reanudable; una vez por mes) ---
             if now.day == 1:
-                log.info("🗓️ Es día 1. Iniciando limpieza de Backlog...")
-                # Lo corremos en un thread aparte para no bloquear el bot si tarda mucho
-                # O simplemente lo llamamos directo si confiamos en la velocidad
-                try:
-                    await telegram_service.send_message_to_me(f"🤖 {now.strftime('%Y-%m-%d %H:%M:%S')}:🗑️ Iniciando Mantenimiento Mensual de Drive...", destiny_chat_id=self.alert_channel_id)
-                    informes = drive_service.run_monthly_maintenance()
-                    await self.load_daily_config()
-                    await telegram_service.send_message_to_me(f"🗑️ Mantenimiento Mensual completado. Informes limpiados: \n{informes}", destiny_chat_id=self.alert_channel_id)
-                except Exception as e:
-                    log.error(f"Fallo en mantenimiento mensual: {e}")
-                    await telegram_service.send_message_to_me(f"❌ Error en Mantenimiento Mensual: {e}", destiny_chat_id=self.alert_channel_id)
-                # -----------------------------
+                log.info("🗓️ Es día 1. Lanzando mantenimiento mensual en segundo plano...")
+                job_runner.start("maintenance", today[:7], chat_id=self.alert_channel_id or "me", on_done=self.load_daily_config)
             
-            self._save_state()
+            self._rebuild_jobs()
+
+        # 2. Auditoría Visual incremental en segundo plano (no frena el tick ni las publicaciones)
+        if self._audit_due(curr_time) and not job_runner.is_running("audit"):
+            job_runner.start("audit", f"{today} {curr_time}", chat_id=self.alert_channel_id or "me")
           
-        # 3 Chequear Horarios para publicaciones
+        # 3. Con APScheduler cada publicación tiene sus propios jobs; sin él, se revisa en cada tick
+        if not self.aps:
+            self._poll_due(now)
+        else:
+            self._retry_due(now)
+
+    def _audit_due(self, curr_time):
+        """Hay auditoría si pasó alguna de AUDIT_HOURS (aunque el tick no caiga justo en esa hora)."""
+        due = [h for h in AUDIT_HOURS if h <= curr_time and h not in self.audits_done]
+        self.audits_done.update(due)
+        return bool(due)
+
+    def _poll_due(self, now):
+        """Modo sin APScheduler: compara la hora actual con cada entrada del schedule."""
+        curr_time = now.strftime("%H:%M")
+        test_time = (now + timedelta(hours=2)).strftime("%H:%M")
         for folder, time_trigger in self.schedule_map.items(): 
+            # Prefetch: dejar listo lo que se publica en los próximos minutos
+            if 0 < self._minutes_until(time_trigger, now) <= config.PREFETCH_LEAD_MINUTES:
+                self._dispatch("prefetch", folder, time_trigger)
             # Publicaciones testing 2 horas antes de la publicación real
-            try:
-                if test_time == time_trigger:
-                    smg = f"🤖 {now.strftime('%Y-%m-%d %H:%M:%S')}:⏰ **TESTING** Publicando carpeta programada: {folder} Para las {now.month:02d}/{now.day:02d} {time_trigger}\n"
-                    smg += f"-------------------------------------------------------------------\n"
-                    log.info(f"⏰ **TESTING** Publicando: {folder}")
-                    await telegram_service.send_message_to_me(smg, destiny_chat_id=self.alert_channel_id)
-                    from src.core.procesador import processor
-                    await processor.execute_agency_post(folder, target_chat_id=self.alert_channel_id)     
-            except Exception as e:
-                smg = f"❌ Error en **TESTING** publicando {folder}: {e}"
-                log.error(smg)
-                await telegram_service.send_message_to_me(smg, destiny_chat_id=self.alert_channel_id)
-                #Continua con las otras carpetas
-                continue
-            
+            if test_time == time_trigger:
+                self._dispatch("test", folder, time_trigger)
             # Publicación real
-            try:
-                if time_trigger <= curr_time:
-                    if folder not in self.published_log:
-                        await telegram_service.send_message_to_me(f"🤖 {now.strftime('%Y-%m-%d %H:%M:%S')}:⏰ Publicando carpeta programada: {folder} Para las {now.month:02d}/{now.day:02d} {time_trigger}", destiny_chat_id=self.alert_channel_id)
-                        await self._trigger_publication(folder)
-            except Exception as e:
-                log.error(f"❌ Error publicando {folder}: {e}")
-                await telegram_service.send_message_to_me(f"❌ Error publicando {folder}: {e}", destiny_chat_id=self.alert_channel_id)
-                #Continua con las otras carpetas
+            if time_trigger <= curr_time:
+                self._dispatch("real", folder, time_trigger)
+
+    def _retry_due(self, now):
+        """
+        Con APScheduler: una publicación real vencida que falló o se canceló por timeout
+        vuelve a lanzarse en cada tick hasta salir (lo ya publicado o en curso se saltea).
+        """
+        curr_time = now.strftime("%H:%M")
+        for folder, time_trigger in self.schedule_map.items():
+            if time_trigger <= curr_time:
+                self._dispatch("real", folder, time_trigger)
+
+    def attach(self, aps_scheduler):
+        """Dispara cada publicación con jobs de fecha exacta en lugar de revisar cada minuto."""
+        self.aps = aps_scheduler
+        self._rebuild_jobs()
+
+    def _rebuild_jobs(self):
+        """
+        Compila schedule_map en jobs 'date' de APScheduler (testing, prefetch y real).
+        Lo que ya pasó hoy y no se publicó se lanza en el momento (recuperación); si
+        falla, `_retry_due` lo reintenta en cada tick. Un TESTING vencido (arranque o
+        reload después de su hora) no se recupera: ya no anticipa nada.
+        """
+        if not self.aps: return
+        for job in self.aps.get_jobs():
+            if job.id.split(':', 1)[0] in JOB_KINDS: job.remove()
+
+        now = datetime.now() - timedelta(hours=3)
+        jobs = skipped_tests = 0
+        for folder, time_trigger in self.schedule_map.items():
+            trigger_dt = self._trigger_datetime(time_trigger, now)
+            if not trigger_dt:
+                log.warning(f"⚠️ Horario inválido para {folder}: '{time_trigger}'")
                 continue
+            plan = [
+                ("test", trigger_dt - timedelta(hours=2)),
+                ("prefetch", trigger_dt - timedelta(minutes=config.PREFETCH_LEAD_MINUTES)),
+                ("real", trigger_dt),
+            ]
+            for kind, run_at in plan:
+                if kind == "test" and run_at.date() < now.date():
+                    # Horarios antes de las 02:00: el TESTING cae hoy a la noche, como en modo polling
+                    run_at += timedelta(days=1)
+                if run_at > now:
+                    self.aps.add_job(
+                        self._fire, trigger='date',
+                        # La hora del schedule es local (UTC-3); el job va en hora del sistema
+                        run_date=run_at + timedelta(hours=3),
+                        args=[kind, folder, time_trigger],
+                        id=f"{kind}:{folder}", replace_existing=True,
+                        misfire_grace_time=None, coalesce=True
+                    )
+                    jobs += 1
+                elif kind == "real" or (kind == "prefetch" and trigger_dt > now):
+                    self._dispatch(kind, folder, time_trigger)
+                elif kind == "test":
+                    skipped_tests += 1
+        log.info(f"🗓️ {jobs} jobs de publicación programados para hoy.")
+        if skipped_tests: log.info(f"⏭️ {skipped_tests} TESTING ya vencidos no se lanzan.")
+
+    async def _fire(self, kind, folder, time_trigger):
+        self._dispatch(kind, folder, time_trigger)
+
+    def _dispatch(self, kind, folder, time_trigger):
+        # El TESTING de un horario antes de las 02:00 corre de noche, con la real de hoy ya publicada
+        if kind != "test" and folder in self.published_log: return
+        if kind == "prefetch":
+            if folder in self.prepared_posts or folder in self._prefetch_tasks: return
+            self._prefetch_tasks[folder] = asyncio.create_task(self._prefetch(folder, time_trigger))
+        elif kind == "test":
+            self._launch("test", folder, self._publish_testing, folder, time_trigger)
+        else:
+            self._launch("real", folder, self._publish_scheduled, folder, time_trigger)
+
+    def _launch(self, kind, folder, func, *args):
+        """Lanza la publicación como tarea propia, salvo que ya esté en curso de un tick anterior."""
+        key = (kind, folder)
+        if key in self._publish_tasks: return
+        self._publish_tasks[key] = asyncio.create_task(self._run_limited(key, func, *args))
+
+    async def _run_limited(self, key, func, *args):
+        kind, folder = key
+        try:
+            async with self._publish_semaphore:
+                await asyncio.wait_for(func(*args), timeout=config.PUBLICATION_TIMEOUT)
+        except asyncio.TimeoutError:
+            error = f"superó {config.PUBLICATION_TIMEOUT}s y se canceló"
+            if kind == "real" and folder in self.sending:
+                # El caption ya salió: reintentarla duplicaría la publicación en el canal
+                await self._record_partial(folder, kind, self.schedule_map.get(folder), error)
+                smg = f"⚠️ {folder} {error} a mitad del envío. Revisar el canal: no se reintenta."
+            else:
+                today = (datetime.now() - timedelta(hours=3)).strftime("%Y-%m-%d")
+                self.store.record(folder, today, kind, "timeout",
+                                  target_chat=self.alert_channel_id if kind == "test" else self.target_channel_id,
+                                  scheduled_time=self.schedule_map.get(folder), error=error)
+                smg = f"❌ {folder} ({'TESTING' if kind == 'test' else 'publicación'}) {error}."
+            log.error(smg)
+            await telegram_service.send_message_to_me(smg, destiny_chat_id=self.alert_channel_id)
+        except Exception as e:
+            smg = f"❌ Error en {'**TESTING**' if kind == 'test' else ''} publicando {folder}: {e}"
+            log.error(smg)
+            await telegram_service.send_message_to_me(smg, destiny_chat_id=self.alert_channel_id)
+        finally:
+            self._publish_tasks.pop(key, None)
+
+    async def _publish_testing(self, folder, time_trigger):
+        now = datetime.now() - timedelta(hours=3)
+        smg = f"🤖 {now.strftime('%Y-%m-%d %H:%M:%S')}:⏰ **TESTING** Publicando carpeta programada: {folder} Para las {now.month:02d}/{now.day:02d} {time_trigger}\n"
+        smg += f"-------------------------------------------------------------------\n"
+        log.info(f"⏰ **TESTING** Publicando: {folder}")
+        await telegram_service.send_message_to_me(smg, destiny_chat_id=self.alert_channel_id)
+        from src.core.procesador import processor
+        started = time.monotonic()
+        try:
+            sent_bytes = await processor.execute_agency_post(folder, target_chat_id=self.alert_channel_id)
+        except Exception as e:
+            self.store.record(folder, now.strftime("%Y-%m-%d"), "test", "error", target_chat=self.alert_channel_id,
+                              scheduled_time=time_trigger, duration_seconds=round(time.monotonic() - started, 1), error=str(e))
+            raise
+        self.store.record(folder, now.strftime("%Y-%m-%d"), "test", "ok", target_chat=self.alert_channel_id,
+                          scheduled_time=time_trigger, duration_seconds=round(time.monotonic() - started, 1), bytes_sent=sent_bytes)
+
+    async def _publish_scheduled(self, folder, time_trigger):
+        now = datetime.now() - timedelta(hours=3)
+        await telegram_service.send_message_to_me(f"🤖 {now.strftime('%Y-%m-%d %H:%M:%S')}:⏰ Publicando carpeta programada: {folder} Para las {now.month:02d}/{now.day:02d} {time_trigger}", destiny_chat_id=self.alert_channel_id)
+        await self._trigger_publication(folder)
+
+    def _trigger_datetime(self, time_trigger, now):
+        """'HH:MM' de hoy como datetime (None si el formato no es válido)."""
+        try:
+            hour, minute = map(int, time_trigger.split(':'))
+            return now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        except ValueError:
+            return None
+
+    def _minutes_until(self, time_trigger, now):
+        """Minutos que faltan hasta 'HH:MM' de hoy (negativo si ya pasó)."""
+        trigger_dt = self._trigger_datetime(time_trigger, now)
+        if not trigger_dt: return -1
+        return (trigger_dt - now).total_seconds() / 60
+
+    async def _prefetch(self, folder, time_trigger):
+        """Resuelve, valida y descarga por adelantado; si falla, avisa con margen para corregir."""
+        from src.core.procesador import processor
+        try:
+            self.prepared_posts[folder] = await processor.prepare_agency_post(folder)
+            log.info(f"📦 {folder} preparado para las {time_trigger}.")
+        except Exception as e:
+            log.error(f"⚠️ Prefetch fallido en {folder}: {e}")
+            # Se reintenta en cada tick, pero se avisa una sola vez
+            if folder not in self.prefetch_alerted:
+                self.prefetch_alerted.add(folder)
+                now = datetime.now() - timedelta(hours=3)
+                await telegram_service.send_message_to_me(
+                    f"⚠️ {now.strftime('%Y-%m-%d %H:%M:%S')}: La carpeta {folder} (programada {time_trigger}) no está lista:\n{e}\n"
+                    f"Quedan {int(self._minutes_until(time_trigger, now))} minutos para corregirlo.",
+                    destiny_chat_id=self.alert_channel_id
+                )
+        finally:
+            self._prefetch_tasks.pop(folder, None)
 
     async def _trigger_publication(self, folder, security_check=True):
         from src.core.procesador import processor
@@ -245,18 +408,79 @@ class Scheduler:
             log.error(f"❌ No hay ID 'Emisor' configurado para enviar '{folder}'.")
             return
 
+        today = datetime.now() - timedelta(hours=3)
+        time_trigger = self.schedule_map.get(folder) if security_check else None
+        kind = "real" if security_check else "force"
+        started = time.monotonic()
+        self.sending.discard(folder)
+        on_send = lambda: self.sending.add(folder)
         try:
             log.info(f"⏰ Publicando: {folder}")
-            await processor.execute_agency_post(folder, target_chat_id=self.target_channel_id, security_check=security_check)
-            self.published_log.append(folder)
-            self._save_state()
-            log.info(f"✅ {folder} publicado.")
+            # Si el prefetch sigue en curso, lo esperamos en lugar de empezar de cero
+            pending = self._prefetch_tasks.get(folder)
+            if pending: await pending
+            prepared = self.prepared_posts.pop(folder, None)
+            # force_publish (sin seguridad) siempre rehace la preparación
+            if prepared and security_check and prepared.is_for(today) and await processor.is_current(prepared):
+                sent_bytes = await processor.send_prepared_post(prepared, target_chat_id=self.target_channel_id, on_send=on_send)
+            else:
+                if prepared:
+                    # Preparado para otro día, editado en Drive después del prefetch o descartado por force_publish
+                    if security_check: log.info(f"♻️ {folder} cambió desde el prefetch, se prepara de nuevo.")
+                    prepared.cleanup()
+                sent_bytes = await processor.execute_agency_post(folder, target_chat_id=self.target_channel_id, security_check=security_check, on_send=on_send)
+            lag = None
+            if time_trigger:
+                lag = -self._minutes_until(time_trigger, datetime.now() - timedelta(hours=3)) * 60
+                metrics.observe("publication_lag_seconds", max(lag, 0))
+            metrics.observe("publication_seconds", time.monotonic() - started, kind=kind)
+            async with self._state_lock:
+                self.store.record(
+                    folder, today.strftime("%Y-%m-%d"), kind, "ok",
+                    target_chat=self.target_channel_id, scheduled_time=time_trigger,
+                    lag_seconds=None if lag is None else round(lag, 1),
+                    duration_seconds=round(time.monotonic() - started, 1), bytes_sent=sent_bytes
+                )
+                self.published_log.add(folder)
+            if lag is None:
+                log.info(f"✅ {folder} publicado.")
+            elif lag > config.PUBLISH_LAG_TARGET:
+                log.warning(f"🐢 {folder} publicado con {lag:.0f}s de retraso (objetivo: {config.PUBLISH_LAG_TARGET}s).")
+            else:
+                log.info(f"✅ {folder} publicado ({lag:.0f}s después de las {time_trigger}).")
         except Exception as e:
             log.error(f"⚠️ Fallo automático en {folder}: {e}")
+            if folder in self.sending:
+                # Falló con el caption ya enviado: no se reintenta para no duplicarlo
+                await self._record_partial(folder, kind, time_trigger, str(e), duration_seconds=round(time.monotonic() - started, 1))
+                await telegram_service.send_message_to_me(f"⚠️ {folder} falló a mitad del envío: {e}\nRevisar el canal: no se reintenta.", destiny_chat_id=self.alert_channel_id)
+                return
+            self.store.record(
+                folder, today.strftime("%Y-%m-%d"), kind, "error",
+                target_chat=self.target_channel_id, scheduled_time=time_trigger,
+                duration_seconds=round(time.monotonic() - started, 1), error=str(e)
+            )
             await telegram_service.send_message_to_me(f"❌ Error publicando {folder}: {e}", destiny_chat_id=self.alert_channel_id)
             # Aquí podrías iterar sobre self.admin_ids para enviar alerta a todos
             
+    async def _record_partial(self, folder, kind, time_trigger, error, duration_seconds=None):
+        """Publicación cortada después del caption: cuenta como hecha hoy (ver published_on)."""
+        today = (datetime.now() - timedelta(hours=3)).strftime("%Y-%m-%d")
+        async with self._state_lock:
+            self.store.record(
+                folder, today, kind, "partial", target_chat=self.target_channel_id,
+                scheduled_time=time_trigger, duration_seconds=duration_seconds, error=error
+            )
+            self.published_log.add(folder)
+
+    def discard_prepared(self, folder):
+        """Lo preparado para `folder` ya no sirve (p. ej. se guardó un caption nuevo desde el chat)."""
+        prepared = self.prepared_posts.pop(folder, None)
+        if prepared: prepared.cleanup()
+
     async def force_reload(self):
+        # Un reload manual también descarta los IDs cacheados (por si se renombró algo en Drive)
+        async_drive_service.invalidate_id_cache()
         await self.load_daily_config()
 
     async def force_publish(self, folder_name):
@@ -0,0 +1,114 @@
+import asyncio
+import inspect
+from concurrent.futures import ThreadPoolExecutor
+from src.services.storage_backend import create_storage_backend
+from src.config.settings import config
+from src.utils.decorators import async_retry_on_network_error, retries_handled_by_caller
+from src.utils.metrics import metrics
+
+class AsyncDriveService:
+    """
+    Fachada awaitable del backend de almacenamiento (DriveService o LocalStorageBackend).
+    Cada llamada corre en un executor acotado para que las descargas y
+    listados no bloqueen el bucle de eventos (pyrogram + APScheduler).
+    """
+    def __init__(self, sync_service, max_workers=None):
+        self.sync = sync_service
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or config.DRIVE_MAX_WORKERS,
+            thread_name_prefix="drive"
+        )
+
+    # Un solo cortocircuito para Drive: en una caída se falla al instante en vez de apilar esperas
+    @async_retry_on_network_error(breaker="drive")
+    async def _run(self, method_name, *args, **kwargs):
+        # Usamos la función sin el decorador síncrono: el backoff lo hace asyncio
+        func = inspect.unwrap(getattr(type(self.sync), method_name))
+
+        def call():
+            # Ni los métodos internos reintentan por su cuenta: de eso se encarga este _run
+            with retries_handled_by_caller():
+                return func(self.sync, *args, **kwargs)
+        with metrics.timer("drive_call_seconds", method=method_name):
+            return await asyncio.get_running_loop().run_in_executor(self._executor, call)
+
+    async def find_item_id_by_name(self, parent_id, item_name, is_folder=False, exact_match=False):
+        return await self._run('find_item_id_by_name', parent_id, item_name, is_folder=is_folder, exact_match=exact_match)
+
+    async def list_files_in_folder(self, folder_id):
+        return await self._run('list_files_in_folder', folder_id)
+
+    async def download_file(self, file_id, file_name, dest_path=None, chunk_size=None):
+        return await self._run('download_file', file_id, file_name, dest_path=dest_path, chunk_size=chunk_size)
+
+    async def download_cached(self, media):
+        return await self._run('download_cached', media)
+
+    async def get_text_content(self, file_id):
+        return await self._run('get_text_content', file_id)
+
+    async def get_folder_color_hex(self, folder_id):
+        return await self._run('get_folder_color_hex', folder_id)
+
+    async def set_folder_color(self, folder_id, color_hex):
+        return await self._run('set_folder_color', folder_id, color_hex)
+
+    async def set_folder_colors(self, colors):
+        return await self._run('set_folder_colors', colors)
+
+    async def audit_snapshot(self, agency_name, month_names):
+        return await self._run('audit_snapshot', agency_name, month_names)
+
+    async def count_media_files_in_folder(self, folder_id):
+        return await self._run('count_media_files_in_folder', folder_id)
+
+    async def create_folder(self, folder_name, parent_id):
+        return await self._run('create_folder', folder_name, parent_id)
+
+    async def create_agency_structure(self, agency_name):
+        return await self._run('create_agency_structure', agency_name)
+
+    async def refresh_tree_index(self):
+        return await self._run('refresh_tree_index')
+
+    async def start_change_sync(self):
+        return await self._run('start_change_sync')
+
+    async def sync_changes(self):
+        return await self._run('sync_changes')
+
+    async def resolve_day_folder(self, agency_name, month_name, day_str):
+        return await self._run('resolve_day_folder', agency_name, month_name, day_str)
+
+    async def run_visual_audit(self):
+        return await self._run('run_visual_audit')
+
+    async def run_monthly_maintenance(self):
+        return await self._run('run_monthly_maintenance')
+
+    async def prepare_monthly_maintenance(self):
+        return await self._run('prepare_monthly_maintenance')
+
+    async def maintain_agency(self, agency, backlog_id):
+        return await self._run('maintain_agency', agency, backlog_id)
+
+    async def get_project_settings(self):
+        return await self._run('get_project_settings')
+
+    async def update_text_file(self, folder_name, content_string):
+        return await self._run('update_text_file', folder_name, content_string)
+
+    async def get_available_folders(self):
+        return await self._run('get_available_folders')
+
+    async def save_to_inbox(self, content_string, identifier=0):
+        return await self._run('save_to_inbox', content_string, identifier=identifier)
+
+    def invalidate_id_cache(self, parent_id=None):
+        # Operación en memoria: no hace falta pasar por el executor
+        self.sync.invalidate_id_cache(parent_id)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+async_drive_service = AsyncDriveService(create_storage_backend())
@@ -0,0 +1,61 @@
+import time
+from src.utils.logger import log
+from src.utils.decorators import is_network_error, backoff_delay
+
+class DriveBatch:
+    """
+    Agrupa escrituras de Drive en BatchHttpRequest (hasta 100 llamadas por petición HTTP).
+    Cada llamada se registra con una clave y al ejecutar se devuelve
+    [(clave, respuesta, error)] en el mismo orden en que se agregaron.
+    Las llamadas que fallan por límite de tasa o 5xx se reenvían con backoff.
+    """
+    MAX_CALLS = 100
+
+    def __init__(self, service, max_retries=3):
+        self.service = service
+        self.max_retries = max_retries
+        self._calls = []  # [(clave, request)]
+
+    def add(self, key, request):
+        self._calls.append((key, request))
+
+    def __len__(self):
+        return len(self._calls)
+
+    def _execute_chunk(self, chunk):
+        """Un BatchHttpRequest. Devuelve [(respuesta, error)] en el orden de `chunk`."""
+        responses = {}
+
+        def callback(request_id, response, exception):
+            responses[request_id] = (response, exception)
+
+        batch = self.service.new_batch_http_request(callback=callback)
+        for i, (_, request) in enumerate(chunk):
+            batch.add(request, request_id=str(i))
+        try:
+            batch.execute()
+        except Exception as e:
+            # Falló la petición entera: todas las llamadas del bloque quedan con ese error
+            log.error(f"Error ejecutando lote de {len(chunk)} llamadas a Drive: {e}")
+            responses = {str(i): (None, e) for i in range(len(chunk))}
+        return [responses.get(str(i), (None, Exception("Sin respuesta en el lote"))) for i in range(len(chunk))]
+
+    def execute(self):
+        results = [None] * len(self._calls)
+        pending = list(enumerate(self._calls))  # [(posición, (clave, request))]
+        for attempt in range(1, self.max_retries + 1):
+            retry = []
+            for start in range(0, len(pending), self.MAX_CALLS):
+                chunk = pending[start:start + self.MAX_CALLS]
+                for (pos, (key, request)), (response, error) in zip(chunk, self._execute_chunk([c for _, c in chunk])):
+                    if error is not None and is_network_error(error) and attempt < self.max_retries:
+                        retry.append((pos, (key, request)))
+                    else:
+                        results[pos] = (key, response, error)
+            if not retry: break
+            delay = backoff_delay(attempt)
+            log.warning(f"⚠️ {len(retry)} llamadas del lote con error transitorio, reintentando en {delay:.1f}s...")
+            time.sleep(delay)
+            pending = retry
+        self._calls = []
+        return results
@@ -0,0 +1,214 @@
+import time
+import threading
+from src.config.settings import config
+from src.utils.logger import log
+from src.services.storage_backend import FOLDER_MIME
+
+INDEX_FIELDS = "id, name, mimeType, parents, folderColorRgb, modifiedTime, md5Checksum, size"
+
+class DriveNode:
+    """Entrada compacta del índice (slots: sin __dict__ por nodo)."""
+    __slots__ = ('id', 'name', 'mime_type', 'parent_id', 'color', 'modified_time', 'md5', 'size')
+
+    def __init__(self, id, name, mime_type, parent_id, color=None, modified_time=None, md5=None, size=None):
+        self.id = id
+        self.name = name
+        self.mime_type = mime_type
+        self.parent_id = parent_id
+        self.color = color
+        self.modified_time = modified_time
+        self.md5 = md5
+        self.size = size
+
+    @property
+    def is_folder(self):
+        return self.mime_type == FOLDER_MIME
+
+    @classmethod
+    def from_api(cls, f):
+        parents = f.get('parents') or [None]
+        size = f.get('size')
+        return cls(
+            f['id'], f['name'], f.get('mimeType'), parents[0],
+            color=(f.get('folderColorRgb') or '').lower() or None,
+            modified_time=f.get('modifiedTime'),
+            md5=f.get('md5Checksum'),
+            size=int(size) if size else None
+        )
+
+    def as_file(self):
+        """Formato dict igual al que devuelve files().list."""
+        f = {'id': self.id, 'name': self.name, 'mimeType': self.mime_type}
+        if self.md5: f['md5Checksum'] = self.md5
+        if self.modified_time: f['modifiedTime'] = self.modified_time
+        if self.size is not None: f['size'] = str(self.size)
+        return f
+
+class DriveTreeIndex:
+    """
+    Foto en memoria del árbol bajo DRIVE_ROOT_ID.
+    Se carga por niveles con pocos files().list paginados (varios padres por consulta)
+    y permite resolver rutas Agencia/Mes/Día sin tocar la API.
+    """
+    def __init__(self, drive, root_id=None, skip_folders=("Backlog", "Buzon"), parents_per_query=40):
+        self.drive = drive
+        self.root_id = root_id
+        self.skip_folders = set(skip_folders)
+        self.parents_per_query = parents_per_query
+        self.nodes = {}          # id -> DriveNode
+        self.by_name = {}        # (parent_id, nombre) -> id
+        self.children = {}       # parent_id -> [ids]
+        self.built_at = 0
+        self.crawled_at = 0      # Último recorrido completo (los deltas no lo renuevan)
+        self._lock = threading.RLock()
+
+    def _root(self):
+        return self.root_id or config.DRIVE_ROOT_ID
+
+    def is_fresh(self, max_age=None):
+        max_age = config.TREE_INDEX_TTL if max_age is None else max_age
+        now = time.monotonic()
+        # Aunque los deltas lo mantengan al día, cada TREE_INDEX_REBUILD se vuelve a recorrer entero
+        return self.built_at and (now - self.built_at) < max_age and (now - self.crawled_at) < config.TREE_INDEX_REBUILD
+
+    def mark_fresh(self):
+        """Lo usa el sincronizador de cambios tras aplicar los deltas."""
+        self.built_at = time.monotonic()
+
+    def build(self):
+        """Recorre el árbol por niveles y reemplaza el índice de una sola vez."""
+        root = self._root()
+        if not root or not self.drive.service: return False
+
+        nodes, by_name, children = {}, {}, {}
+        found, calls = self._crawl([root])
+        for node in found:
+            nodes[node.id] = node
+            by_name.setdefault((node.parent_id, node.name), node.id)
+            children.setdefault(node.parent_id, []).append(node.id)
+
+        with self._lock:
+            self.nodes, self.by_name, self.children = nodes, by_name, children
+            self.built_at = self.crawled_at = time.monotonic()
+        log.info(f"🌳 Índice de Drive cargado: {len(nodes)} elementos en {calls} consultas.")
+        return True
+
+    def index_subtree(self, folder_id):
+        """
+        Agrega lo que cuelga de una carpeta que entró al árbol desde afuera (movida o
+        copiada): Drive solo informa el cambio de la carpeta, no el de cada descendiente.
+        """
+        node = self.nodes.get(folder_id)
+        if not node or not node.is_folder or node.name in self.skip_folders: return 0
+        found, _ = self._crawl([folder_id])
+        with self._lock:
+            for child in found: self._link(child)
+        return len(found)
+
+    def _crawl(self, level):
+        """Recorre por niveles desde `level`. Devuelve ([DriveNode], consultas hechas)."""
+        found = []
+        calls = 0
+        while level:
+            next_level = []
+            for i in range(0, len(level), self.parents_per_query):
+                batch = level[i:i + self.parents_per_query]
+                parents_clause = " or ".join(f"'{p}' in parents" for p in batch)
+                query = f"({parents_clause}) and trashed = false"
+                for files in self.drive.iter_pages(query, fields=INDEX_FIELDS):
+                    calls += 1
+                    for f in files:
+                        # Un archivo puede tener varios padres: nos quedamos con el del lote
+                        parent = next((p for p in f.get('parents', []) if p in batch), None)
+                        node = DriveNode.from_api(f)
+                        node.parent_id = parent
+                        found.append(node)
+                        if node.is_folder and node.name not in self.skip_folders:
+                            next_level.append(node.id)
+            level = next_level
+        return found, calls
+
+    # --- Consultas ---
+    def get(self, item_id):
+        return self.nodes.get(item_id)
+
+    def child(self, parent_id, name, is_folder=None):
+        with self._lock:
+            node = self.nodes.get(self.by_name.get((parent_id, name)))
+            if node and (is_folder is None or node.is_folder == is_folder):
+                return node
+            # Puede haber homónimos de distinto tipo (carpeta 'caption' y doc 'caption')
+            for cid in self.children.get(parent_id, []):
+                n = self.nodes[cid]
+                if n.name == name and (is_folder is None or n.is_folder == is_folder):
+                    return n
+        return None
+
+    def children_of(self, parent_id, folders=None):
+        """Hijos de una carpeta. folders=True solo carpetas, False solo archivos."""
+        with self._lock:
+            result = [self.nodes[c] for c in self.children.get(parent_id, [])]
+        if folders is None: return result
+        return [n for n in result if n.is_folder == folders]
+
+    def resolve(self, *names):
+        """Resuelve una ruta de carpetas desde la raíz: resolve('Agencia', 'Enero', '05')."""
+        parent = self._root()
+        node = None
+        for name in names:
+            node = self.child(parent, name, is_folder=True)
+            if not node: return None
+            parent = node.id
+        return node
+
+    # --- Mutaciones puntuales (para mantenerlo al día sin recargar) ---
+    def upsert(self, f, parent_id=None):
+        node = DriveNode.from_api(f)
+        if parent_id: node.parent_id = parent_id
+        self._link(node)
+        return node
+
+    def _link(self, node):
+        with self._lock:
+            # Renombre, color o movida: el nodo cambia de lugar pero conserva sus hijos
+            self._unlink(node.id)
+            self.nodes[node.id] = node
+            self.by_name.setdefault((node.parent_id, node.name), node.id)
+            self.children.setdefault(node.parent_id, []).append(node.id)
+
+    def remove(self, item_id):
+        """
+        Quita el elemento y todo lo que cuelga de él: al borrar o mandar a la papelera
+        una carpeta, Drive no informa un cambio por cada descendiente.
+        """
+        with self._lock:
+            node = self._unlink(item_id)
+            if not node: return None
+            pending = self.children.pop(item_id, [])
+            while pending:
+                child_id = pending.pop()
+                child = self.nodes.pop(child_id, None)
+                if child and self.by_name.get((child.parent_id, child.name)) == child_id:
+                    del self.by_name[(child.parent_id, child.name)]
+                pending.extend(self.children.pop(child_id, []))
+            return node
+
+    def _unlink(self, item_id):
+        """Saca solo el nodo (sus hijos quedan colgando de su id)."""
+        with self._lock:
+            node = self.nodes.pop(item_id, None)
+            if not node: return None
+            siblings = self.children.get(node.parent_id, [])
+            if item_id in siblings: siblings.remove(item_id)
+            if self.by_name.get((node.parent_id, node.name)) == item_id:
+                del self.by_name[(node.parent_id, node.name)]
+                # Si había un homónimo, pasa a ser el resuelto por nombre
+                for cid in siblings:
+                    if self.nodes[cid].name == node.name:
+                        self.by_name[(node.parent_id, node.name)] = cid
+                        break
+            return node
+
+    def set_color(self, item_id, color_hex):
+        node = self.nodes.get(item_id)
+        if node: node.color = color_hex.lower() if color_hex else None
@@ -1,32 +1,68 @@
-import io, os.path, calendar, time
+import io, os.path, calendar, threading, tempfile
+from cachetools import TTLCache
 from googleapiclient.http import MediaIoBaseDownload, MediaIoBaseUpload
 from src.config.settings import config
 from src.utils.logger import log
 from datetime import datetime, timedelta
 from src.config.settings import config
-from src.utils.decorators import retry_on_network_error
+from src.utils.decorators import retry_on_network_error, is_network_error
+from src.utils.metrics import metrics
+from src.services.drive_index import DriveTreeIndex, FOLDER_MIME
+from src.services.drive_sync import DriveChangeSyncer
+from src.services.drive_batch import DriveBatch
+from src.services.media_cache import MediaCache
+from src.services.folder_manifest import FolderManifest
+from src.services.storage_backend import StorageBackend, MESES, COLOR_VERDE, COLOR_ROJO
 
 # ✅ CORRECTO para Service Accounts
 from google.oauth2 import service_account
 from googleapiclient.discovery import build
 
-# Mapeo de meses en español
-MESES = {
-    1: "Enero", 2: "Febrero", 3: "Marzo", 4: "Abril", 5: "Mayo", 6: "Junio",
-    7: "Julio", 8: "Agosto", 9: "Septiembre", 10: "Octubre", 11: "Noviembre", 12: "Diciembre"
-}
-# IDs de Paleta de Drive (Estándar)
-COLOR_VERDE = "#16a765" # ID 4 (Verde)
-COLOR_ROJO = "#ac725e"  # ID 11 (Rojo Chocolate - El estándar de error en Drive)
+# Campos de los listados de multimedia: Drive ya trae dimensiones y duración
+MEDIA_FIELDS = (
+    "id, name, mimeType, size, md5Checksum, modifiedTime, "
+    "videoMediaMetadata(width, height, durationMillis), imageMediaMetadata(width, height)"
+)
 
 
-class DriveService:
+class DriveService(StorageBackend):
     def __init__(self):
-        self.service = None
+        self.creds = None
+        self._shared_service = None
+        # httplib2 no es thread-safe: cada hilo del executor usa su propio cliente
+        self._local = threading.local()
         # Alcance total para leer y escribir en tu Drive
         self.scopes = ['https://www.googleapis.com/auth/drive']
+        # Caché de resoluciones (parent_id, nombre, is_folder, exact_match) -> id
+        self.id_cache = TTLCache(maxsize=config.ID_CACHE_SIZE, ttl=config.ID_CACHE_TTL)
+        self._id_cache_lock = threading.Lock()
+        # Foto en memoria del árbol completo (auditoría, reportes y resolución de rutas)
+        self.tree = DriveTreeIndex(self)
+        # Textos descargados (schedule, chat_id, captions): id -> (modifiedTime, contenido)
+        self.text_cache = {}
+        self.syncer = DriveChangeSyncer(self)
+        # Multimedia ya descargada (sobrevive entre publicaciones y reinicios)
+        self.media_cache = MediaCache()
+        # Ids de Agencia/Mes/Día anotados al crearlos (la publicación no busca por nombre)
+        self.manifest = FolderManifest()
         self.connect()
 
+    @property
+    def service(self):
+        """Cliente de Drive del hilo actual (se construye la primera vez)."""
+        if self._shared_service is not None:
+            return self._shared_service
+        service = getattr(self._local, 'service', None)
+        if service is None and self.creds is not None:
+            service = build('drive', 'v3', credentials=self.creds)
+            self._local.service = service
+        return service
+
+    @service.setter
+    def service(self, value):
+        # Permite inyectar un cliente ya construido (compartido por todos los hilos)
+        self._shared_service = value
+
     def connect(self):
         """Conecta usando OAuth2 (Usuario real) y guarda el token.json"""
         # Define tus scopes
@@ -40,29 +76,156 @@ class DriveService:
                 creds = service_account.Credentials.from_service_account_file(
                         SERVICE_ACCOUNT_FILE, scopes=self.scopes)
                 
-                # Construir el servicio
-                service = build('drive', 'v3', credentials=creds)
-                
-                self.service = service
+                # Construir el servicio (del hilo principal; el resto lo crea bajo demanda)
+                self.creds = creds
+                self._local.service = build('drive', 'v3', credentials=creds)
 
         except Exception as e:
             raise(f"Error autenticando: {e}")
     
+    def invalidate_id_cache(self, parent_id=None):
+        """Olvida las resoluciones bajo `parent_id` (o todas si no se indica)."""
+        with self._id_cache_lock:
+            if parent_id is None:
+                self.id_cache.clear()
+                return
+            for key in [k for k in self.id_cache.keys() if k[0] == parent_id]:
+                self.id_cache.pop(key, None)
+
     @retry_on_network_error()
     def find_item_id_by_name(self, parent_id, item_name, is_folder=False, exact_match=False):
         if not self.service: return None
+        cache_key = (parent_id, item_name, is_folder, exact_match)
+        with self._id_cache_lock:
+            cached_id = self.id_cache.get(cache_key)
+        if cached_id: return cached_id
+
         mime_type_clause = "and mimeType = 'application/vnd.google-apps.folder'" if is_folder else "and mimeType != 'application/vnd.google-apps.folder'"
         operator = "=" if exact_match else "contains" # <--- Control total
         query = f"'{parent_id}' in parents and name {operator} '{item_name}' {mime_type_clause} and trashed = false"
         try:
             results = self.service.files().list(q=query, fields="files(id, name)").execute()
             files = results.get('files', [])
-            if files: return files[0]['id']
+            if files:
+                # Solo guardamos aciertos: un 'no existe' puede dejar de serlo en cualquier momento
+                with self._id_cache_lock:
+                    self.id_cache[cache_key] = files[0]['id']
+                return files[0]['id']
             return None
         except Exception as e:
+            if is_network_error(e): raise  # Lo reintenta el decorador
             log.error(f"Error buscando '{item_name}': {e}")
             return None
     
+    @retry_on_network_error()
+    def _list_page(self, query, fields, page_size=None, page_token=None, order_by=None):
+        params = {
+            'q': query,
+            'fields': f"nextPageToken, files({fields})",
+            'pageSize': page_size or config.DRIVE_PAGE_SIZE,
+            'pageToken': page_token
+        }
+        if order_by: params['orderBy'] = order_by
+        return self.service.files().list(**params).execute()
+
+    def iter_pages(self, query, fields="id, name", page_size=None, order_by=None):
+        """Genera cada página de resultados siguiendo nextPageToken (se piden a medida que se consumen)."""
+        page_token = None
+        while True:
+            res = self._list_page(query, fields, page_size, page_token, order_by)
+            yield res.get('files', [])
+            page_token = res.get('nextPageToken')
+            if not page_token: return
+
+    def iter_files(self, query, fields="id, name", page_size=None, order_by=None):
+        """Recorre todos los resultados de la consulta de a uno, con memoria constante."""
+        for files in self.iter_pages(query, fields, page_size, order_by):
+            yield from files
+
+    def count_files(self, query, page_size=None):
+        """Cuenta resultados pidiendo solo el id y sin guardar la lista."""
+        return sum(len(files) for files in self.iter_pages(query, fields="id", page_size=page_size))
+
+    @retry_on_network_error()
+    def refresh_tree_index(self):
+        """Recarga el índice en memoria del árbol de Drive."""
+        if not self.service: return False
+        return self.tree.build()
+
+    @retry_on_network_error()
+    def start_change_sync(self):
+        """Fija el punto de partida de la Changes API (antes de cargar el índice)."""
+        if not self.service: return None
+        return self.syncer.start()
+
+    @retry_on_network_error()
+    def sync_changes(self):
+        """Aplica los cambios de Drive desde el último token; recarga el índice si no había."""
+        if not self.service: return 0
+        applied = self.syncer.poll()
+        if not self.tree.is_fresh():
+            self.tree.build()
+        return applied
+
+    def forget_text_content(self, file_id):
+        self.text_cache.pop(file_id, None)
+
+    @retry_on_network_error()
+    def resolve_day_folder(self, agency_name, month_name, day_str):
+        """
+        Devuelve (agency_id, month_id, day_id); None en el primer nivel que no exista.
+        Usa el índice en memoria si está fresco y cae a la búsqueda por nombre si no.
+        """
+        if self.tree.is_fresh():
+            agency = self.tree.resolve(agency_name)
+            month = agency and self.tree.child(agency.id, month_name, is_folder=True)
+            day = month and self.tree.child(month.id, day_str, is_folder=True)
+            if day: return agency.id, month.id, day.id
+
+        # Manifiesto: una sola consulta para confirmar que el día sigue en su lugar
+        known = self.manifest.lookup(agency_name, month_name, day_str)
+        if known:
+            if self._is_day_folder(known, agency_name, month_name, day_str):
+                metrics.inc("folder_manifest_total", result="hit")
+                return known
+            metrics.inc("folder_manifest_total", result="stale")
+            self.manifest.forget(agency_name, month_name)
+        else:
+            metrics.inc("folder_manifest_total", result="miss")
+
+        agency_id = self.find_item_id_by_name(config.DRIVE_ROOT_ID, agency_name, is_folder=True, exact_match=True)
+        if not agency_id: return None, None, None
+        month_id = self.find_item_id_by_name(agency_id, month_name, is_folder=True, exact_match=True)
+        if not month_id: return agency_id, None, None
+        day_id = self.find_item_id_by_name(month_id, day_str, is_folder=True, exact_match=True)
+        if day_id:
+            self.manifest.record(agency_name, agency_id, month_name, month_id, {day_str: day_id})
+        return agency_id, month_id, day_id
+
+    def _is_day_folder(self, known, agency_name, month_name, day_str):
+        """
+        Valida la cadena del manifiesto en un solo lote: día bajo su mes, mes bajo su
+        agencia y agencia bajo la raíz, con los nombres esperados y fuera de la papelera.
+        Así una agencia renombrada o reemplazada, o un mes movido a mano, no pasan.
+        """
+        agency_id, month_id, day_id = known
+        expected = {
+            day_id: (day_str, month_id),
+            month_id: (month_name, agency_id),
+            agency_id: (agency_name, config.DRIVE_ROOT_ID),
+        }
+        batch = DriveBatch(self.service)
+        for folder_id in expected:
+            batch.add(folder_id, self.service.files().get(fileId=folder_id, fields='name, parents, trashed'))
+        for folder_id, meta, error in batch.execute():
+            if error:
+                if is_network_error(error): raise error
+                return False  # 404: la carpeta ya no existe
+            name, parent_id = expected[folder_id]
+            if meta.get('trashed') or meta.get('name') != name or parent_id not in (meta.get('parents') or []):
+                return False
+        return True
+
     @retry_on_network_error()
     def run_visual_audit(self):
         """Revisa conteo de archivos y pinta carpetas (Semáforo)"""
@@ -70,73 +233,92 @@ class DriveService:
         now = datetime.now() - timedelta(hours=3)
         
         informe = ""
-        # 1. Obtener Agencias
-        agencies = self.get_available_folders()
+        # 1. Cargar el árbol completo de una vez (en lugar de una consulta por carpeta)
+        if not self.refresh_tree_index():
+            return "❌ No se pudo cargar el árbol de Drive.\n"
         root = config.DRIVE_ROOT_ID
         
         # 2. Calcular Meses relevantes (Actual y Siguiente)
         months_to_check = [MESES[now.month], MESES[(now.replace(day=1) + timedelta(days=32)).month]]
 
-        for agency_name in agencies:
+        batch = DriveBatch(self.service)
+        for agency in self.tree.children_of(root, folders=True):
+            agency_name = agency.name
             if agency_name in ["末Settings"]: continue
-            
-            agency_id = self.find_item_id_by_name(root, agency_name, is_folder=True, exact_match=True)
-            if not agency_id: continue
 
             # 3. Revisar los meses
             for m_name in months_to_check:
-                m_id = self.find_item_id_by_name(agency_id, m_name, is_folder=True, exact_match=True)
-                if not m_id: continue
-
-                # 4. Listar Días (Carpetas hijas)
-                # Optimizacion: Pedimos solo ID y Nombre de las carpetas de días
-                q_days = f"'{m_id}' in parents and mimeType = 'application/vnd.google-apps.folder' and trashed = false"
-                days_res = self.service.files().list(q=q_days, fields="files(id, name)").execute()
-                days_folders = days_res.get('files', [])
-               
-                for day_folder in days_folders:
-                    d_id = day_folder['id']
-                    # log.info(day_folder)
-                    current_color = self.get_folder_color_hex(d_id)
-                    # --- PAUSA DE SEGURIDAD (ANTI-BAN) ---
-                    # 0.2 segundos es invisible para el usuario pero vital para la API
-                    time.sleep(0.2)
-                    
-                    
-                    # 5. CONTAR ARCHIVOS MULTIMEDIA (Bajo consumo: solo pedimos el total)
-
-                    count = self.count_media_files_in_folder(d_id)
-
-                    # 6. PINTAR CARPETA SEGÚN RESULTADO
+                month = self.tree.child(agency.id, m_name, is_folder=True)
+                if not month: continue
+
+                # 4. Días (Carpetas hijas), ya en memoria
+                for day_folder in self.tree.children_of(month.id, folders=True):
+                    d_id = day_folder.id
+                    current_color = day_folder.color
+
+                    # 5. CONTAR ARCHIVOS MULTIMEDIA (desde el índice)
+                    count = len(self.tree.children_of(d_id, folders=False))
+
+                    # 6. PINTAR CARPETA SEGÚN RESULTADO (se encola en el lote)
                     target_hex = COLOR_VERDE if int(count) == int(config.MULTIMEDIA_COUNT) else COLOR_ROJO
                     # Si ya tiene el color correcto, saltar
-                    log.info(f"Carpeta {agency_name}/{m_name}/{day_folder['name']} tiene {count} archivos. Color actual: {current_color}, Color objetivo: {target_hex}")
+                    log.info(f"Carpeta {agency_name}/{m_name}/{day_folder.name} tiene {count} archivos. Color actual: {current_color}, Color objetivo: {target_hex}")
                     if current_color == target_hex.lower():
                         continue
-                    try:
-                        self.service.files().update(
-                            fileId=d_id, 
-                            body={
-                                'folderColorRgb': target_hex
-                            }, 
-                            fields='id'
-                            ).execute()
-
-                        #Formato de log: Agencia/Mes/Día
-                        status_txt = "Verde (OK)" if count == config.MULTIMEDIA_COUNT else f"Rojo (Archivos Totales: {count})"
-                        logg = f"🤖{(datetime.now() - timedelta(hours=3)).strftime('%H:%M:%S')}: 🎨**Actualizado** {agency_name}/{m_name}/{day_folder['name']} --> {status_txt}\n"
-                        log.info(logg)
-                        informe += logg
-                    except Exception as e:
-                        log.error(f"Error pintando {agency_name}/{m_name}/{day_folder['name']}: {e}")
-                        informe += f"🤖{(datetime.now() - timedelta(hours=3)).strftime('%H:%M:%S')}: ❌ **Error pintando** {agency_name}/{m_name}/{day_folder['name']}: {e}\n"
-                        continue
+                    request = self.service.files().update(fileId=d_id, body={'folderColorRgb': target_hex}, fields='id')
+                    batch.add((d_id, f"{agency_name}/{m_name}/{day_folder.name}", target_hex, count), request)
+
+        # 7. Enviar todos los cambios de color en lotes de hasta 100
+        for (d_id, path, target_hex, count), _, error in batch.execute():
+            stamp = (datetime.now() - timedelta(hours=3)).strftime('%H:%M:%S')
+            if error:
+                log.error(f"Error pintando {path}: {error}")
+                informe += f"🤖{stamp}: ❌ **Error pintando** {path}: {error}\n"
+                continue
+            self.tree.set_color(d_id, target_hex)
+            #Formato de log: Agencia/Mes/Día
+            status_txt = "Verde (OK)" if count == config.MULTIMEDIA_COUNT else f"Rojo (Archivos Totales: {count})"
+            logg = f"🤖{stamp}: 🎨**Actualizado** {path} --> {status_txt}\n"
+            log.info(logg)
+            informe += logg
         
         log.info("🎨 Auditoría finalizada.")
         if informe == "": informe = f"No se han realizado cambios.\n"
         informe += f"🤖{(datetime.now() - timedelta(hours=3)).strftime('%H:%M:%S')}: 🎨 Auditoría Visual finalizada.\n"
         return informe
     
+    def audit_snapshot(self, agency_name, month_names):
+        """
+        Días de la agencia con conteo, color y versión, salidos del índice (cargado
+        por listados masivos agrupados por padre): ninguna consulta por carpeta.
+        """
+        if not self.tree.nodes and not self.refresh_tree_index(): return None
+        agency = self.tree.child(config.DRIVE_ROOT_ID, agency_name, is_folder=True)
+        if not agency: return []
+        days = []
+        for m_name in month_names:
+            month = self.tree.child(agency.id, m_name, is_folder=True)
+            if not month: continue
+            for day in self.tree.children_of(month.id, folders=True):
+                files = self.tree.children_of(day.id, folders=False)
+                latest = max([day.modified_time or ""] + [f.modified_time or "" for f in files])
+                days.append({
+                    'id': day.id, 'path': f"{agency_name}/{m_name}/{day.name}",
+                    'version': f"{len(files)}:{latest}", 'count': len(files), 'color': day.color
+                })
+        return days
+
+    def set_folder_colors(self, colors):
+        """Pinta varias carpetas en lotes de hasta 100. Devuelve {id: error o None}."""
+        batch = DriveBatch(self.service)
+        for folder_id, color_hex in colors.items():
+            batch.add((folder_id, color_hex), self.service.files().update(fileId=folder_id, body={'folderColorRgb': color_hex}, fields='id'))
+        results = {}
+        for (folder_id, color_hex), _, error in batch.execute():
+            if not error: self.tree.set_color(folder_id, color_hex)
+            results[folder_id] = error
+        return results
+
     @retry_on_network_error()
     def get_folder_color_hex(self, folder_id):
             """
@@ -154,9 +336,22 @@ class DriveService:
                 # log.info(f"Color detectado para carpeta {folder_id}: {color}") # Descomentar para debug
                 return color
             except Exception as e:
+                if is_network_error(e): raise
                 print(f"Error obteniendo color: {e}")
                 return None
     
+    @retry_on_network_error()
+    def set_folder_color(self, folder_id, color_hex):
+        """Pinta la carpeta (semáforo de la auditoría)."""
+        try:
+            self.service.files().update(fileId=folder_id, body={'folderColorRgb': color_hex}, fields='id').execute()
+            self.tree.set_color(folder_id, color_hex)
+            return True
+        except Exception as e:
+            if is_network_error(e): raise
+            log.error(f"Error pintando carpeta {folder_id}: {e}")
+            return False
+
     @retry_on_network_error()
     def count_media_files_in_folder(self, folder_id):
             """
@@ -166,15 +361,10 @@ class DriveService:
                 # Query: Busca archivos dentro de la carpeta que NO sean carpetas y NO estén en la papelera
                 query = f"'{folder_id}' in parents and mimeType != 'application/vnd.google-apps.folder' and trashed = false"
                 
-                # Solo traemos los IDs para que sea una consulta rápida y ligera
-                results = self.service.files().list(
-                    q=query, 
-                    fields="files(id)"
-                ).execute()
-                
-                files = results.get('files', [])
-                return len(files)
+                # Solo traemos los IDs, página por página, sin guardar la lista
+                return self.count_files(query)
             except Exception as e:
+                if is_network_error(e): raise
                 print(f"Error contando archivos: {e}")
                 return 0
     
@@ -188,11 +378,90 @@ class DriveService:
         }
         try:
             file = self.service.files().create(body=meta, fields='id').execute()
+            self.invalidate_id_cache(parent_id)
+            if parent_id in self.tree.nodes or parent_id == config.DRIVE_ROOT_ID:
+                self.tree.upsert({'id': file.get('id'), 'name': folder_name, 'mimeType': FOLDER_MIME, 'parents': [parent_id]})
             return file.get('id')
         except Exception as e:
             log.error(f"Error creando carpeta {folder_name}: {e}")
         return None
     
+    def _create_folders_batch(self, names, parent_id):
+        """Crea varias carpetas hermanas en lote. Devuelve ({nombre: id}, [errores])."""
+        batch = DriveBatch(self.service)
+        for name in names:
+            meta = {'name': name, 'parents': [parent_id], 'mimeType': FOLDER_MIME}
+            batch.add(name, self.service.files().create(body=meta, fields='id'))
+        created, errors = {}, []
+        for name, response, error in batch.execute():
+            if error:
+                log.error(f"Error creando carpeta {name}: {error}")
+                errors.append(f"{name}: {error}")
+                continue
+            created[name] = response.get('id')
+        self.invalidate_id_cache(parent_id)
+        if parent_id in self.tree.nodes or parent_id == config.DRIVE_ROOT_ID:
+            for name, folder_id in created.items():
+                self.tree.upsert({'id': folder_id, 'name': name, 'mimeType': FOLDER_MIME, 'parents': [parent_id]})
+        return created, errors
+
+    @retry_on_network_error()
+    def ensure_month_structures(self, agency_id, agency_name, existing_months=None):
+        """
+        Crea Mes Actual/Siguiente -> Días (01-31) dentro de una agencia.
+        Un lote para los meses y otro para todos los días. En los meses que ya existen solo
+        se crean los días que falten (p. ej. los que fallaron en un intento anterior).
+        `existing_months`: {nombre: id} de los meses de la agencia, si ya se conocen.
+        """
+        now = datetime.now() - timedelta(hours=3)
+        dates_to_create = [now, (now.replace(day=1) + timedelta(days=32)).replace(day=1)]
+
+        if existing_months is None:
+            existing_months = {f['name']: f['id'] for f in self.list_files_in_folder(agency_id)
+                               if f['mimeType'] == FOLDER_MIME}
+        month_names = [MESES[d.month] for d in dates_to_create]
+        month_ids = {name: existing_months[name] for name in month_names if name in existing_months}
+
+        # 1. Meses faltantes en un lote
+        new_months = [name for name in month_names if name not in month_ids]
+        created_months, errors = self._create_folders_batch(new_months, agency_id) if new_months else ({}, [])
+        month_ids.update(created_months)
+
+        # 2. Días faltantes de todos los meses en otro lote (en un mes nuevo, todos)
+        batch = DriveBatch(self.service)
+        for date_obj in dates_to_create:
+            month_name = MESES[date_obj.month]
+            month_id = month_ids.get(month_name)
+            if not month_id: continue
+            existing_days = set() if month_name in created_months else {
+                f['name'] for f in self.list_files_in_folder(month_id) if f['mimeType'] == FOLDER_MIME
+            }
+            _, days_in_month = calendar.monthrange(date_obj.year, date_obj.month)
+            missing = [f"{day:02d}" for day in range(1, days_in_month + 1) if f"{day:02d}" not in existing_days]
+            if not missing:
+                log.info(f"Carpeta de mes '{month_name}' ya existe y está completa.")
+                continue
+            log.info(f"📂 Creando {len(missing)} días de {month_name} en {agency_name}")
+            for day_str in missing:
+                meta = {'name': day_str, 'parents': [month_id], 'mimeType': FOLDER_MIME}
+                batch.add((month_id, day_str), self.service.files().create(body=meta, fields='id'))
+
+        created_days = {month_id: {} for month_id in month_ids.values()}
+        for (month_id, day_str), response, error in batch.execute():
+            if error:
+                log.error(f"Error creando día {day_str} en {agency_name}: {error}")
+                errors.append(f"{day_str}: {error}")
+                continue
+            created_days[month_id][day_str] = response.get('id')
+            if month_id in self.tree.nodes:
+                self.tree.upsert({'id': response.get('id'), 'name': day_str, 'mimeType': FOLDER_MIME, 'parents': [month_id]})
+
+        # 3. Anotar los ids creados en el manifiesto (la publicación no tendrá que buscarlos)
+        for month_name, month_id in month_ids.items():
+            if created_days.get(month_id) or month_name in created_months:
+                self.manifest.record(agency_name, agency_id, month_name, month_id, created_days.get(month_id))
+        return not errors
+
     @retry_on_network_error()
     def create_agency_structure(self, agency_name):
         """Crea Agencia -> Mes Actual/Siguiente -> Días (01-31)"""
@@ -206,36 +475,15 @@ class DriveService:
         else:
             log.info(f"📂 Creando agencia: {agency_name}")
             agency_id = self.create_folder(agency_name, root)
+            if not agency_id: return False
+            self.manifest.record(agency_name, agency_id)
         
-        # 2. Calcular Mes Actual y Siguiente
-        now = datetime.now() - timedelta(hours=3)
-        dates_to_create = [now, (now.replace(day=1) + timedelta(days=32)).replace(day=1)]
-        
-        for date_obj in dates_to_create:
-            month_name = MESES[date_obj.month]
-            
-            # Crear Carpeta Mes
-            month_id = self.find_item_id_by_name(agency_id, month_name, is_folder=True, exact_match=True)
-            if not month_id:
-                month_id = self.create_folder(month_name, agency_id)
-            else:
-                log.info(f"Carpeta de mes '{month_name}' ya existe. Omitiendo creación de días...")
-                continue
-            log.info(f"📂 Creando mes: {month_name} en {agency_name}")
-            
-            # Crear Días
-            _, days_in_month = calendar.monthrange(date_obj.year, date_obj.month)
-            for day in range(1, days_in_month + 1):
-                day_str = f"{day:02d}" # 01, 02...
-                # Verificamos si existe para no duplicar (aunque Drive permite duplicados, mejor evitar)
-                if not self.find_item_id_by_name(month_id, day_str, is_folder=True, exact_match=True):
-                    self.create_folder(day_str, month_id)
-        return True
+        # 2. Mes Actual y Siguiente (agencia recién creada: no hay meses que buscar)
+        return self.ensure_month_structures(agency_id, agency_name, existing_months={})
     
     @retry_on_network_error()
-    def run_monthly_maintenance(self):
-        """Mueve el mes pasado a Backlog"""
-        log.info("🧹 Ejecutando mantenimiento mensual...")
+    def prepare_monthly_maintenance(self):
+        """Mantenimiento, paso 1: Backlog listo y vacío. Devuelve (backlog_id, informe)."""
         informe = ""
         now = datetime.now() - timedelta(hours=3)
         # 1. Preparar Backlog
@@ -245,49 +493,56 @@ class DriveService:
         if not backlog_id:
             backlog_id = self.create_folder("Backlog", settings_id)
         
-        # 2. Limpiar Backlog (Borrar contenido previo)
+        # 2. Limpiar Backlog (Borrar contenido previo, en lotes)
         try:
-            children = self.service.files().list(q=f"'{backlog_id}' in parents and trashed=false").execute()
-            for child in children.get('files', []):
-                self.service.files().update(fileId=child['id'], body={'trashed': True}).execute()
+            batch = DriveBatch(self.service)
+            for child in self.iter_files(f"'{backlog_id}' in parents and trashed=false"):
+                batch.add(child['name'], self.service.files().update(fileId=child['id'], body={'trashed': True}, fields='id'))
+            failed = [(name, error) for name, _, error in batch.execute() if error]
+            for name, error in failed:
+                log.error(f"Error enviando a la papelera {name}: {error}")
+                informe += f"🤖{now.strftime('%Y-%m-%d %H:%M:%S')}: ❌ No se pudo borrar {name} del Backlog: {error}\n"
             log.info("🗑️ Backlog limpiado.")
             informe += f"🤖{now.strftime('%Y-%m-%d %H:%M:%S')}: 🗑️ Se ha eliminado el contenido anterior del Backlog.\n"
         except Exception as e: log.error(f"Error limpiando backlog: {e}")
+        return backlog_id, informe
 
+    @retry_on_network_error()
+    def maintain_agency(self, agency, backlog_id):
+        """Mantenimiento, paso 2 (por agencia): mes pasado a Backlog y estructura del mes siguiente."""
+        informe = ""
+        now = datetime.now() - timedelta(hours=3)
         # 3. Identificar Mes Pasado
-        last_month_date = now.replace(day=1) - timedelta(days=1)
-        last_month_name = MESES[last_month_date.month]
-        next_month_date = now.replace(day=1) + timedelta(days=32)
-        next_month_name = MESES[next_month_date.month]
-        # 4. Recorrer Agencias y Mover
-        agencies = self.get_available_folders() # Lista de nombres
+        last_month_name = MESES[(now.replace(day=1) - timedelta(days=1)).month]
+        next_month_name = MESES[(now.replace(day=1) + timedelta(days=32)).month]
+
+        agency_id = self.find_item_id_by_name(config.DRIVE_ROOT_ID, agency, is_folder=True, exact_match=True)
+        month_folder_id = self.find_item_id_by_name(agency_id, last_month_name, is_folder=True, exact_match=True)
         
-        for agency in agencies:
-            if agency == "末Settings": continue
+        if month_folder_id:
+            # Carpeta de Agencia dentro de Backlog (si un intento anterior ya la creó, se reutiliza)
+            agency_bk_id = (self.find_item_id_by_name(backlog_id, agency, is_folder=True, exact_match=True)
+                            or self.create_folder(agency, backlog_id))
             
-            agency_id = self.find_item_id_by_name(config.DRIVE_ROOT_ID, agency, is_folder=True, exact_match=True)
-            month_folder_id = self.find_item_id_by_name(agency_id, last_month_name, is_folder=True, exact_match=True)
-            
-            if month_folder_id:
-                # Crear carpeta de Agencia dentro de Backlog
-                agency_bk_id = self.create_folder(agency, backlog_id)
-                
-                # Mover la carpeta del mes
-                # En Drive "mover" es cambiar el parent
-                self.service.files().update(
-                    fileId=month_folder_id,
-                    addParents=agency_bk_id,
-                    removeParents=agency_id
-                ).execute()
-                log.info(f"📦 Movido {agency}/{last_month_name} a Backlog.")
-                informe += f"🤖{now.strftime('%Y-%m-%d %H:%M:%S')}: 📦 Movido {agency}/{last_month_name} a Backlog.\n"
-
-            # Crear estructura del mes siguiente
-            log.info(f"📅 Creando estructura para el mes {next_month_name} en {agency}...")
-            informe += f"🤖{now.strftime('%Y-%m-%d %H:%M:%S')}: 📅 Creando estructura para el mes {next_month_name} en {agency}...\n"
-            self.create_agency_structure(agency)
-        log.info("🧹 Mantenimiento mensual finalizado.")
-        informe += f"🤖 {now.strftime('%Y-%m-%d %H:%M:%S')}: 🧹 Mantenimiento mensual finalizado.\n"
+            # Mover la carpeta del mes
+            # En Drive "mover" es cambiar el parent
+            self.service.files().update(
+                fileId=month_folder_id,
+                addParents=agency_bk_id,
+                removeParents=agency_id
+            ).execute()
+            self.tree.remove(month_folder_id)
+            self.manifest.forget(agency, last_month_name)
+            self.invalidate_id_cache(agency_id)
+            log.info(f"📦 Movido {agency}/{last_month_name} a Backlog.")
+            informe += f"🤖{now.strftime('%Y-%m-%d %H:%M:%S')}: 📦 Movido {agency}/{last_month_name} a Backlog.\n"
+
+        # Crear estructura del mes siguiente
+        log.info(f"📅 Creando estructura para el mes {next_month_name} en {agency}...")
+        informe += f"🤖{now.strftime('%Y-%m-%d %H:%M:%S')}: 📅 Creando estructura para el mes {next_month_name} en {agency}...\n"
+        if not self.ensure_month_structures(agency_id, agency):
+            # La unidad queda con error en el checkpoint y se reintenta (solo crea lo que falte)
+            raise Exception(f"Hubo errores creando la estructura de {agency}.")
         return informe
     
     @retry_on_network_error()
@@ -296,9 +551,18 @@ class DriveService:
             if not file_id or not self.service: return ""
             
             try:
+                # 0. Si el índice (sincronizado) dice que no cambió, ni preguntamos a Drive
+                cached = self.text_cache.get(file_id)
+                node = self.tree.get(file_id) if self.tree.is_fresh() else None
+                if cached and node and node.modified_time == cached[0]:
+                    return cached[1]
+
                 # 1. Obtener metadatos para ver el tipo de archivo
-                file_meta = self.service.files().get(fileId=file_id, fields='mimeType').execute()
+                file_meta = self.service.files().get(fileId=file_id, fields='mimeType, modifiedTime').execute()
                 mime_type = file_meta.get('mimeType')
+                modified_time = file_meta.get('modifiedTime')
+                if cached and modified_time and cached[0] == modified_time:
+                    return cached[1]
 
                 # 2. Si es Google Doc, usamos export_media
                 if mime_type == 'application/vnd.google-apps.document':
@@ -317,17 +581,15 @@ class DriveService:
                 
                 # Decodificar (utf-8 with BOM por si acaso se edita en windows notepad, o utf-8 normal)
                 content = file_buffer.getvalue().decode('utf-8-sig') 
+                if modified_time:
+                    self.text_cache[file_id] = (modified_time, content)
                 return content
             
-            #Si hay un error de servidor, reintentar
+            # Los errores de servidor/red los reintenta el decorador (con límite y backoff)
             except Exception as e:
-                from googleapiclient.errors import HttpError
-                if isinstance(e, HttpError) and e.resp.status in [500, 502, 503, 504]:
-                    log.warning(f"Error de servidor {e.resp.status} al leer {file_id}, reintentando...")
-                    return self.get_text_content(file_id)
-                else:
-                    log.error(f"Error leyendo archivo {file_id}: {e}")
-                    return ""
+                if is_network_error(e): raise
+                log.error(f"Error leyendo archivo {file_id}: {e}")
+                return ""
     
     @retry_on_network_error()
     def get_project_settings(self):
@@ -343,28 +605,57 @@ class DriveService:
         if not self.service: return []
         try:
             query = f"'{folder_id}' in parents and trashed = false"
-            res = self.service.files().list(q=query, fields="files(id, name, mimeType)").execute()
-            return res.get('files', [])
+            return list(self.iter_files(query, fields=MEDIA_FIELDS))
         except Exception as e:
+            if is_network_error(e): raise
             log.error(f"Error listando {folder_id}: {e}")
             return []
     
     @retry_on_network_error()
-    def download_file(self, file_id, file_name):
+    def download_file(self, file_id, file_name, dest_path=None, chunk_size=None):
+        """
+        Descarga en streaming directo a disco: memoria constante sin importar el tamaño.
+        Se escribe en un '.part' y se renombra al terminar (nunca queda un archivo a medias).
+        """
         if not self.service: return None
+        # El id en el nombre evita choques entre agencias con archivos homónimos (1.jpg...)
+        local_path = dest_path or os.path.join(config.DOWNLOADS_DIR, f"{file_id}_{file_name}")
+        # '.part' propio por descarga: dos descargas simultáneas del mismo id no se pisan
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(local_path), prefix=".", suffix=".part")
         try:
-            request = self.service.files().get_media(fileId=file_id)
-            file_buffer = io.BytesIO()
-            downloader = MediaIoBaseDownload(file_buffer, request)
-            done = False
-            while done is False: _, done = downloader.next_chunk()
-            local_path = os.path.join(config.DOWNLOADS_DIR, file_name)
-            with open(local_path, "wb") as f: f.write(file_buffer.getbuffer())
+            with os.fdopen(fd, "wb") as f:
+                request = self.service.files().get_media(fileId=file_id)
+                downloader = MediaIoBaseDownload(f, request, chunksize=chunk_size or config.DOWNLOAD_CHUNK_SIZE)
+                done = False
+                while done is False: _, done = downloader.next_chunk()
+            os.replace(tmp_path, local_path)
+            metrics.inc("drive_download_bytes_total", os.path.getsize(local_path))
             return local_path
         except Exception as e:
             log.error(f"Error descargando {file_name}: {e}")
+            if os.path.exists(tmp_path):
+                try: os.remove(tmp_path)
+                except OSError: pass
+            if is_network_error(e): raise
             return None
-    
+
+    @retry_on_network_error()
+    def download_cached(self, media):
+        """
+        Devuelve la ruta local de `media` (dict del listado con id, name, md5Checksum...).
+        Si la caché tiene la misma versión no se descarga nada.
+        """
+        if not self.media_cache.enabled:
+            return self.download_file(media['id'], media['name'])
+        path = self.media_cache.get(media)
+        if path:
+            log.info(f"📦 {media['name']} servido desde la caché local.")
+            return path
+        path = self.download_file(media['id'], media['name'], dest_path=self.media_cache.path_for(media))
+        if path:
+            self.media_cache.put(media, path)
+        return path
+
     @retry_on_network_error()
     def update_text_file(self, folder_name, content_string):
         """
@@ -402,11 +693,16 @@ class DriveService:
                 resumable=True
             )
 
-            self.service.files().create(
+            for f in existing:
+                self.tree.remove(f['id'])
+            new_doc = self.service.files().create(
                 body=file_metadata,
                 media_body=media,
                 fields='id'
             ).execute()
+            self.invalidate_id_cache(folder_id)
+            if folder_id in self.tree.nodes:
+                self.tree.upsert({'id': new_doc.get('id'), 'name': 'caption', 'mimeType': file_metadata['mimeType'], 'parents': [folder_id]})
 
             return True, "Guardado como Google Doc editable."
 
@@ -419,21 +715,18 @@ class DriveService:
         """Devuelve una lista con los nombres de las carpetas en la raíz."""
         if not self.service or not config.DRIVE_ROOT_ID:
             return []
+
+        # Si el índice está al día, la lista sale de memoria
+        if self.tree.is_fresh():
+            return sorted(n.name for n in self.tree.children_of(config.DRIVE_ROOT_ID, folders=True))
         
         try:
             # Buscamos solo carpetas (mimeType folder) dentro de la raíz
             query = f"'{config.DRIVE_ROOT_ID}' in parents and mimeType = 'application/vnd.google-apps.folder' and trashed = false"
-            results = self.service.files().list(
-                q=query, 
-                fields="files(name)", 
-                orderBy="name"
-            ).execute()
-            
-            files = results.get('files', [])
-            files.remove("Settings") if "Settings" in files else None
             # Retornamos solo una lista de nombres strings ['Agencia A', 'Agencia B']
-            return [f['name'] for f in files]
+            return [f['name'] for f in self.iter_files(query, fields="name", order_by="name")]
         except Exception as e:
+            if is_network_error(e): raise
             log.error(f"Error listando carpetas: {e}")
             return []
     
@@ -458,6 +751,7 @@ class DriveService:
             }
             buzon = self.service.files().create(body=meta, fields='id').execute()
             buzon_id = buzon.get('id')
+            self.invalidate_id_cache(settings_id)
             log.info("📂 Carpeta 'Buzon' creada dentro de 'Settings'.")
             
         # 3. Crear archivo con Timestamp
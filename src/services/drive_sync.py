@@ -0,0 +1,112 @@
+import os
+import json
+import threading
+from src.config.settings import config
+from src.utils.logger import log
+
+CHANGE_FIELDS = (
+    "nextPageToken, newStartPageToken, "
+    "changes(fileId, removed, file(id, name, mimeType, parents, folderColorRgb, modifiedTime, md5Checksum, size, trashed))"
+)
+
+class DriveChangeSyncer:
+    """
+    Mantiene al día el índice y las cachés de DriveService leyendo solo los
+    cambios (Changes API) desde el último startPageToken guardado en DATA_DIR.
+    """
+    def __init__(self, drive):
+        self.drive = drive
+        self.token_file = os.path.join(config.DATA_DIR, "drive_changes_token.json")
+        self.page_token = None
+        self._lock = threading.Lock()
+        self._load_token()
+
+    def _load_token(self):
+        if os.path.exists(self.token_file):
+            try:
+                with open(self.token_file, 'r') as f:
+                    self.page_token = json.load(f).get("page_token")
+            except: pass
+
+    def _save_token(self):
+        with open(self.token_file, 'w') as f:
+            json.dump({"page_token": self.page_token}, f)
+
+    def start(self):
+        """Obtiene el token inicial. Debe llamarse ANTES de cargar la foto del árbol."""
+        if self.page_token: return self.page_token
+        res = self.drive.service.changes().getStartPageToken().execute()
+        self.page_token = res.get('startPageToken')
+        self._save_token()
+        log.info("🔁 Sincronización de cambios de Drive iniciada.")
+        return self.page_token
+
+    def poll(self):
+        """Aplica los cambios pendientes. Devuelve cuántos se procesaron."""
+        with self._lock:
+            if not self.page_token:
+                self.start()
+                return 0
+
+            applied = 0
+            token = self.page_token
+            while token:
+                res = self.drive.service.changes().list(
+                    pageToken=token,
+                    fields=CHANGE_FIELDS,
+                    includeRemoved=True,
+                    pageSize=config.DRIVE_PAGE_SIZE,
+                    spaces='drive'
+                ).execute()
+                for change in res.get('changes', []):
+                    if self._apply(change): applied += 1
+
+                if res.get('newStartPageToken'):
+                    self.page_token = res['newStartPageToken']
+                    break
+                token = res.get('nextPageToken')
+                # Guardamos el progreso página a página por si se corta a mitad
+                self.page_token = token
+                self._save_token()
+
+            self._save_token()
+            # Si el índice estaba cargado, sigue siendo fiable tras aplicar los deltas
+            if self.drive.tree.built_at:
+                self.drive.tree.mark_fresh()
+            if applied:
+                log.info(f"🔁 {applied} cambios de Drive aplicados.")
+            return applied
+
+    def _apply(self, change):
+        """Aplica un cambio al índice y a las cachés. True si afectaba al árbol del bot."""
+        tree = self.drive.tree
+        file_id = change.get('fileId')
+        f = change.get('file') or {}
+        old = tree.get(file_id)
+
+        # El contenido pudo cambiar: el texto cacheado ya no vale
+        self.drive.forget_text_content(file_id)
+
+        if change.get('removed') or f.get('trashed'):
+            if not old: return False
+            tree.remove(file_id)
+            self.drive.invalidate_id_cache(old.parent_id)
+            return True
+
+        # Solo nos interesa lo que cuelga de carpetas indexadas
+        parent = next((p for p in f.get('parents', []) if p in tree.nodes or p == tree._root()), None)
+        if not parent:
+            if not old: return False
+            tree.remove(file_id)
+            self.drive.invalidate_id_cache(old.parent_id)
+            return True
+
+        node = tree.upsert(f, parent_id=parent)
+        if not old and node.is_folder:
+            # Carpeta que llega de afuera del índice: sus hijos no generan cambios propios
+            tree.index_subtree(file_id)
+        if old and old.parent_id != parent:
+            self.drive.invalidate_id_cache(old.parent_id)
+        # Renombres y altas pueden cambiar el resultado de búsquedas 'contains'
+        self.drive.invalidate_id_cache(parent)
+        return True
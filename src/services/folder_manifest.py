@@ -0,0 +1,67 @@
+import os
+import json
+import threading
+from src.config.settings import config
+from src.utils.logger import log
+
+class FolderManifest:
+    """
+    Ids de carpetas Agencia -> Mes -> Día guardados en DATA_DIR al crearlos (o al
+    resolverlos por nombre). La publicación va directo al día sin buscar por nombre;
+    quien lo usa valida el id y, si quedó viejo, vuelve a la búsqueda.
+    """
+    def __init__(self, path=None):
+        self.path = path or os.path.join(config.DATA_DIR, "folder_manifest.json")
+        # {"Agencia": {"id": ..., "months": {"Enero": {"id": ..., "days": {"01": id}}}}}
+        self.agencies = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path): return
+        try:
+            with open(self.path, 'r') as f:
+                self.agencies = json.load(f)
+        except Exception as e:
+            log.warning(f"⚠️ No se pudo leer {self.path}: {e}")
+            self.agencies = {}
+
+    def _save(self):
+        tmp = self.path + ".tmp"
+        with open(tmp, 'w') as f:
+            json.dump(self.agencies, f)
+        os.replace(tmp, self.path)
+
+    def lookup(self, agency_name, month_name, day_str):
+        """(agency_id, month_id, day_id) si el día está registrado; None si no."""
+        with self._lock:
+            agency = self.agencies.get(agency_name)
+            month = agency and agency.get("months", {}).get(month_name)
+            day_id = month and month.get("days", {}).get(day_str)
+            if not day_id: return None
+            return agency["id"], month["id"], day_id
+
+    def record(self, agency_name, agency_id, month_name=None, month_id=None, days=None):
+        """Registra la agencia y, si se indica, el mes con sus días {"01": id}."""
+        with self._lock:
+            before = json.dumps(self.agencies.get(agency_name), sort_keys=True)
+            agency = self.agencies.setdefault(agency_name, {"id": agency_id, "months": {}})
+            if agency["id"] != agency_id:
+                # Agencia recreada: lo anotado bajo el id anterior ya no sirve
+                agency.update({"id": agency_id, "months": {}})
+            if month_name and month_id:
+                month = agency["months"].setdefault(month_name, {"id": month_id, "days": {}})
+                if month["id"] != month_id:
+                    month.update({"id": month_id, "days": {}})
+                month["days"].update(days or {})
+            # Solo se reescribe el archivo si cambió algo (la búsqueda por nombre lo llama seguido)
+            if json.dumps(agency, sort_keys=True) != before: self._save()
+
+    def forget(self, agency_name, month_name=None):
+        """Olvida un mes (movido a Backlog) o la agencia completa."""
+        with self._lock:
+            agency = self.agencies.get(agency_name)
+            if not agency: return
+            if month_name is None: self.agencies.pop(agency_name, None)
+            elif agency["months"].pop(month_name, None) is None: return
+            self._save()
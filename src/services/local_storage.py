@@ -0,0 +1,281 @@
+import os, calendar, shutil, mimetypes
+from datetime import datetime, timedelta, timezone
+from src.config.settings import config
+from src.utils.logger import log
+from src.services.storage_backend import StorageBackend, MESES, COLOR_VERDE, COLOR_ROJO, FOLDER_MIME
+
+COLOR_SIDECAR = ".folder_color"  # Color de la carpeta (semáforo), dentro de la misma carpeta
+
+
+class LocalStorageBackend(StorageBackend):
+    """
+    Contenido en un árbol de carpetas local (disco o NAS montado), mismo layout que Drive:
+    Raíz/Agencia/Mes/DD y Raíz/末Settings. El id de cada elemento es su ruta absoluta,
+    así la multimedia se pasa a pyrogram por ruta sin descargar nada.
+    """
+    def __init__(self, root):
+        if not root or not os.path.isdir(root):
+            raise RuntimeError(f"LOCAL_STORAGE_ROOT no es una carpeta válida: '{root}'")
+        self.root = os.path.abspath(root)
+
+    # --- Helpers ---
+    @staticmethod
+    def _visible(name):
+        # Ocultos: sidecars, '.part', '.DS_Store'...
+        return not name.startswith('.')
+
+    @staticmethod
+    def _describe(path, entry=None):
+        """Dict con los mismos campos que un listado de Drive."""
+        stat = entry.stat() if entry else os.stat(path)
+        is_dir = entry.is_dir() if entry else os.path.isdir(path)
+        name = os.path.basename(path)
+        modified = datetime.fromtimestamp(stat.st_mtime, tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+        return {
+            'id': path,
+            'name': name,
+            'mimeType': FOLDER_MIME if is_dir else (mimetypes.guess_type(name)[0] or 'application/octet-stream'),
+            'size': None if is_dir else str(stat.st_size),
+            'modifiedTime': modified,
+        }
+
+    def _children(self, folder_id):
+        try:
+            with os.scandir(folder_id) as it:
+                return [self._describe(e.path, e) for e in it if self._visible(e.name)]
+        except FileNotFoundError:
+            return []
+
+    def _folder(self, parent_id, name):
+        path = os.path.join(parent_id, name)
+        return path if os.path.isdir(path) else None
+
+    # --- Búsqueda y lectura ---
+    def find_item_id_by_name(self, parent_id, item_name, is_folder=False, exact_match=False):
+        if not parent_id or not os.path.isdir(parent_id): return None
+        for entry in sorted(self._children(parent_id), key=lambda f: f['name']):
+            if (entry['mimeType'] == FOLDER_MIME) != is_folder: continue
+            name = entry['name']
+            # Sin carpeta, 'schedule' encuentra 'schedule.txt' (en Drive los Docs no tienen extensión)
+            if exact_match and name != item_name and (is_folder or os.path.splitext(name)[0] != item_name): continue
+            if not exact_match and item_name not in name: continue
+            return entry['id']
+        return None
+
+    def list_files_in_folder(self, folder_id):
+        return self._children(folder_id)
+
+    def get_text_content(self, file_id):
+        if not file_id: return ""
+        try:
+            with open(file_id, 'r', encoding='utf-8-sig') as f:
+                return f.read()
+        except Exception as e:
+            log.error(f"Error leyendo archivo {file_id}: {e}")
+            return ""
+
+    def resolve_day_folder(self, agency_name, month_name, day_str):
+        agency_id = self._folder(self.root, agency_name)
+        if not agency_id: return None, None, None
+        month_id = self._folder(agency_id, month_name)
+        if not month_id: return agency_id, None, None
+        return agency_id, month_id, self._folder(month_id, day_str)
+
+    def get_available_folders(self):
+        return sorted(f['name'] for f in self._children(self.root) if f['mimeType'] == FOLDER_MIME)
+
+    def count_media_files_in_folder(self, folder_id):
+        return sum(1 for f in self._children(folder_id) if f['mimeType'] != FOLDER_MIME)
+
+    def get_project_settings(self):
+        settings_id = self.find_item_id_by_name(self.root, "Settings", is_folder=True)
+        if not settings_id: return None, None
+        config_id = self.find_item_id_by_name(settings_id, config.FILE_SCHEDULE)
+        emojis_id = self.find_item_id_by_name(settings_id, config.FILE_EMOJIS)
+        return (self.get_text_content(config_id), self.get_text_content(emojis_id))
+
+    # --- Multimedia: el archivo ya está en disco ---
+    def download_file(self, file_id, file_name, dest_path=None, chunk_size=None):
+        if not os.path.isfile(file_id):
+            log.error(f"Error descargando {file_name}: no existe {file_id}")
+            return None
+        if not dest_path: return file_id
+        shutil.copyfile(file_id, dest_path)
+        return dest_path
+
+    # --- Estado y escritura ---
+    def get_folder_color_hex(self, folder_id):
+        try:
+            with open(os.path.join(folder_id, COLOR_SIDECAR), 'r') as f:
+                return f.read().strip() or None
+        except OSError:
+            return None
+
+    def set_folder_color(self, folder_id, color_hex):
+        path = os.path.join(folder_id, COLOR_SIDECAR)
+        try:
+            with open(path + ".tmp", 'w') as f:
+                f.write(color_hex)
+            os.replace(path + ".tmp", path)
+            return True
+        except OSError as e:
+            log.error(f"Error pintando carpeta {folder_id}: {e}")
+            return False
+
+    def create_folder(self, folder_name, parent_id):
+        path = os.path.join(parent_id, folder_name)
+        try:
+            os.makedirs(path, exist_ok=True)
+            return path
+        except OSError as e:
+            log.error(f"Error creando carpeta {folder_name}: {e}")
+            return None
+
+    def ensure_month_structures(self, agency_id, agency_name):
+        """Crea Mes Actual/Siguiente -> Días (01-31) dentro de una agencia; solo agrega lo que falte."""
+        now = datetime.now() - timedelta(hours=3)
+        ok = True
+        for date_obj in [now, (now.replace(day=1) + timedelta(days=32)).replace(day=1)]:
+            month_name = MESES[date_obj.month]
+            log.info(f"📂 Completando mes: {month_name} en {agency_name}")
+            _, days_in_month = calendar.monthrange(date_obj.year, date_obj.month)
+            for day in range(1, days_in_month + 1):
+                ok = bool(self.create_folder(f"{day:02d}", os.path.join(agency_id, month_name))) and ok
+        return ok
+
+    def create_agency_structure(self, agency_name):
+        """Crea Agencia -> Mes Actual/Siguiente -> Días (01-31)"""
+        if self._folder(self.root, agency_name):
+            log.info(f"Carpeta ya existente. Omitiendo proceso...")
+            return
+        log.info(f"📂 Creando agencia: {agency_name}")
+        agency_id = self.create_folder(agency_name, self.root)
+        if not agency_id: return False
+        return self.ensure_month_structures(agency_id, agency_name)
+
+    def update_text_file(self, folder_name, content_string):
+        """Reemplaza el caption de la carpeta por un 'caption.txt' nuevo."""
+        folder_id = self.find_item_id_by_name(self.root, folder_name, is_folder=True)
+        if not folder_id: return False, f"Carpeta '{folder_name}' no encontrada."
+        try:
+            for f in self._children(folder_id):
+                if f['mimeType'] != FOLDER_MIME and f['name'].startswith('caption'):
+                    os.remove(f['id'])
+            path = os.path.join(folder_id, "caption.txt")
+            with open(path + ".tmp", 'w', encoding='utf-8') as f:
+                f.write(content_string)
+            os.replace(path + ".tmp", path)
+            return True, "Guardado como caption.txt."
+        except OSError as e:
+            log.error(f"Error guardando caption: {e}")
+            return False, str(e)
+
+    def save_to_inbox(self, content_string, identifier=0):
+        """Guarda mensaje en carpeta 'Buzon' (dentro de 末Settings)"""
+        settings_id = self._folder(self.root, "末Settings")
+        if not settings_id:
+            log.error("❌ No se encontró la carpeta 'Settings' para ubicar el Buzón.")
+            return False
+        buzon_id = self.create_folder("Buzon", settings_id)
+        timestamp = (datetime.now() - timedelta(hours=3)).strftime("%Y-%m-%d_%H-%M-%S")
+        try:
+            with open(os.path.join(buzon_id, f"Mensaje_{timestamp} por_{identifier}.txt"), 'w', encoding='utf-8') as f:
+                f.write(content_string)
+            return True
+        except OSError as e:
+            log.error(f"Error Buzon: {e}")
+            return False
+
+    def audit_snapshot(self, agency_name, month_names):
+        agency_id = self._folder(self.root, agency_name)
+        if not agency_id: return []
+        days = []
+        for m_name in month_names:
+            month_id = self._folder(agency_id, m_name)
+            if not month_id: continue
+            for day in sorted(self._children(month_id), key=lambda f: f['name']):
+                if day['mimeType'] != FOLDER_MIME: continue
+                # La versión sale de los archivos visibles (el sidecar del color no cuenta)
+                files = [f for f in self._children(day['id']) if f['mimeType'] != FOLDER_MIME]
+                latest = max([f['modifiedTime'] for f in files], default="")
+                days.append({
+                    'id': day['id'], 'path': f"{agency_name}/{m_name}/{day['name']}",
+                    'version': f"{len(files)}:{latest}", 'count': len(files),
+                    'color': self.get_folder_color_hex(day['id'])
+                })
+        return days
+
+    # --- Mantenimiento ---
+    def run_visual_audit(self):
+        """Revisa conteo de archivos y pinta carpetas (Semáforo en el sidecar)"""
+        log.info("🎨 Iniciando Auditoría Visual (almacenamiento local)...")
+        now = datetime.now() - timedelta(hours=3)
+        months_to_check = [MESES[now.month], MESES[(now.replace(day=1) + timedelta(days=32)).month]]
+
+        informe = ""
+        for agency_name in self.get_available_folders():
+            if agency_name in ["末Settings"]: continue
+            for m_name in months_to_check:
+                month_id = self._folder(os.path.join(self.root, agency_name), m_name)
+                if not month_id: continue
+                for day_folder in sorted(self._children(month_id), key=lambda f: f['name']):
+                    if day_folder['mimeType'] != FOLDER_MIME: continue
+                    d_id = day_folder['id']
+                    count = self.count_media_files_in_folder(d_id)
+                    target_hex = COLOR_VERDE if int(count) == int(config.MULTIMEDIA_COUNT) else COLOR_ROJO
+                    if self.get_folder_color_hex(d_id) == target_hex: continue
+
+                    path = f"{agency_name}/{m_name}/{day_folder['name']}"
+                    stamp = (datetime.now() - timedelta(hours=3)).strftime('%H:%M:%S')
+                    if not self.set_folder_color(d_id, target_hex):
+                        informe += f"🤖{stamp}: ❌ **Error pintando** {path}\n"
+                        continue
+                    status_txt = "Verde (OK)" if count == config.MULTIMEDIA_COUNT else f"Rojo (Archivos Totales: {count})"
+                    logg = f"🤖{stamp}: 🎨**Actualizado** {path} --> {status_txt}\n"
+                    log.info(logg)
+                    informe += logg
+
+        log.info("🎨 Auditoría finalizada.")
+        if informe == "": informe = f"No se han realizado cambios.\n"
+        informe += f"🤖{(datetime.now() - timedelta(hours=3)).strftime('%H:%M:%S')}: 🎨 Auditoría Visual finalizada.\n"
+        return informe
+
+    def prepare_monthly_maintenance(self):
+        """Mantenimiento, paso 1: 末Settings/Backlog listo y vacío."""
+        informe = ""
+        stamp = (datetime.now() - timedelta(hours=3)).strftime('%Y-%m-%d %H:%M:%S')
+        backlog_id = self.create_folder("Backlog", self.create_folder("末Settings", self.root))
+
+        # Limpiar Backlog (el contenido del mes anterior)
+        for child in self._children(backlog_id):
+            try:
+                if child['mimeType'] == FOLDER_MIME: shutil.rmtree(child['id'])
+                else: os.remove(child['id'])
+            except OSError as e:
+                log.error(f"Error borrando {child['name']} del Backlog: {e}")
+                informe += f"🤖{stamp}: ❌ No se pudo borrar {child['name']} del Backlog: {e}\n"
+        log.info("🗑️ Backlog limpiado.")
+        informe += f"🤖{stamp}: 🗑️ Se ha eliminado el contenido anterior del Backlog.\n"
+        return backlog_id, informe
+
+    def maintain_agency(self, agency, backlog_id):
+        """Mantenimiento, paso 2 (por agencia): mes pasado a Backlog y estructura del mes siguiente."""
+        informe = ""
+        now = datetime.now() - timedelta(hours=3)
+        stamp = now.strftime('%Y-%m-%d %H:%M:%S')
+        last_month_name = MESES[(now.replace(day=1) - timedelta(days=1)).month]
+        next_month_name = MESES[(now.replace(day=1) + timedelta(days=32)).month]
+
+        agency_id = os.path.join(self.root, agency)
+        month_folder_id = self._folder(agency_id, last_month_name)
+        if month_folder_id:
+            agency_bk_id = self.create_folder(agency, backlog_id)
+            shutil.move(month_folder_id, os.path.join(agency_bk_id, last_month_name))
+            log.info(f"📦 Movido {agency}/{last_month_name} a Backlog.")
+            informe += f"🤖{stamp}: 📦 Movido {agency}/{last_month_name} a Backlog.\n"
+
+        log.info(f"📅 Creando estructura para el mes {next_month_name} en {agency}...")
+        informe += f"🤖{stamp}: 📅 Creando estructura para el mes {next_month_name} en {agency}...\n"
+        if not self.ensure_month_structures(agency_id, agency):
+            raise Exception(f"Hubo errores creando la estructura de {agency}.")
+        return informe
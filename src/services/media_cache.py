@@ -0,0 +1,124 @@
+import os
+import json
+import time
+import threading
+from src.config.settings import config
+from src.utils.logger import log
+
+class PinnedPaths:
+    """
+    Archivos que una publicación preparada (o en curso) todavía va a subir:
+    el desalojo LRU no los toca hasta que se liberan.
+    """
+    def __init__(self):
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def pin(self, paths):
+        with self._lock:
+            for path in filter(None, paths):
+                self._counts[path] = self._counts.get(path, 0) + 1
+
+    def unpin(self, paths):
+        with self._lock:
+            for path in filter(None, paths):
+                count = self._counts.get(path, 0) - 1
+                if count > 0: self._counts[path] = count
+                else: self._counts.pop(path, None)
+
+    def __contains__(self, path):
+        with self._lock:
+            return path in self._counts
+
+pinned_media = PinnedPaths()
+
+class MediaCache:
+    """
+    Caché local persistente de multimedia, direccionada por contenido.
+    Clave: id de Drive + md5Checksum (o modifiedTime si Drive no da md5).
+    Se valida con los metadatos del listado, sin descargar nada, y se
+    desaloja por LRU cuando se supera el presupuesto de tamaño.
+    """
+    def __init__(self, cache_dir=None, max_bytes=None):
+        self.cache_dir = cache_dir or os.path.join(config.DATA_DIR, "media_cache")
+        self.max_bytes = config.MEDIA_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+        self.index_file = os.path.join(self.cache_dir, "index.json")
+        self.entries = {}  # file_id -> {"version", "path", "size", "last_used"}
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._load()
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    @staticmethod
+    def version_of(media):
+        return media.get('md5Checksum') or media.get('modifiedTime')
+
+    def _load(self):
+        if not os.path.exists(self.index_file): return
+        try:
+            with open(self.index_file, 'r') as f:
+                data = json.load(f)
+            # Solo conservamos entradas cuyo archivo sigue en disco
+            self.entries = {k: v for k, v in data.items() if os.path.exists(v.get("path", ""))}
+        except Exception as e:
+            log.warning(f"⚠️ Índice de caché multimedia ilegible, se reinicia: {e}")
+            self.entries = {}
+
+    def _save(self):
+        tmp = self.index_file + ".tmp"
+        with open(tmp, 'w') as f:
+            json.dump(self.entries, f)
+        os.replace(tmp, self.index_file)
+
+    def path_for(self, media):
+        """Ruta destino dentro de la caché para este archivo y versión."""
+        version = (self.version_of(media) or "nover").replace(':', '').replace('/', '')
+        return os.path.join(self.cache_dir, f"{media['id']}_{version[:32]}_{media['name']}")
+
+    def get(self, media):
+        """Ruta local si la versión cacheada coincide con la de Drive; None si no."""
+        version = self.version_of(media)
+        with self._lock:
+            entry = self.entries.get(media['id'])
+            if not entry or not version or entry["version"] != version:
+                return None
+            if not os.path.exists(entry["path"]):
+                self.entries.pop(media['id'], None)
+                return None
+            # Solo en memoria: el índice se guarda en put/desalojo, no en cada acierto
+            entry["last_used"] = time.time()
+            return entry["path"]
+
+    def put(self, media, path):
+        """Registra un archivo ya descargado en `path_for(media)`."""
+        with self._lock:
+            old = self.entries.get(media['id'])
+            if old and old["path"] != path and os.path.exists(old["path"]):
+                # Versión anterior del mismo archivo: ya no sirve
+                try: os.remove(old["path"])
+                except OSError: pass
+            self.entries[media['id']] = {
+                "version": self.version_of(media),
+                "path": path,
+                "size": os.path.getsize(path),
+                "last_used": time.time()
+            }
+            self._evict(keep=media['id'])
+            self._save()
+
+    def total_size(self):
+        return sum(e["size"] for e in self.entries.values())
+
+    def _evict(self, keep=None):
+        total = self.total_size()
+        for file_id, entry in sorted(self.entries.items(), key=lambda kv: kv[1]["last_used"]):
+            if total <= self.max_bytes: break
+            if file_id == keep or entry["path"] in pinned_media: continue
+            try: os.remove(entry["path"])
+            except OSError: pass
+            self.entries.pop(file_id, None)
+            total -= entry["size"]
+            log.info(f"🧹 Caché multimedia: desalojado {os.path.basename(entry['path'])}")
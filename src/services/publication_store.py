@@ -0,0 +1,90 @@
+import os
+import json
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from src.config.settings import config
+from src.utils.logger import log
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS publications (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    folder TEXT NOT NULL,
+    date TEXT NOT NULL,             -- Día local (YYYY-MM-DD)
+    kind TEXT NOT NULL,             -- 'real' | 'test' | 'force'
+    target_chat TEXT,
+    scheduled_time TEXT,            -- HH:MM del schedule (si aplica)
+    published_at TEXT NOT NULL,     -- Hora local del registro
+    lag_seconds REAL,
+    duration_seconds REAL,
+    bytes INTEGER,
+    status TEXT NOT NULL,           -- 'ok' | 'partial' (timeout con el caption ya enviado) | 'timeout' | 'error'
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_publications_date_folder ON publications (date, folder, status);
+CREATE INDEX IF NOT EXISTS idx_publications_published_at ON publications (published_at);
+"""
+
+class PublicationStore:
+    """
+    Historial de publicaciones en SQLite (modo WAL) dentro de DATA_DIR.
+    Solo se agregan filas: un corte a mitad de escritura no rompe lo anterior.
+    """
+    def __init__(self, path=None):
+        self.path = path or os.path.join(config.DATA_DIR, "publications.db")
+        self._lock = threading.Lock()
+        # Autocommit: cada insert es su propia transacción
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    def record(self, folder, date, kind, status, target_chat=None, scheduled_time=None,
+               lag_seconds=None, duration_seconds=None, bytes_sent=None, error=None):
+        published_at = (datetime.now() - timedelta(hours=3)).strftime("%Y-%m-%d %H:%M:%S")
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO publications (folder, date, kind, target_chat, scheduled_time, published_at, "
+                "lag_seconds, duration_seconds, bytes, status, error) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (folder, date, kind, None if target_chat is None else str(target_chat), scheduled_time,
+                 published_at, lag_seconds, duration_seconds, bytes_sent, status, error)
+            )
+
+    def published_on(self, date):
+        """Carpetas publicadas ese día, aunque sea en parte (sin contar TESTING)."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT DISTINCT folder FROM publications WHERE date = ? AND status IN ('ok', 'partial') AND kind != 'test'",
+                (date,)
+            ).fetchall()
+        return {row["folder"] for row in rows}
+
+    def recent(self, limit=10):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT * FROM publications ORDER BY id DESC LIMIT ?", (limit,)
+            ).fetchall()
+
+    def import_legacy_state(self, state_file):
+        """Pasa el published_state.json del día al historial y lo retira."""
+        if not os.path.exists(state_file): return
+        try:
+            with open(state_file, 'r') as f:
+                data = json.load(f)
+            today = (datetime.now() - timedelta(hours=3)).strftime("%Y-%m-%d")
+            if data.get("date") == today:
+                already = self.published_on(today)
+                for folder in data.get("published", []):
+                    if folder not in already:
+                        self.record(folder, today, "real", "ok", lag_seconds=data.get("lags", {}).get(folder))
+            os.replace(state_file, state_file + ".migrated")
+            log.info("🗄️ published_state.json migrado al historial SQLite.")
+        except Exception as e:
+            log.warning(f"⚠️ No se pudo migrar {state_file}: {e}")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+publication_store = PublicationStore()
@@ -0,0 +1,135 @@
+from datetime import datetime, timedelta
+from src.config.settings import config
+from src.utils.logger import log
+
+# Mapeo de meses en español
+MESES = {
+    1: "Enero", 2: "Febrero", 3: "Marzo", 4: "Abril", 5: "Mayo", 6: "Junio",
+    7: "Julio", 8: "Agosto", 9: "Septiembre", 10: "Octubre", 11: "Noviembre", 12: "Diciembre"
+}
+# IDs de Paleta de Drive (Estándar)
+COLOR_VERDE = "#16a765" # ID 4 (Verde)
+COLOR_ROJO = "#ac725e"  # ID 11 (Rojo Chocolate - El estándar de error en Drive)
+
+# Los listados de cualquier backend marcan las carpetas con el mimeType de Drive
+FOLDER_MIME = 'application/vnd.google-apps.folder'
+
+
+class StorageBackend:
+    """
+    Lo que el bot necesita del almacenamiento de contenido (Drive o disco).
+    Estructura esperada: Raíz/Agencia/Mes/DD y Raíz/末Settings con schedule, chat_id y mis_emojis.
+    Los ids son opacos: id de Drive o ruta absoluta según el backend.
+    """
+
+    # --- Búsqueda y lectura ---
+    def find_item_id_by_name(self, parent_id, item_name, is_folder=False, exact_match=False):
+        raise NotImplementedError
+
+    def list_files_in_folder(self, folder_id):
+        """Hijos de la carpeta como dicts con id, name, mimeType, size y modifiedTime."""
+        raise NotImplementedError
+
+    def get_text_content(self, file_id):
+        raise NotImplementedError
+
+    def resolve_day_folder(self, agency_name, month_name, day_str):
+        """(agency_id, month_id, day_id); None en el primer nivel que no exista."""
+        raise NotImplementedError
+
+    def get_available_folders(self):
+        raise NotImplementedError
+
+    def count_media_files_in_folder(self, folder_id):
+        raise NotImplementedError
+
+    def get_project_settings(self):
+        raise NotImplementedError
+
+    # --- Multimedia ---
+    def download_file(self, file_id, file_name, dest_path=None, chunk_size=None):
+        """Ruta local del archivo, lista para pasarla a pyrogram."""
+        raise NotImplementedError
+
+    def download_cached(self, media):
+        return self.download_file(media['id'], media['name'])
+
+    # --- Escritura y estado (semáforo de colores) ---
+    def get_folder_color_hex(self, folder_id):
+        raise NotImplementedError
+
+    def set_folder_color(self, folder_id, color_hex):
+        raise NotImplementedError
+
+    def create_folder(self, folder_name, parent_id):
+        raise NotImplementedError
+
+    def create_agency_structure(self, agency_name):
+        raise NotImplementedError
+
+    def update_text_file(self, folder_name, content_string):
+        raise NotImplementedError
+
+    def save_to_inbox(self, content_string, identifier=0):
+        raise NotImplementedError
+
+    def set_folder_colors(self, colors):
+        """Pinta varias carpetas {id: color}. Devuelve {id: error o None}."""
+        return {folder_id: None if self.set_folder_color(folder_id, color_hex) else "no se pudo pintar"
+                for folder_id, color_hex in colors.items()}
+
+    def audit_snapshot(self, agency_name, month_names):
+        """
+        Días de la agencia en esos meses: [{id, path, version, count, color}].
+        `version` cambia cuando cambia el contenido del día (lo usa la auditoría incremental).
+        """
+        raise NotImplementedError
+
+    # --- Tareas de mantenimiento ---
+    def run_visual_audit(self):
+        raise NotImplementedError
+
+    def prepare_monthly_maintenance(self):
+        """Backlog listo y vacío. Devuelve (backlog_id, informe)."""
+        raise NotImplementedError
+
+    def maintain_agency(self, agency, backlog_id):
+        """Mes pasado de la agencia a Backlog y estructura del mes siguiente. Devuelve el informe."""
+        raise NotImplementedError
+
+    def run_monthly_maintenance(self):
+        """Mueve el mes pasado a Backlog, agencia por agencia (el JobRunner lo hace en paralelo)"""
+        log.info("🧹 Ejecutando mantenimiento mensual...")
+        backlog_id, informe = self.prepare_monthly_maintenance()
+        for agency in self.get_available_folders():
+            if agency == "末Settings": continue
+            informe += self.maintain_agency(agency, backlog_id)
+        # Se movieron y borraron carpetas: las resoluciones previas ya no son fiables
+        self.invalidate_id_cache()
+        log.info("🧹 Mantenimiento mensual finalizado.")
+        informe += f"🤖 {(datetime.now() - timedelta(hours=3)).strftime('%Y-%m-%d %H:%M:%S')}: 🧹 Mantenimiento mensual finalizado.\n"
+        return informe
+
+    # --- Índice y cambios (sin efecto si el backend no los necesita) ---
+    def refresh_tree_index(self):
+        return True
+
+    def start_change_sync(self):
+        return None
+
+    def sync_changes(self):
+        return 0
+
+    def invalidate_id_cache(self, parent_id=None):
+        pass
+
+
+def create_storage_backend():
+    """Instancia el backend de STORAGE_BACKEND. Drive se importa solo si se usa (conecta al importarse)."""
+    if config.STORAGE_BACKEND == "local":
+        from src.services.local_storage import LocalStorageBackend
+        return LocalStorageBackend(config.DRIVE_ROOT_ID)
+    if config.STORAGE_BACKEND != "drive":
+        raise ValueError(f"STORAGE_BACKEND desconocido: '{config.STORAGE_BACKEND}' (usar 'drive' o 'local')")
+    from src.services.drive_service import drive_service
+    return drive_service
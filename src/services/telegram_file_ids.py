@@ -0,0 +1,88 @@
+import os
+import json
+import time
+import threading
+from src.config.settings import config
+from src.utils.logger import log
+
+class TelegramFileIdStore:
+    """
+    Recuerda los file_id que devuelve Telegram al subir cada foto/video.
+    Clave: id de Drive + md5Checksum (o modifiedTime), así una versión nueva
+    del archivo en Drive nunca reutiliza el file_id de la anterior. Al guardar
+    una versión se olvidan las previas y, pasado `max_entries`, las menos usadas.
+    """
+    def __init__(self, path=None, max_entries=None):
+        self.path = path or os.path.join(config.DATA_DIR, "telegram_file_ids.json")
+        self.max_entries = max_entries or config.TELEGRAM_FILE_IDS_MAX
+        self.entries = {}  # "driveId:version" -> {"kind": "photo"|"video", "file_id": ..., "last_used": ...}
+        self._lock = threading.Lock()
+        self._load()
+
+    @staticmethod
+    def key_for(media):
+        version = media.get('md5Checksum') or media.get('modifiedTime')
+        if not version: return None
+        return f"{media['id']}:{version}"
+
+    def _load(self):
+        if not os.path.exists(self.path): return
+        try:
+            with open(self.path, 'r') as f:
+                self.entries = json.load(f)
+        except Exception as e:
+            log.warning(f"⚠️ No se pudo leer {self.path}: {e}")
+            self.entries = {}
+
+    def _save(self):
+        tmp = self.path + ".tmp"
+        with open(tmp, 'w') as f:
+            json.dump(self.entries, f)
+        os.replace(tmp, self.path)
+
+    def get(self, media):
+        key = self.key_for(media)
+        entry = self.entries.get(key) if key else None
+        if not entry: return None
+        entry["last_used"] = time.time()  # Solo en memoria: se persiste con el próximo guardado
+        return entry["file_id"]
+
+    def remember(self, media, message):
+        """Guarda el file_id del mensaje enviado (foto o video)."""
+        self.remember_all([(media, message)])
+
+    def remember_all(self, sent):
+        """Como `remember` para [(media, mensaje)] (un álbum), con una sola escritura del archivo."""
+        changed = False
+        with self._lock:
+            for media, message in sent:
+                key = self.key_for(media)
+                if not key or message is None: continue
+                if getattr(message, 'photo', None):
+                    kind, file_id = "photo", message.photo.file_id
+                elif getattr(message, 'video', None):
+                    kind, file_id = "video", message.video.file_id
+                else:
+                    continue
+                # Versiones anteriores del mismo archivo de Drive ya no se van a enviar
+                prefix = f"{media['id']}:"
+                for old in [k for k in self.entries if k.startswith(prefix) and k != key]:
+                    del self.entries[old]
+                self.entries[key] = {"kind": kind, "file_id": file_id, "last_used": time.time()}
+                changed = True
+            if not changed: return
+            self._evict()
+            self._save()
+
+    def _evict(self):
+        excess = len(self.entries) - self.max_entries
+        if excess <= 0: return
+        oldest = sorted(self.entries, key=lambda k: self.entries[k].get("last_used", 0))[:excess]
+        for key in oldest: del self.entries[key]
+        log.info(f"🧹 file_ids de Telegram: {excess} entradas desalojadas.")
+
+    def forget(self, media):
+        key = self.key_for(media)
+        with self._lock:
+            if key and self.entries.pop(key, None):
+                self._save()
@@ -1,9 +1,32 @@
 import os
 import asyncio
+import itertools
+import time
 from pyrogram import Client, filters
+from pyrogram.errors import FloodWait
 from pyrogram.handlers import MessageHandler
 from src.config.settings import config
 from src.utils.logger import log
+from src.utils.concurrency import TokenBucket
+from src.utils.metrics import metrics
+from src.utils.decorators import is_network_error, backoff_delay, get_breaker, CircuitOpenError
+
+# Prioridades de la cola de envío (menor = sale antes)
+PRIORITY_POST = 0         # Publicaciones programadas
+PRIORITY_INTERACTIVE = 1  # Respuestas a comandos
+PRIORITY_ALERT = 2        # Avisos y estado
+
+class _SendJob:
+    __slots__ = ('chat_id', 'cost', 'factory', 'future', 'attempts', 'kind', 'enqueued_at')
+
+    def __init__(self, chat_id, cost, factory, future, kind):
+        self.chat_id = chat_id
+        self.cost = cost
+        self.factory = factory  # Crea la corrutina de pyrogram (se puede reintentar)
+        self.future = future
+        self.attempts = 0
+        self.kind = kind  # Método de pyrogram (para métricas)
+        self.enqueued_at = time.perf_counter()
 
 class TelegramService:
     def __init__(self):
@@ -11,6 +34,14 @@ class TelegramService:
         # Esto evita que se vincule a un bucle de eventos incorrecto al importar.
         self.client = None
         self.is_connected = False
+        # Cola de salida: todo envío pasa por aquí (prioridad + límites de Telegram).
+        # Publicaciones y el resto van por carriles separados: una subida larga no frena alertas
+        self._queues = {}
+        self._workers = []
+        self._seq = itertools.count()
+        self.global_bucket = TokenBucket(config.TELEGRAM_GLOBAL_RATE)
+        self.chat_buckets = {}
+        self.breaker = get_breaker("telegram")
 
     async def start(self):
         """Inicia la sesión, creando el cliente en el momento justo."""
@@ -46,6 +77,8 @@ class TelegramService:
             
             self.is_connected = False
             log.info("Telegram desconectado.")
+        for worker in self._workers: worker.cancel()
+        self._workers = []
 
     def add_handler(self, handler_function):
         """Inyecta la lógica de respuesta."""
@@ -68,11 +101,132 @@ class TelegramService:
         self.client.add_handler(new_handler)
         log.info("👂 Handler registrado: Escuchando comandos de texto.")
 
+    # --- Cola de envío ---
+    def _chat_bucket(self, chat_id):
+        bucket = self.chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = self.chat_buckets[chat_id] = TokenBucket(config.TELEGRAM_CHAT_RATE, config.TELEGRAM_CHAT_BURST)
+        return bucket
+
+    def _ensure_workers(self):
+        if self._workers: return
+        self._queues = {"post": asyncio.PriorityQueue(), "urgent": asyncio.PriorityQueue()}
+        self._workers = [asyncio.create_task(self._worker(self._queues["post"])) for _ in range(config.TELEGRAM_SEND_WORKERS)]
+        # Respuestas y alertas tienen su propio worker
+        self._workers.append(asyncio.create_task(self._worker(self._queues["urgent"])))
+
+    def _queue_for(self, priority):
+        return self._queues["post" if priority == PRIORITY_POST else "urgent"]
+
+    async def _submit(self, chat_id, factory, priority, cost=1, kind="send_message"):
+        """Encola un envío y espera su resultado (el orden por llamador se mantiene)."""
+        self._ensure_workers()
+        job = _SendJob(chat_id, cost, factory, asyncio.get_running_loop().create_future(), kind)
+        self._queue_for(priority).put_nowait((priority, next(self._seq), job))
+        return await job.future
+
+    def _requeue_later(self, delay, item):
+        asyncio.get_running_loop().call_later(delay, self._queue_for(item[0]).put_nowait, item)
+
+    async def _run_send(self, job):
+        """
+        Corre el envío como tarea propia: si el llamador deja de esperar (timeout de la
+        publicación) la subida se corta en vez de seguir y publicar tarde. Devuelve la tarea.
+        """
+        send = asyncio.ensure_future(job.factory())
+
+        def abandon(future):
+            if future.cancelled(): send.cancel()
+
+        job.future.add_done_callback(abandon)
+        try:
+            await asyncio.wait({send})
+        finally:
+            job.future.remove_done_callback(abandon)
+            send.cancel()  # Solo tiene efecto si se canceló el worker
+        return send
+
+    async def _worker(self, queue):
+        while True:
+            item = await queue.get()
+            priority, seq, job = item
+            try:
+                if job.future.done(): continue  # El llamador ya no espera (cancelado/timeout)
+                bucket = self._chat_bucket(job.chat_id)
+                # Chat congelado (FloodWait) o sin cupo: se reencola en vez de ocupar el worker esperando
+                wait = max(bucket.delay_for(job.cost), self.global_bucket.delay_for(job.cost))
+                if wait:
+                    self._requeue_later(wait, item)
+                    continue
+                bucket.try_take(job.cost)
+                self.global_bucket.try_take(job.cost)
+                probe = False
+                try:
+                    probe = self.breaker.before_call()
+                    metrics.observe("telegram_queue_wait_seconds", time.perf_counter() - job.enqueued_at, method=job.kind)
+                    with metrics.timer("telegram_send_seconds", method=job.kind):
+                        send = await self._run_send(job)
+                    if send.cancelled(): continue  # El llamador dejó de esperar a mitad de la subida
+                    result = send.result()
+                except FloodWait as e:
+                    self.breaker.record_success()  # Telegram respondió: no es una caída
+                    log.warning(f"⏳ FloodWait de {e.value}s en {job.chat_id}, se reintenta después.")
+                    bucket.pause(e.value)
+                    # Conserva su lugar (misma prioridad y secuencia)
+                    self._requeue_later(e.value, item)
+                    continue
+                except Exception as e:
+                    if is_network_error(e):
+                        self.breaker.record_failure()
+                        job.attempts += 1
+                        if job.attempts < config.TELEGRAM_SEND_RETRIES:
+                            delay = backoff_delay(job.attempts)
+                            log.warning(f"⚠️ Error de red enviando a {job.chat_id}, reintento {job.attempts} en {delay:.1f}s: {e}")
+                            self._requeue_later(delay, item)
+                            continue
+                    elif not isinstance(e, CircuitOpenError):
+                        self.breaker.record_success()  # BadRequest y similares: el servicio respondió
+                    if not job.future.done(): job.future.set_exception(e)
+                else:
+                    self.breaker.record_success()
+                    if not job.future.done(): job.future.set_result(result)
+                finally:
+                    if probe: self.breaker.end_probe()
+            except asyncio.CancelledError:
+                if not job.future.done(): job.future.cancel()
+                raise
+            finally:
+                queue.task_done()
+
+    # --- Envíos ---
+    async def send_message(self, chat_id, text, priority=PRIORITY_ALERT, **kwargs):
+        return await self._submit(chat_id, lambda: self.client.send_message(chat_id, text, **kwargs), priority)
+
+    async def send_photo(self, chat_id, photo, priority=PRIORITY_POST, **kwargs):
+        return await self._submit(chat_id, lambda: self.client.send_photo(chat_id, photo=photo, **kwargs), priority, kind="send_photo")
+
+    async def send_video(self, chat_id, video, priority=PRIORITY_POST, **kwargs):
+        return await self._submit(chat_id, lambda: self.client.send_video(chat_id, video=video, **kwargs), priority, kind="send_video")
+
+    async def send_media_group(self, chat_id, media, priority=PRIORITY_POST, **kwargs):
+        # Cada elemento del álbum cuenta como un mensaje para los límites
+        return await self._submit(chat_id, lambda: self.client.send_media_group(chat_id, media=media, **kwargs), priority, cost=len(media), kind="send_media_group")
+
+    async def reply(self, message, text, priority=PRIORITY_INTERACTIVE, **kwargs):
+        return await self._submit(message.chat.id, lambda: message.reply_text(text, **kwargs), priority, kind="reply")
+
+    async def edit(self, message, text, priority=PRIORITY_INTERACTIVE, **kwargs):
+        return await self._submit(message.chat.id, lambda: message.edit_text(text, **kwargs), priority, kind="edit")
+
+    async def edit_message(self, chat_id, message_id, text, priority=PRIORITY_ALERT, **kwargs):
+        """Edita por id (sirve para mensajes de progreso enviados antes de un reinicio)."""
+        return await self._submit(chat_id, lambda: self.client.edit_message_text(chat_id, message_id, text, **kwargs), priority, kind="edit")
+
     async def send_message_to_me(self, text, destiny_chat_id="me"):
         if not self.client or not self.is_connected:
             return
         try:
-            await self.client.send_message(destiny_chat_id, text)
+            await self.send_message(destiny_chat_id, text, priority=PRIORITY_ALERT)
         except Exception as e:
             log.error(f"Error enviando mensaje: {e}")
 
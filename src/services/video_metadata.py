@@ -0,0 +1,127 @@
+import os
+import json
+import asyncio
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from hachoir.metadata import extractMetadata
+from hachoir.parser import createParser
+from src.config.settings import config
+from src.utils.logger import log
+from src.utils.metrics import metrics
+
+def extract_video_attributes(file_path):
+    """
+    Extrae ancho, alto y duración para que iPhone no aplaste el video.
+    Corre en un proceso aparte: hachoir es CPU puro y bloquearía el loop.
+    """
+    width = 0
+    height = 0
+    duration = 0
+    parser = createParser(file_path)
+    if not parser:
+        return 0, 0, 0
+    with parser:
+        metadata = extractMetadata(parser)
+        if not metadata:
+            return 0, 0, 0
+
+        # Extraer datos
+        if metadata.has("width"): width = metadata.get("width")
+        if metadata.has("height"): height = metadata.get("height")
+        if metadata.has("duration"): duration = metadata.get("duration").seconds
+    return width, height, duration
+
+class VideoMetadataService:
+    """
+    Metadatos de video (ancho, alto, duración) leídos en un ProcessPoolExecutor
+    y guardados en DATA_DIR por id de Drive + md5Checksum (o modifiedTime):
+    el mismo archivo nunca se vuelve a analizar.
+    """
+    def __init__(self, path=None, max_workers=None, timeout=None):
+        self.path = path or os.path.join(config.DATA_DIR, "video_metadata.json")
+        self.max_workers = max_workers or config.VIDEO_META_WORKERS
+        self.timeout = timeout or config.VIDEO_META_TIMEOUT
+        self.entries = {}  # "driveId:version" -> [ancho, alto, duración]
+        self._pool = None
+        self._lock = threading.Lock()
+        self._load()
+
+    @staticmethod
+    def key_for(media):
+        version = media.get('md5Checksum') or media.get('modifiedTime')
+        if not version: return None
+        return f"{media['id']}:{version}"
+
+    def _load(self):
+        if not os.path.exists(self.path): return
+        try:
+            with open(self.path, 'r') as f:
+                self.entries = json.load(f)
+        except Exception as e:
+            log.warning(f"⚠️ No se pudo leer {self.path}: {e}")
+            self.entries = {}
+
+    def _save(self):
+        tmp = self.path + ".tmp"
+        with open(tmp, 'w') as f:
+            json.dump(self.entries, f)
+        os.replace(tmp, self.path)
+
+    def _executor(self):
+        # El pool se crea recién al primer video (arrancar procesos tiene su costo)
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._pool
+
+    def _reset_pool(self, pool):
+        """
+        Descarta un pool con un worker colgado o caído: wait_for no detiene a hachoir y un
+        BrokenProcessPool no se recupera solo. El próximo video crea uno nuevo.
+        """
+        if self._pool is not pool: return  # Ya lo reemplazó otra llamada
+        self._pool = None
+        processes = list((getattr(pool, '_processes', None) or {}).values())
+        pool.shutdown(wait=False, cancel_futures=True)
+        for process in processes:
+            if process.is_alive(): process.terminate()
+
+    async def get_attributes(self, media, file_path):
+        """(ancho, alto, duración) del video; (0, 0, 0) si no se pudo leer a tiempo."""
+        key = self.key_for(media)
+        cached = self.entries.get(key) if key else None
+        if cached: return tuple(cached)
+
+        loop = asyncio.get_running_loop()
+        pool = self._executor()
+        try:
+            with metrics.timer("video_metadata_seconds"):
+                attrs = await asyncio.wait_for(
+                    loop.run_in_executor(pool, extract_video_attributes, file_path),
+                    timeout=self.timeout
+                )
+        except asyncio.TimeoutError:
+            log.warning(f"⚠️ Metadatos de {media.get('name')} sin respuesta en {self.timeout}s: se reinicia el pool.")
+            self._reset_pool(pool)
+            return 0, 0, 0
+        except BrokenProcessPool as e:
+            log.warning(f"⚠️ Pool de metadatos caído ({e}): se reinicia.")
+            self._reset_pool(pool)
+            return 0, 0, 0
+        except Exception as e:
+            log.warning(f"⚠️ No se pudieron leer metadatos de video: {e}")
+            return 0, 0, 0
+
+        log.info(f"📏 Metadatos video: {attrs[0]}x{attrs[1]} | {attrs[2]}s")
+        if key and any(attrs):
+            with self._lock:
+                self.entries[key] = list(attrs)
+                self._save()
+        return attrs
+
+    def shutdown(self):
+        if self._pool:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+video_metadata = VideoMetadataService()
@@ -0,0 +1,117 @@
+import os
+import json
+import time
+import asyncio
+from datetime import datetime, timedelta
+from src.config.settings import config
+from src.utils.logger import log
+from src.utils.metrics import metrics
+from src.services.async_drive_service import async_drive_service
+from src.services.storage_backend import MESES, COLOR_VERDE, COLOR_ROJO
+
+class VisualAuditEngine:
+    """
+    Auditoría visual (semáforo de carpetas) incremental y en segundo plano.
+    Guarda en DATA_DIR la versión y el resultado de cada carpeta de día: en la
+    siguiente pasada solo se revisan los días cuyo contenido cambió. Trabaja en
+    tramos de AUDIT_SLICE_SECONDS y cede el paso mientras haya publicaciones en curso.
+    """
+    def __init__(self, path=None):
+        self.path = path or os.path.join(config.DATA_DIR, "audit_state.json")
+        self.entries = {}  # id carpeta de día -> {"version", "count", "color"}
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path): return
+        try:
+            with open(self.path, 'r') as f:
+                self.entries = json.load(f)
+        except Exception as e:
+            log.warning(f"⚠️ No se pudo leer {self.path}: {e}")
+            self.entries = {}
+
+    def _save(self):
+        tmp = self.path + ".tmp"
+        with open(tmp, 'w') as f:
+            json.dump(self.entries, f)
+        os.replace(tmp, self.path)
+
+    async def _yield_slice(self, started, busy):
+        """Fin de tramo: pausa, y mientras `busy()` (publicaciones en curso) se espera."""
+        if time.monotonic() - started < config.AUDIT_SLICE_SECONDS and not (busy and busy()):
+            return started
+        await asyncio.sleep(config.AUDIT_SLICE_PAUSE)
+        while busy and busy():
+            await asyncio.sleep(config.AUDIT_SLICE_PAUSE)
+        return time.monotonic()
+
+    async def run(self, busy=None):
+        """
+        Una pasada completa (pensada para correr como Task aparte). `busy` indica si hay
+        publicaciones en curso. Devuelve el informe (solo lo que cambió o falló).
+        """
+        log.info("🎨 Iniciando Auditoría Visual incremental...")
+        now = datetime.now() - timedelta(hours=3)
+        months_to_check = [MESES[now.month], MESES[(now.replace(day=1) + timedelta(days=32)).month]]
+        informe = ""
+        checked = skipped = 0
+        seen = set()
+
+        with metrics.timer("visual_audit_seconds"):
+            # Índice al día con los cambios pendientes (en Drive: sin recorrer el árbol si está fresco)
+            await async_drive_service.sync_changes()
+            started = time.monotonic()
+            for agency_name in await async_drive_service.get_available_folders():
+                if agency_name in ["末Settings"]: continue
+                started = await self._yield_slice(started, busy)
+
+                days = await async_drive_service.audit_snapshot(agency_name, months_to_check)
+                if days is None:
+                    return "❌ No se pudo cargar el árbol de contenido.\n"
+
+                to_paint, pending, dirty = {}, {}, False
+                for day in days:
+                    seen.add(day['id'])
+                    previous = self.entries.get(day['id'])
+                    current_color = (day['color'] or "").lower() or None
+                    if previous and previous['version'] == day['version'] and previous['color'] == current_color:
+                        skipped += 1
+                        continue
+                    checked += 1
+                    target_hex = COLOR_VERDE if int(day['count']) == int(config.MULTIMEDIA_COUNT) else COLOR_ROJO
+                    if current_color != target_hex:
+                        to_paint[day['id']] = target_hex
+                        pending[day['id']] = day
+                    else:
+                        self.entries[day['id']] = {"version": day['version'], "count": day['count'], "color": current_color}
+                        dirty = True
+
+                # Todos los colores de la agencia de una vez (un lote en Drive)
+                errors = await async_drive_service.set_folder_colors(to_paint) if to_paint else {}
+                for d_id, target_hex in to_paint.items():
+                    day = pending[d_id]
+                    stamp = (datetime.now() - timedelta(hours=3)).strftime('%H:%M:%S')
+                    if errors.get(d_id):
+                        log.error(f"Error pintando {day['path']}: {errors[d_id]}")
+                        informe += f"🤖{stamp}: ❌ **Error pintando** {day['path']}: {errors[d_id]}\n"
+                        continue
+                    self.entries[d_id] = {"version": day['version'], "count": day['count'], "color": target_hex}
+                    dirty = True
+                    status_txt = "Verde (OK)" if day['count'] == config.MULTIMEDIA_COUNT else f"Rojo (Archivos Totales: {day['count']})"
+                    logg = f"🤖{stamp}: 🎨**Actualizado** {day['path']} --> {status_txt}\n"
+                    log.info(logg)
+                    informe += logg
+                if dirty: self._save()
+
+            # Carpetas que ya no existen (meses movidos a Backlog)
+            stale = [d_id for d_id in self.entries if d_id not in seen]
+            for d_id in stale: del self.entries[d_id]
+            if stale: self._save()
+
+        log.info(f"🎨 Auditoría finalizada: {checked} días revisados, {skipped} sin cambios.")
+        metrics.inc("visual_audit_days_skipped_total", skipped)
+        if informe == "": informe = f"No se han realizado cambios.\n"
+        informe += f"🤖{(datetime.now() - timedelta(hours=3)).strftime('%H:%M:%S')}: 🎨 Auditoría Visual finalizada ({checked} revisados, {skipped} sin cambios).\n"
+        return informe
+
+visual_audit = VisualAuditEngine()
@@ -0,0 +1,67 @@
+# Primitivas de concurrencia compartidas
+import asyncio
+import time
+from contextlib import asynccontextmanager
+
+class ByteBudget:
+    """
+    Limita cuántos bytes hay "en vuelo" a la vez (descargas simultáneas).
+    Un archivo más grande que el tope entra solo cuando no hay nada más en curso,
+    así nunca se bloquea para siempre.
+    """
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.in_flight = 0
+        self._cond = asyncio.Condition()
+
+    async def acquire(self, n):
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.in_flight == 0 or self.in_flight + n <= self.max_bytes)
+            self.in_flight += n
+
+    async def release(self, n):
+        async with self._cond:
+            self.in_flight -= n
+            self._cond.notify_all()
+
+    @asynccontextmanager
+    async def reserve(self, n):
+        await self.acquire(n)
+        try:
+            yield
+        finally:
+            await self.release(n)
+
+
+class TokenBucket:
+    """
+    Limitador de ritmo: `rate` tokens por segundo con ráfagas de hasta `capacity`.
+    `pause(seg)` lo congela (p. ej. tras un FloodWait de Telegram).
+    """
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def pause(self, seconds):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def try_take(self, n=1):
+        """Sin esperar: toma `n` tokens si hay. Devuelve 0 si los tomó o los segundos que faltan."""
+        delay = self.delay_for(n)
+        if not delay: self.tokens -= min(n, self.capacity)
+        return delay
+
+    def delay_for(self, n=1):
+        """Segundos hasta que haya `n` tokens (0 = ya). No consume."""
+        n = min(n, self.capacity)
+        now = time.monotonic()
+        if now < self.paused_until: return self.paused_until - now
+        self._refill(now)
+        return 0 if self.tokens >= n else (n - self.tokens) / self.rate
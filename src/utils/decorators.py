@@ -1,9 +1,12 @@
 import time
+import asyncio
 import functools
 import random
 import socket
 import ssl
-import types
+import threading
+from contextlib import contextmanager
+from src.config.settings import config
 from src.utils.logger import log
 
 # Intentar importar HttpError y excepciones de requests/urllib3; si no están
@@ -26,63 +29,152 @@ except Exception:
     ReadTimeoutError = None
     Urllib3SSLError = None
 
-def retry_on_network_error(max_retries=3, base_delay=1.0, backoff=2.0):
-    """Decorador que reintenta llamadas afectadas por errores de red.
+try:
+    from httplib2 import ServerNotFoundError  # type: ignore
+except Exception:
+    ServerNotFoundError = None
 
-    Reintenta cuando se detectan:
-    - `googleapiclient.errors.HttpError` con status 500,502,503,504
-    - Errores de conexión/timeout/SSL de `requests`, `socket`, `ssl` y `urllib3`
+try:
+    from pyrogram.errors import InternalServerError as TgInternalServerError, ServiceUnavailable as TgServiceUnavailable  # type: ignore
+except Exception:
+    TgInternalServerError = None
+    TgServiceUnavailable = None
+
+# Clasificación calculada una sola vez (antes se rearmaba en cada fallo)
+RETRIABLE_HTTP_STATUS = frozenset({429, 500, 502, 503, 504})
+RATE_LIMIT_REASONS = frozenset({"rateLimitExceeded", "userRateLimitExceeded"})
+NETWORK_EXCEPTIONS = tuple(ex for ex in (
+    requests.exceptions.ConnectionError if requests is not None else None,
+    requests.exceptions.Timeout if requests is not None else None,
+    socket.timeout, ssl.SSLError, ConnectionError, TimeoutError,
+    ProtocolError, ReadTimeoutError, Urllib3SSLError, ServerNotFoundError,
+    TgInternalServerError, TgServiceUnavailable,
+) if ex is not None)
+
+class CircuitOpenError(Exception):
+    """El circuito del servicio está abierto: se falla al instante sin llamar."""
+    pass
+
+def _http_error_reasons(e):
+    """Motivos ('reason') que trae un HttpError de Google."""
+    details = getattr(e, 'error_details', None)
+    if isinstance(details, list):
+        return {d.get('reason') for d in details if isinstance(d, dict)}
+    content = getattr(e, 'content', b'') or b''
+    return {r for r in RATE_LIMIT_REASONS if r.encode() in content}
+
+def is_network_error(e):
+    """Indica si la excepción corresponde a un error transitorio reintentable.
+
+    - `HttpError` con status 429/5xx, o 403 por `rateLimitExceeded`
+    - Errores de conexión/timeout/SSL de `requests`, `socket`, `ssl`, `urllib3` y `httplib2`
+    - Errores de servidor de Telegram (pyrogram 500/503)
+    """
+    if isinstance(e, HttpError):
+        status_code = getattr(getattr(e, 'resp', None), 'status', None)
+        if status_code in RETRIABLE_HTTP_STATUS:
+            return True
+        return status_code == 403 and bool(_http_error_reasons(e) & RATE_LIMIT_REASONS)
+    return isinstance(e, NETWORK_EXCEPTIONS)
+
+def backoff_delay(attempt, base_delay=1.0, backoff=2.0, max_delay=30.0):
+    """Backoff exponencial con jitter completo (reparte los reintentos en el tiempo)."""
+    return random.uniform(0, min(max_delay, base_delay * (backoff ** (attempt - 1))))
+
+class CircuitBreaker:
+    """
+    Cortocircuito por servicio: tras `failure_threshold` errores de red seguidos
+    se abre y todo falla al instante durante `reset_timeout` segundos; luego deja
+    pasar una llamada de prueba (medio abierto) y se cierra si sale bien.
+    """
+    def __init__(self, name, failure_threshold=None, reset_timeout=None):
+        self.name = name
+        self.failure_threshold = failure_threshold or config.CIRCUIT_FAILURE_THRESHOLD
+        self.reset_timeout = reset_timeout or config.CIRCUIT_RESET_SECONDS
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self):
+        return self.opened_at is not None and time.monotonic() - self.opened_at < self.reset_timeout
+
+    def before_call(self):
+        """Devuelve True si esta es la llamada de prueba: quien llama debe cerrarla con `end_probe`."""
+        with self._lock:
+            if self.opened_at is None: return False
+            if time.monotonic() - self.opened_at < self.reset_timeout or self._probing:
+                raise CircuitOpenError(f"Servicio '{self.name}' no disponible (circuito abierto).")
+            self._probing = True  # Medio abierto: pasa solo esta llamada
+            return True
+
+    def end_probe(self):
+        """La prueba terminó sin veredicto (cancelada, reencolada...): la próxima llamada vuelve a probar."""
+        with self._lock:
+            self._probing = False
+
+    def record_success(self):
+        with self._lock:
+            if self.opened_at is not None:
+                log.info(f"🟢 Circuito '{self.name}' cerrado: el servicio respondió.")
+            self.failures = 0
+            self.opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            reopen = self._probing
+            self._probing = False
+            if reopen or (self.opened_at is None and self.failures >= self.failure_threshold):
+                self.opened_at = time.monotonic()
+                log.error(f"🔴 Circuito '{self.name}' abierto por {self.reset_timeout}s tras {self.failures} errores de red.")
+
+_breakers = {}
+_retry_state = threading.local()
+
+@contextmanager
+def retries_handled_by_caller():
+    """Dentro de este bloque (en este hilo) los decoradores síncronos no reintentan:
+    ya lo hace la capa async de afuera, así no se multiplican los intentos."""
+    previous = getattr(_retry_state, 'outer', False)
+    _retry_state.outer = True
+    try:
+        yield
+    finally:
+        _retry_state.outer = previous
+
+def get_breaker(name):
+    """Devuelve (o crea) el cortocircuito compartido de un servicio."""
+    breaker = _breakers.get(name)
+    if breaker is None:
+        breaker = _breakers.setdefault(name, CircuitBreaker(name))
+    return breaker
+
+def retry_on_network_error(max_retries=3, base_delay=1.0, backoff=2.0, max_delay=30.0, breaker=None):
+    """Decorador que reintenta llamadas afectadas por errores de red.
 
-    Usa backoff exponencial con jitter.
+    Reintenta cuando `is_network_error` detecta un fallo transitorio.
+    Espera con `time.sleep`: pensado para código que ya corre en hilos del executor.
+    Con `breaker` (nombre de servicio) falla al instante si el circuito está abierto.
     """
     def decorator_retry(func):
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
+            if getattr(_retry_state, 'outer', False):
+                return func(*args, **kwargs)
+            circuit = get_breaker(breaker) if breaker else None
             for attempt in range(1, max_retries + 1):
+                probe = circuit.before_call() if circuit else False
                 try:
-                    return func(*args, **kwargs)
+                    result = func(*args, **kwargs)
                 except Exception as e:
-                    is_retriable = False
-
-                    # HttpError (API Google) -> revisar código HTTP
-                    try:
-                        if isinstance(e, HttpError):
-                            status = getattr(e, 'resp', None)
-                            status_code = getattr(status, 'status', None)
-                            if status_code in (500, 502, 503, 504):
-                                is_retriable = True
-                    except Exception:
-                        pass
-
-                    # Errores de conexión / timeout / SSL
-                    connection_excs = []
-                    if requests is not None:
-                        try:
-                            connection_excs.extend([
-                                requests.exceptions.ConnectionError,
-                                requests.exceptions.Timeout,
-                            ])
-                        except Exception:
-                            pass
-
-                    connection_excs.extend([socket.timeout, ssl.SSLError])
-                    if ProtocolError is not None:
-                        connection_excs.append(ProtocolError)
-                    if ReadTimeoutError is not None:
-                        connection_excs.append(ReadTimeoutError)
-                    if Urllib3SSLError is not None:
-                        connection_excs.append(Urllib3SSLError)
-
-                    try:
-                        if any(isinstance(e, ex) for ex in connection_excs if ex is not None):
-                            is_retriable = True
-                    except Exception:
-                        # En caso de que alguno de los miembros no sea chequeable
-                        pass
-
-                    # Si no es un error de red, subir la excepción
-                    if not is_retriable:
+                    # Si no es un error de red, subir la excepción (el servicio respondió)
+                    if not is_network_error(e):
+                        if circuit: circuit.record_success()
                         raise
+                    if circuit: circuit.record_failure()
 
                     # Si ya agotamos intentos, log y re-lanzar
                     if attempt == max_retries:
@@ -91,17 +183,59 @@ def retry_on_network_error(max_retries=3, base_delay=1.0, backoff=2.0):
                         )
                         raise
 
-                    # Espera con backoff exponencial + jitter
-                    sleep_for = base_delay * (backoff ** (attempt - 1))
-                    sleep_for = sleep_for * (0.8 + random.random() * 0.4)
+                    sleep_for = backoff_delay(attempt, base_delay, backoff, max_delay)
                     log.warning(
                         f"⚠️ {func.__name__}: error de red, reintentando {attempt}/{max_retries} en {sleep_for:.1f}s: {e}"
                     )
                     time.sleep(sleep_for)
+                else:
+                    if circuit: circuit.record_success()
+                    return result
+                finally:
+                    if probe: circuit.end_probe()
+
+        return wrapper
+
+    return decorator_retry
+
+def async_retry_on_network_error(max_retries=3, base_delay=1.0, backoff=2.0, max_delay=30.0, breaker=None):
+    """Versión async de `retry_on_network_error`.
+
+    Espera con `asyncio.sleep`, así el bucle de eventos sigue atendiendo
+    Telegram y el scheduler mientras dura el backoff.
+    """
+    def decorator_retry(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            circuit = get_breaker(breaker) if breaker else None
+            for attempt in range(1, max_retries + 1):
+                probe = circuit.before_call() if circuit else False
+                try:
+                    result = await func(*args, **kwargs)
+                except Exception as e:
+                    if not is_network_error(e):
+                        if circuit: circuit.record_success()
+                        raise
+                    if circuit: circuit.record_failure()
 
-            # No debería llegar aquí
-            return None
+                    if attempt == max_retries:
+                        log.error(
+                            f"❌ Error de red persistente en {func.__name__} (intento {attempt}/{max_retries}): {e}"
+                        )
+                        raise
+
+                    sleep_for = backoff_delay(attempt, base_delay, backoff, max_delay)
+                    log.warning(
+                        f"⚠️ {func.__name__}: error de red, reintentando {attempt}/{max_retries} en {sleep_for:.1f}s: {e}"
+                    )
+                    await asyncio.sleep(sleep_for)
+                else:
+                    if circuit: circuit.record_success()
+                    return result
+                finally:
+                    # También si la llamada se canceló (wait_for): si no, el circuito queda abierto para siempre
+                    if probe: circuit.end_probe()
 
         return wrapper
 
-    return decorator_retry
\ No newline at end of file
+    return decorator_retry
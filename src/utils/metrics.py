@@ -0,0 +1,122 @@
+# Métricas internas: contadores e histogramas de latencia (p50/p95/p99)
+import time
+import asyncio
+import threading
+from collections import deque
+from contextlib import contextmanager
+from src.utils.logger import log
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+class Histogram:
+    """Guarda las últimas `window` muestras (para percentiles) más el total acumulado."""
+    __slots__ = ('samples', 'count', 'total')
+
+    def __init__(self, window=1024):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value):
+        self.samples.append(value)
+        self.count += 1
+        self.total += value
+
+    def quantile(self, q):
+        if not self.samples: return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+class MetricsRegistry:
+    def __init__(self):
+        self.counters = {}    # (nombre, labels) -> valor
+        self.histograms = {}  # (nombre, labels) -> Histogram
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    def inc(self, name, value=1, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            hist = self.histograms.get(key)
+            if hist is None:
+                hist = self.histograms[key] = Histogram()
+            hist.observe(value)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """Mide el bloque (sirve también dentro de corrutinas) y cuenta los errores."""
+        started = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.inc(name.replace("_seconds", "_errors_total"), **labels)
+            raise
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    # --- Exportación ---
+    @staticmethod
+    def _labels_text(labels, extra=None):
+        items = list(labels) + (extra or [])
+        if not items: return ""
+        return "{" + ",".join(f'{k}="{v}"' for k, v in items) + "}"
+
+    def render_prometheus(self):
+        """Formato de texto de Prometheus (los histogramas como 'summary')."""
+        lines = []
+        with self._lock:
+            for (name, labels), value in sorted(self.counters.items()):
+                lines.append(f"{name}{self._labels_text(labels)} {value}")
+            for (name, labels), hist in sorted(self.histograms.items()):
+                for q in QUANTILES:
+                    lines.append(f"{name}{self._labels_text(labels, [('quantile', q)])} {hist.quantile(q):.6f}")
+                lines.append(f"{name}_sum{self._labels_text(labels)} {hist.total:.6f}")
+                lines.append(f"{name}_count{self._labels_text(labels)} {hist.count}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self):
+        """Resumen compacto para el comando `stats`."""
+        lines = []
+        with self._lock:
+            for (name, labels), hist in sorted(self.histograms.items()):
+                label = ",".join(str(v) for _, v in labels)
+                p50, p95, p99 = (hist.quantile(q) * 1000 for q in QUANTILES)
+                errors = self.counters.get((name.replace("_seconds", "_errors_total"), labels), 0)
+                line = f"`{name.replace('_seconds', '')}{f'[{label}]' if label else ''}` n={hist.count} p50={p50:.0f}ms p95={p95:.0f}ms p99={p99:.0f}ms"
+                if errors: line += f" ❌{errors}"
+                lines.append(line)
+            for (name, labels), value in sorted(self.counters.items()):
+                if not name.endswith("_bytes_total"): continue
+                label = ",".join(str(v) for _, v in labels)
+                lines.append(f"`{name}{f'[{label}]' if label else ''}` {value / (1024 * 1024):.1f} MB")
+        return "\n".join(lines)
+
+    # --- Endpoint HTTP (solo localhost) ---
+    async def _handle_http(self, reader, writer):
+        try:
+            await asyncio.wait_for(reader.readline(), timeout=5)
+            body = self.render_prometheus().encode()
+            writer.write(
+                b"HTTP/1.0 200 OK\r\nContent-Type: text/plain; version=0.0.4\r\n"
+                + f"Content-Length: {len(body)}\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+        except Exception as e:
+            log.warning(f"⚠️ Error sirviendo métricas: {e}")
+        finally:
+            writer.close()
+
+    async def start_server(self, port, host="127.0.0.1"):
+        server = await asyncio.start_server(self._handle_http, host, port)
+        log.info(f"📊 Métricas Prometheus en http://{host}:{port}/metrics")
+        return server
+
+metrics = MetricsRegistry()
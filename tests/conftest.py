@@ -0,0 +1,16 @@
+import os
+import tempfile
+
+# Los singletons (almacenamiento, scheduler, stores en DATA_DIR) se crean al importarse:
+# antes de eso se apunta todo a un directorio temporal y al backend local (sin credenciales).
+_sandbox = tempfile.mkdtemp(prefix="bot-tests-")
+os.makedirs(os.path.join(_sandbox, "root", "末Settings"), exist_ok=True)
+os.environ.setdefault("STORAGE_BACKEND", "local")
+os.environ.setdefault("LOCAL_STORAGE_ROOT", os.path.join(_sandbox, "root"))
+
+from src.config.settings import config  # noqa: E402
+
+config.DATA_DIR = os.path.join(_sandbox, "data")
+config.DOWNLOADS_DIR = os.path.join(_sandbox, "downloads")
+os.makedirs(config.DATA_DIR, exist_ok=True)
+os.makedirs(config.DOWNLOADS_DIR, exist_ok=True)
@@ -0,0 +1,59 @@
+import asyncio
+import pytest
+from src.utils.decorators import CircuitBreaker, CircuitOpenError, async_retry_on_network_error, _breakers
+
+
+def _open_breaker(name):
+    breaker = _breakers[name] = CircuitBreaker(name, failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    assert breaker.is_open
+    return breaker
+
+
+def test_probe_with_non_network_error_closes_breaker():
+    breaker = _open_breaker("test-value-error")
+
+    @async_retry_on_network_error(max_retries=1, breaker="test-value-error")
+    async def call(exc=None):
+        if exc: raise exc
+        return "ok"
+
+    async def scenario():
+        await asyncio.sleep(0.06)
+        with pytest.raises(ValueError):
+            await call(ValueError("404"))
+        # El servicio respondió: el circuito no queda trabado
+        assert await call() == "ok"
+
+    asyncio.run(scenario())
+    assert breaker.opened_at is None and not breaker._probing
+
+
+def test_cancelled_probe_allows_next_probe():
+    breaker = _open_breaker("test-cancel")
+
+    @async_retry_on_network_error(max_retries=1, breaker="test-cancel")
+    async def call(delay=0):
+        await asyncio.sleep(delay)
+        return "ok"
+
+    async def scenario():
+        await asyncio.sleep(0.06)
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(call(1), timeout=0.01)
+        assert not breaker._probing
+        assert await call() == "ok"
+
+    asyncio.run(scenario())
+    assert breaker.opened_at is None
+
+
+def test_open_breaker_fails_fast():
+    _open_breaker("test-open")
+
+    @async_retry_on_network_error(max_retries=1, breaker="test-open")
+    async def call():
+        return "ok"
+
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(call())
@@ -0,0 +1,56 @@
+import asyncio
+import pytest
+from src.utils.concurrency import ByteBudget, TokenBucket
+
+
+def test_token_bucket_allows_a_burst_then_asks_to_wait():
+    bucket = TokenBucket(rate=10, capacity=2)
+    assert bucket.try_take() == 0
+    assert bucket.try_take() == 0
+    assert bucket.delay_for() == pytest.approx(0.1, abs=0.02)
+    # delay_for no consume: try_take devuelve la misma espera y no toma nada
+    assert bucket.try_take() == pytest.approx(0.1, abs=0.02)
+
+
+def test_token_bucket_caps_large_costs_at_its_capacity():
+    # Un álbum más grande que la ráfaga igual puede salir con el cubo lleno
+    bucket = TokenBucket(rate=1, capacity=3)
+    assert bucket.try_take(10) == 0
+    assert bucket.delay_for(10) == pytest.approx(3, abs=0.05)
+
+
+def test_token_bucket_pause_freezes_it_even_with_tokens():
+    bucket = TokenBucket(rate=10, capacity=5)
+    bucket.pause(2)
+    assert bucket.delay_for() == pytest.approx(2, abs=0.05)
+    bucket.pause(1)  # Una pausa más corta no acorta la vigente
+    assert bucket.delay_for() == pytest.approx(2, abs=0.05)
+
+
+def test_byte_budget_holds_back_what_does_not_fit():
+    async def main():
+        budget = ByteBudget(100)
+        order = []
+
+        async def fetch(name, size, hold):
+            async with budget.reserve(size):
+                order.append(name)
+                await asyncio.sleep(hold)
+
+        await asyncio.gather(fetch("a", 60, 0.05), fetch("b", 60, 0), fetch("c", 30, 0))
+        return order, budget.in_flight
+
+    order, in_flight = asyncio.run(main())
+    # b (60) espera a que termine a; c (30) entra al lado de a
+    assert order == ["a", "c", "b"]
+    assert in_flight == 0
+
+
+def test_byte_budget_lets_an_oversized_file_in_alone():
+    async def main():
+        budget = ByteBudget(100)
+        await asyncio.wait_for(budget.acquire(500), timeout=0.1)
+        assert budget.in_flight == 500
+        await budget.release(500)
+
+    asyncio.run(main())
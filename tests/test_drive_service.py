@@ -0,0 +1,71 @@
+import calendar
+from datetime import datetime, timedelta
+import pytest
+from benchmarks.fakes import FakeDrive, FOLDER
+from src.config.settings import config
+from src.services.storage_backend import MESES
+
+
+@pytest.fixture
+def fake():
+    return FakeDrive()
+
+
+@pytest.fixture
+def drive(fake, tmp_path, monkeypatch):
+    """DriveService real sobre FakeDrive (sin credenciales)."""
+    from google.oauth2 import service_account
+    import googleapiclient.discovery
+    monkeypatch.setattr(service_account.Credentials, "from_service_account_file", staticmethod(lambda *a, **k: object()))
+    monkeypatch.setattr(googleapiclient.discovery, "build", lambda *a, **k: fake)
+    monkeypatch.setattr(config, "DATA_DIR", str(tmp_path))
+    monkeypatch.setattr(config, "DRIVE_ROOT_ID", fake.add("Root", "top"))
+    from src.services import drive_service as module
+    monkeypatch.setattr(module, "build", lambda *a, **k: fake)
+    service = module.DriveService()
+    service.service = fake
+    return service
+
+
+def _months():
+    now = datetime.now() - timedelta(hours=3)
+    return [now, (now.replace(day=1) + timedelta(days=32)).replace(day=1)]
+
+
+def _day_names(fake, month_id):
+    return sorted(f['name'] for f in fake.query(f"'{month_id}' in parents") if f['mimeType'] == FOLDER)
+
+
+def test_existing_month_gets_its_missing_days(drive, fake):
+    agency = fake.add("Poker", config.DRIVE_ROOT_ID)
+    current = _months()[0]
+    month = fake.add(MESES[current.month], agency)
+    for day in range(1, 11): fake.add(f"{day:02d}", month)
+
+    assert drive.ensure_month_structures(agency, "Poker")
+
+    for date_obj in _months():
+        month_id = drive.find_item_id_by_name(agency, MESES[date_obj.month], is_folder=True, exact_match=True)
+        days = calendar.monthrange(date_obj.year, date_obj.month)[1]
+        assert _day_names(fake, month_id) == [f"{d:02d}" for d in range(1, days + 1)]
+
+
+def test_maintenance_fails_the_unit_until_every_day_exists(drive, fake, monkeypatch):
+    agency = fake.add("Poker", config.DRIVE_ROOT_ID)
+    backlog = fake.add("Backlog", config.DRIVE_ROOT_ID)
+    add = fake.add
+
+    def flaky_add(name, parent, *args, **kwargs):
+        if name == "15": raise ValueError("sin permisos")
+        return add(name, parent, *args, **kwargs)
+
+    monkeypatch.setattr(fake, "add", flaky_add)
+    with pytest.raises(Exception, match="estructura de Poker"):
+        drive.maintain_agency("Poker", backlog)
+
+    # El reintento de la unidad completa lo que faltó
+    monkeypatch.setattr(fake, "add", add)
+    drive.maintain_agency("Poker", backlog)
+    for date_obj in _months():
+        month_id = drive.find_item_id_by_name(agency, MESES[date_obj.month], is_folder=True, exact_match=True)
+        assert "15" in _day_names(fake, month_id)
@@ -0,0 +1,90 @@
+import pytest
+from benchmarks.fakes import FakeDrive
+from src.config.settings import config
+from src.services.drive_index import DriveTreeIndex
+from src.services.drive_sync import DriveChangeSyncer
+
+
+class _Drive:
+    """Lo mínimo de DriveService que usan el índice y el sincronizador."""
+    def __init__(self, service, root_id):
+        self.service = service
+        self.tree = DriveTreeIndex(self, root_id=root_id)
+        self.invalidated = []
+
+    def iter_pages(self, query, fields=None, **kwargs):
+        yield self.service.files().list(q=query, pageSize=1000).execute()['files']
+
+    def forget_text_content(self, file_id):
+        pass
+
+    def invalidate_id_cache(self, parent_id=None):
+        self.invalidated.append(parent_id)
+
+
+@pytest.fixture
+def drive(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "DATA_DIR", str(tmp_path))
+    fake = FakeDrive()
+    root = fake.add("Root", "top")
+    agency = fake.add("Poker", root)
+    month = fake.add("Octubre", agency)
+    day = fake.add("05", month)
+    fake.add("1.jpg", day, mime="image/jpeg", content=b"x")
+    d = _Drive(fake, root)
+    d.ids = {"agency": agency, "month": month, "day": day}
+    d.syncer = DriveChangeSyncer(d)
+    d.syncer.start()
+    assert d.tree.build()
+    return d
+
+
+def test_trashed_folder_drops_its_subtree(drive):
+    drive.service.files().delete(fileId=drive.ids["month"]).execute()
+    assert drive.syncer.poll() == 1
+    assert drive.tree.resolve("Poker", "Octubre") is None
+    assert list(drive.tree.nodes) == [drive.ids["agency"]]
+    assert drive.tree.children_of(drive.ids["day"]) == []
+
+
+def test_renamed_folder_keeps_its_children(drive):
+    drive.service.files().update(fileId=drive.ids["agency"], body={"name": "Poker2"}).execute()
+    drive.syncer.poll()
+    assert drive.tree.resolve("Poker") is None
+    assert drive.tree.resolve("Poker2", "Octubre", "05").id == drive.ids["day"]
+
+
+def test_page_token_is_persisted(drive):
+    drive.service.files().update(fileId=drive.ids["day"], body={"folderColorRgb": "#16a765"}).execute()
+    assert drive.syncer.poll() == 1
+    # Tras un reinicio se sigue desde el último token: nada pendiente
+    restarted = DriveChangeSyncer(drive)
+    assert restarted.page_token == drive.syncer.page_token
+    assert restarted.poll() == 0
+    assert drive.tree.get(drive.ids["day"]).color == "#16a765"
+
+
+def test_folder_moved_in_from_outside_brings_its_subtree(drive):
+    fake = drive.service
+    outside = fake.add("Nueva", "otra-unidad")
+    month = fake.add("Noviembre", outside)
+    day = fake.add("01", month)
+    fake.add("1.jpg", day, mime="image/jpeg", content=b"x")
+    drive.syncer.poll()
+    assert drive.tree.get(outside) is None
+
+    fake.files().update(fileId=outside, addParents=drive.tree._root(), removeParents="otra-unidad").execute()
+    assert drive.syncer.poll() == 1
+    assert drive.tree.resolve("Nueva", "Noviembre", "01").id == day
+    assert [n.name for n in drive.tree.children_of(day)] == ["1.jpg"]
+
+
+def test_index_is_crawled_again_after_the_rebuild_period(drive, monkeypatch):
+    monkeypatch.setattr(config, "TREE_INDEX_REBUILD", 3600)
+    drive.syncer.poll()
+    assert drive.tree.is_fresh()
+    # Los deltas renuevan built_at, pero no el recorrido completo
+    drive.tree.crawled_at -= 3601
+    drive.syncer.poll()
+    assert not drive.tree.is_fresh()
+    assert drive.tree.build() and drive.tree.is_fresh()
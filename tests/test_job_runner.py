@@ -0,0 +1,59 @@
+import asyncio
+import json
+import os
+from src.core.job_runner import Job, JobHandler, JobRunner
+
+
+class _Units(JobHandler):
+    title = "Prueba"
+    run_once = True
+
+    def __init__(self, fail=()):
+        self.ran = []
+        self.fail = set(fail)
+
+    async def units(self, params, context):
+        return ["a", "b", "c"]
+
+    async def run_unit(self, params, context, unit):
+        self.ran.append(unit)
+        if unit in self.fail: raise Exception(f"falló {unit}")
+        return f"{unit}\n"
+
+
+def _run(runner, start):
+    async def main():
+        start()
+        await asyncio.gather(*runner.tasks.values())
+    asyncio.run(main())
+
+
+def test_resume_runs_only_the_units_left_by_the_restart(tmp_path):
+    job = Job("units-x", "units", "Prueba x")
+    job.prepared, job.units, job.done, job.report = True, ["a", "b", "c"], ["a"], "a\n"
+    with open(tmp_path / "units-x.json", "w") as f: json.dump(job.to_dict(), f)
+
+    runner = JobRunner(directory=str(tmp_path))
+    handler = _Units()
+    runner.register("units", handler)
+    _run(runner, runner.resume)
+
+    assert handler.ran == ["b", "c"]
+    saved = runner._load("units-x")
+    assert (saved.status, saved.done, saved.report) == ("done", ["a", "b", "c"], "a\nb\nc\n")
+
+
+def test_failed_unit_is_retried_on_the_next_start(tmp_path):
+    runner = JobRunner(directory=str(tmp_path))
+    handler = _Units(fail={"b"})
+    runner.register("units", handler)
+    _run(runner, lambda: runner.start("units", "x"))
+    assert runner._load("units-x").status == "failed"
+
+    handler.fail, handler.ran = set(), []
+    _run(runner, lambda: runner.start("units", "x"))
+    assert handler.ran == ["b"]
+    assert runner._load("units-x").status == "done"
+    # run_once: ya terminado, no se repite
+    runner.start("units", "x")
+    assert os.path.exists(runner._path("units-x")) and handler.ran == ["b"]
@@ -0,0 +1,64 @@
+import calendar
+import os
+from datetime import datetime, timedelta
+import pytest
+from src.config.settings import config
+from src.services.local_storage import LocalStorageBackend, COLOR_SIDECAR
+from src.services.storage_backend import MESES, COLOR_VERDE, COLOR_ROJO
+
+
+@pytest.fixture
+def storage(tmp_path):
+    os.makedirs(tmp_path / "末Settings")
+    return LocalStorageBackend(str(tmp_path))
+
+
+def _months():
+    now = datetime.now() - timedelta(hours=3)
+    return [now, (now.replace(day=1) + timedelta(days=32)).replace(day=1)]
+
+
+def test_create_agency_builds_the_drive_layout(storage):
+    assert storage.create_agency_structure("Poker")
+    for date_obj in _months():
+        month = os.path.join(storage.root, "Poker", MESES[date_obj.month])
+        assert sorted(os.listdir(month)) == [f"{d:02d}" for d in range(1, calendar.monthrange(date_obj.year, date_obj.month)[1] + 1)]
+    # Ya existe: no se toca
+    assert storage.create_agency_structure("Poker") is None
+
+    now = _months()[0]
+    agency_id, month_id, day_id = storage.resolve_day_folder("Poker", MESES[now.month], "01")
+    assert day_id == os.path.join(storage.root, "Poker", MESES[now.month], "01")
+    assert storage.resolve_day_folder("Poker", "Nada", "01") == (agency_id, None, None)
+    assert storage.get_available_folders() == ["Poker", "末Settings"]
+
+
+def test_folder_color_lives_in_a_hidden_sidecar(storage, monkeypatch):
+    monkeypatch.setattr(config, "MULTIMEDIA_COUNT", 1)
+    storage.create_agency_structure("Poker")
+    now = _months()[0]
+    _, _, full = storage.resolve_day_folder("Poker", MESES[now.month], "01")
+    _, _, empty = storage.resolve_day_folder("Poker", MESES[now.month], "02")
+    with open(os.path.join(full, "1.jpg"), "wb") as f: f.write(b"x")
+
+    assert storage.get_folder_color_hex(full) is None
+    storage.run_visual_audit()
+    assert storage.get_folder_color_hex(full) == COLOR_VERDE
+    assert storage.get_folder_color_hex(empty) == COLOR_ROJO
+    assert os.path.exists(os.path.join(full, COLOR_SIDECAR))
+    # El sidecar no aparece en los listados ni cuenta como multimedia
+    assert [f['name'] for f in storage.list_files_in_folder(full)] == ["1.jpg"]
+    assert storage.count_media_files_in_folder(full) == 1
+
+
+def test_exact_match_finds_settings_files_with_extension(storage):
+    settings = os.path.join(storage.root, "末Settings")
+    for name in ("schedule.txt", "schedule_old.txt"):
+        with open(os.path.join(settings, name), "w") as f: f.write("A = 10:00")
+    os.makedirs(os.path.join(settings, "Backlog viejo"))
+
+    assert storage.find_item_id_by_name(settings, "schedule", exact_match=True) == os.path.join(settings, "schedule.txt")
+    assert storage.find_item_id_by_name(settings, "sched", exact_match=True) is None
+    assert storage.find_item_id_by_name(settings, "Backlog", is_folder=True, exact_match=True) is None
+    assert storage.find_item_id_by_name(settings, "Backlog", is_folder=True) == os.path.join(settings, "Backlog viejo")
+    assert storage.get_text_content(storage.find_item_id_by_name(settings, "schedule", exact_match=True)) == "A = 10:00"
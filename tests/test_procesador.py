@@ -0,0 +1,75 @@
+import os
+import time
+import shutil
+import asyncio
+from datetime import datetime
+import pytest
+from benchmarks.fakes import FakeTelegramClient
+from src.core import procesador
+from src.core.procesador import PreparedPost, processor
+from src.services.telegram_service import TelegramService
+
+DATE = datetime(2026, 10, 5)
+
+
+@pytest.fixture
+def telegram(monkeypatch):
+    service = TelegramService()
+    service.client = FakeTelegramClient(latency=0.02)
+    service.is_connected = True
+    monkeypatch.setattr(procesador, "telegram_service", service)
+    return service
+
+
+def _post(tmp_path, folder):
+    path = tmp_path / f"{folder}.jpg"
+    path.write_bytes(b"x" * 10)
+    media = {"id": f"id-{folder}", "name": "1.jpg", "mimeType": "image/jpeg", "size": "10"}
+    return PreparedPost(folder, None, f"caption {folder}", [media], [str(path)])
+
+
+def test_posts_to_the_same_chat_do_not_interleave(telegram, tmp_path):
+    async def main():
+        await asyncio.gather(*(processor.send_prepared_post(_post(tmp_path, f), target_chat_id=-100) for f in ("A", "B", "C")))
+        for worker in telegram._workers: worker.cancel()
+
+    asyncio.run(main())
+    assert [method for method, _, _ in telegram.client.sent] == ["send_message", "send_photo"] * 3
+
+
+@pytest.fixture
+def agency():
+    from src.services.storage_backend import MESES, COLOR_VERDE
+    from src.services.async_drive_service import async_drive_service
+    root = os.environ["LOCAL_STORAGE_ROOT"]
+    day = os.path.join(root, "Vigente", MESES[DATE.month], f"{DATE.day:02d}")
+    os.makedirs(day, exist_ok=True)
+    with open(os.path.join(root, "Vigente", "caption.txt"), "w") as f: f.write("hola")
+    with open(os.path.join(day, "1.jpg"), "wb") as f: f.write(b"x" * 10)
+    asyncio.run(async_drive_service.set_folder_color(day, COLOR_VERDE))
+    yield os.path.join(root, "Vigente")
+    shutil.rmtree(os.path.join(root, "Vigente"))
+
+
+def _prepare():
+    async def main():
+        prepared = await processor.prepare_agency_post("Vigente", force_date=DATE)
+        return prepared, await processor.is_current(prepared)
+    return asyncio.run(main())
+
+
+def test_prepared_post_is_current_until_the_caption_changes(agency):
+    prepared, current = _prepare()
+    assert current
+    caption = os.path.join(agency, "caption.txt")
+    with open(caption, "w") as f: f.write("chau")
+    os.utime(caption, (time.time() + 60, time.time() + 60))
+    assert not asyncio.run(processor.is_current(prepared))
+
+
+def test_prepared_post_is_stale_when_media_is_added(agency):
+    prepared, current = _prepare()
+    assert current
+    day = os.path.dirname(prepared.media_files[0]['id'])
+    with open(os.path.join(day, "2.jpg"), "wb") as f: f.write(b"y" * 10)
+    assert not asyncio.run(processor.is_current(prepared))
@@ -0,0 +1,62 @@
+import json
+import os
+from datetime import datetime, timedelta
+import pytest
+from src.services.publication_store import PublicationStore
+
+TODAY = (datetime.now() - timedelta(hours=3)).strftime("%Y-%m-%d")
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = PublicationStore(str(tmp_path / "publications.db"))
+    yield store
+    store.close()
+
+
+def test_published_on_counts_real_and_partial_posts_only(store):
+    store.record("A", TODAY, "real", "ok")
+    store.record("B", TODAY, "force", "ok")
+    store.record("C", TODAY, "real", "partial", error="timeout")
+    store.record("D", TODAY, "test", "ok")
+    store.record("E", TODAY, "real", "error", error="sin archivos")
+    store.record("F", TODAY, "real", "timeout")
+    store.record("G", "2026-01-01", "real", "ok")
+
+    assert store.published_on(TODAY) == {"A", "B", "C"}
+
+
+def test_history_survives_reopening(store):
+    store.record("A", TODAY, "real", "ok", lag_seconds=12.5, bytes_sent=2048)
+    reopened = PublicationStore(store.path)
+    row = reopened.recent(1)[0]
+    assert (row["folder"], row["lag_seconds"], row["bytes"]) == ("A", 12.5, 2048)
+    assert reopened.published_on(TODAY) == {"A"}
+    reopened.close()
+
+
+def _legacy(tmp_path, date, published, lags=None):
+    path = tmp_path / "published_state.json"
+    path.write_text(json.dumps({"date": date, "published": published, "lags": lags or {}}))
+    return str(path)
+
+
+def test_legacy_state_of_today_is_imported_once(tmp_path, store):
+    store.record("A", TODAY, "real", "ok")
+    state_file = _legacy(tmp_path, TODAY, ["A", "B"], {"B": 30})
+    store.import_legacy_state(state_file)
+
+    assert not os.path.exists(state_file) and os.path.exists(state_file + ".migrated")
+    assert store.published_on(TODAY) == {"A", "B"}
+    rows = store.recent(10)
+    assert len(rows) == 2 and rows[0]["lag_seconds"] == 30
+    # Sin archivo pendiente, volver a importar no hace nada
+    store.import_legacy_state(state_file)
+    assert len(store.recent(10)) == 2
+
+
+def test_legacy_state_of_another_day_is_only_retired(tmp_path, store):
+    state_file = _legacy(tmp_path, "2026-01-01", ["A"])
+    store.import_legacy_state(state_file)
+    assert store.recent(10) == []
+    assert os.path.exists(state_file + ".migrated")
@@ -0,0 +1,130 @@
+import asyncio
+from datetime import datetime, timedelta
+import pytest
+from src.config.settings import config
+from src.core import scheduler as scheduler_module
+from src.core.scheduler import Scheduler
+from src.services.publication_store import PublicationStore
+
+NOW = datetime(2026, 10, 5, 10, 30)  # Hora local (UTC-3)
+
+
+class _Clock(datetime):
+    @classmethod
+    def now(cls, tz=None):
+        return NOW + timedelta(hours=3)
+
+
+class _Job:
+    def __init__(self, aps, job_id):
+        self.aps, self.id = aps, job_id
+
+    def remove(self):
+        del self.aps.jobs[self.id]
+
+
+class _Aps:
+    """Lo que usa el scheduler de APScheduler: jobs de fecha indexados por id."""
+    def __init__(self):
+        self.jobs = {}
+
+    def get_jobs(self):
+        return [_Job(self, job_id) for job_id in self.jobs]
+
+    def add_job(self, func, trigger, run_date, args, id, **kwargs):
+        self.jobs[id] = run_date
+
+
+@pytest.fixture
+def sched(monkeypatch):
+    monkeypatch.setattr(scheduler_module, "datetime", _Clock)
+    monkeypatch.setattr(config, "PREFETCH_LEAD_MINUTES", 10)
+    s = Scheduler()
+    s.published_log = set()
+    s.dispatched = []
+    monkeypatch.setattr(s, "_dispatch", lambda kind, folder, time_trigger: s.dispatched.append((kind, folder)))
+    return s
+
+
+def test_rebuild_jobs_schedules_future_and_recovers_past_real(sched):
+    sched.schedule_map = {"Tarde": "13:00", "Manana": "09:00"}
+    sched.attach(_Aps())
+
+    # Hora del sistema = local + 3h
+    assert sched.aps.jobs == {
+        "test:Tarde": datetime(2026, 10, 5, 14, 0),
+        "prefetch:Tarde": datetime(2026, 10, 5, 15, 50),
+        "real:Tarde": datetime(2026, 10, 5, 16, 0),
+    }
+    # La real vencida sale en el momento; su TESTING y prefetch vencidos no
+    assert sched.dispatched == [("real", "Manana")]
+
+
+def test_rebuild_jobs_moves_testing_before_0200_to_tonight(sched):
+    sched.schedule_map = {"Madrugada": "01:30"}
+    sched.attach(_Aps())
+
+    assert sched.aps.jobs == {"test:Madrugada": datetime(2026, 10, 6, 2, 30)}
+    assert sched.dispatched == [("real", "Madrugada")]
+
+
+def test_rebuild_jobs_replaces_previous_publication_jobs(sched):
+    aps = _Aps()
+    aps.jobs["otro:mantenimiento"] = None
+    sched.schedule_map = {"Tarde": "13:00"}
+    sched.attach(aps)
+    sched.schedule_map = {"Noche": "20:00"}
+    sched._rebuild_jobs()
+
+    assert sorted(aps.jobs) == ["otro:mantenimiento", "prefetch:Noche", "real:Noche", "test:Noche"]
+
+
+def test_retry_due_redispatches_only_past_real(sched):
+    sched.schedule_map = {"Manana": "09:00", "Tarde": "13:00"}
+    sched._retry_due(NOW)
+    assert sched.dispatched == [("real", "Manana")]
+
+
+def test_published_log_blocks_real_but_not_shifted_testing(monkeypatch):
+    s = Scheduler()
+    s.published_log = {"Madrugada"}
+    launched = []
+    monkeypatch.setattr(s, "_launch", lambda kind, folder, *args: launched.append((kind, folder)))
+
+    s._dispatch("real", "Madrugada", "01:30")
+    s._dispatch("prefetch", "Madrugada", "01:30")
+    s._dispatch("test", "Madrugada", "01:30")
+
+    assert launched == [("test", "Madrugada")]
+
+
+def _run_timed_out(s, monkeypatch, kind, folder, started_sending):
+    monkeypatch.setattr(config, "PUBLICATION_TIMEOUT", 0.05)
+
+    async def publish(folder, time_trigger):
+        if started_sending: s.sending.add(folder)
+        await asyncio.sleep(1)
+
+    asyncio.run(s._run_limited((kind, folder), publish, folder, "09:00"))
+
+
+def test_timeout_after_caption_counts_as_published(tmp_path, monkeypatch):
+    s = Scheduler()
+    s.store = PublicationStore(str(tmp_path / "publications.db"))
+    s.published_log = set()
+    _run_timed_out(s, monkeypatch, "real", "Manana", started_sending=True)
+
+    assert "Manana" in s.published_log
+    assert s.store.recent(1)[0]["status"] == "partial"
+    assert s.store.published_on(s.store.recent(1)[0]["date"]) == {"Manana"}
+
+
+def test_timeout_before_sending_is_recorded_and_retried(tmp_path, monkeypatch):
+    s = Scheduler()
+    s.store = PublicationStore(str(tmp_path / "publications.db"))
+    s.published_log = set()
+    _run_timed_out(s, monkeypatch, "real", "Manana", started_sending=False)
+    _run_timed_out(s, monkeypatch, "test", "Tarde", started_sending=False)
+
+    assert s.published_log == set()
+    assert [(r["folder"], r["kind"], r["status"]) for r in s.store.recent(2)] == [("Tarde", "test", "timeout"), ("Manana", "real", "timeout")]
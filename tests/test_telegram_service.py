@@ -0,0 +1,114 @@
+import asyncio
+import time
+import pytest
+from pyrogram.errors import FloodWait
+from benchmarks.fakes import FakeTelegramClient
+from src.config.settings import config
+from src.utils.concurrency import TokenBucket
+from src.services.telegram_service import TelegramService, PRIORITY_POST, PRIORITY_INTERACTIVE, PRIORITY_ALERT
+
+
+@pytest.fixture
+def telegram():
+    service = TelegramService()
+    service.client = FakeTelegramClient()
+    service.is_connected = True
+    return service
+
+
+def test_caller_timeout_cancels_the_upload_in_flight(telegram):
+    uploads = []
+
+    async def slow_upload():
+        try:
+            await asyncio.sleep(1)
+            uploads.append("terminada")
+        except asyncio.CancelledError:
+            uploads.append("cortada")
+            raise
+
+    async def main():
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(telegram._submit(-100, slow_upload, 0), timeout=0.05)
+        await asyncio.sleep(0.01)
+        # El worker sigue vivo para los envíos siguientes
+        await telegram.send_message(-100, "hola")
+        assert uploads == ["cortada"]
+        for worker in telegram._workers: worker.cancel()
+
+    asyncio.run(main())
+    assert telegram.client.sent == [("send_message", -100, 0)]
+
+
+def _record(log, name, delay=0):
+    async def send():
+        if delay: await asyncio.sleep(delay)
+        log.append(name)
+        return name
+    return send
+
+
+def test_alerts_do_not_wait_behind_a_slow_upload(telegram):
+    done = []
+
+    async def main():
+        upload = asyncio.ensure_future(telegram._submit(-100, _record(done, "video", 0.1), PRIORITY_POST))
+        await asyncio.sleep(0)
+        await telegram._submit(-200, _record(done, "alerta"), PRIORITY_ALERT)
+        await upload
+
+    asyncio.run(main())
+    assert done == ["alerta", "video"]
+
+
+def test_interactive_replies_go_before_queued_alerts(telegram):
+    done = []
+
+    async def main():
+        # El worker urgente queda ocupado; lo que llega después se ordena por prioridad
+        sends = [asyncio.ensure_future(telegram._submit(-200, _record(done, "ocupado", 0.05), PRIORITY_ALERT))]
+        await asyncio.sleep(0.01)
+        sends.append(asyncio.ensure_future(telegram._submit(-200, _record(done, "alerta"), PRIORITY_ALERT)))
+        sends.append(asyncio.ensure_future(telegram._submit(-200, _record(done, "respuesta"), PRIORITY_INTERACTIVE)))
+        await asyncio.gather(*sends)
+
+    asyncio.run(main())
+    assert done == ["ocupado", "respuesta", "alerta"]
+
+
+def test_chat_without_quota_is_requeued_without_blocking_others(telegram, monkeypatch):
+    monkeypatch.setattr(config, "TELEGRAM_SEND_WORKERS", 1)
+    telegram.chat_buckets[-100] = TokenBucket(rate=5, capacity=1)
+    done = []
+
+    async def main():
+        sends = [asyncio.ensure_future(telegram._submit(-100, _record(done, f"lento{i}"), PRIORITY_POST)) for i in range(2)]
+        sends.append(asyncio.ensure_future(telegram._submit(-300, _record(done, "otro chat"), PRIORITY_POST)))
+        await asyncio.gather(*sends)
+
+    asyncio.run(main())
+    # Con un solo worker, el segundo envío a -100 espera su token fuera del worker
+    assert done == ["lento0", "otro chat", "lento1"]
+
+
+def test_flood_wait_pauses_the_chat_and_retries(telegram):
+    attempts = []
+
+    async def flooded():
+        attempts.append(time.monotonic())
+        if len(attempts) == 1: raise FloodWait(value=1)
+        return "ok"
+
+    async def main():
+        pending = asyncio.ensure_future(telegram._submit(-100, flooded, PRIORITY_POST))
+        await asyncio.sleep(0.05)
+        # Mientras -100 está congelado, otro chat sale sin esperar
+        started = time.monotonic()
+        await telegram._submit(-200, _record([], "otro chat"), PRIORITY_POST)
+        other_chat = time.monotonic() - started
+        return await pending, other_chat
+
+    result, other_chat = asyncio.run(main())
+    assert result == "ok"
+    assert attempts[1] - attempts[0] >= 0.95
+    assert other_chat < 0.5